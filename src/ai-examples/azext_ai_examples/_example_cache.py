@@ -0,0 +1,82 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+# The concurrent fetches of a call each read the cache and write it back with their answers, one at a time so that
+# none of the answers is lost
+_write_lock = threading.Lock()
+
+
+class ExampleCache(object):
+    """
+    The answers of the example service by command, in a file of the config directory for every CLI version so that
+    the examples of an older version aren't shown after an upgrade. A command the service failed to answer for isn't
+    asked again for failure_ttl seconds.
+    """
+
+    def __init__(self, cache_dir, cli_version, ttl, failure_ttl=0, now=time.time):
+        self.path = os.path.join(cache_dir, 'examples-{}.json'.format(cli_version))
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.now = now
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as cache_file:
+                return json.load(cache_file)
+        except (OSError, IOError, ValueError):
+            return {}
+
+    def get(self, command):
+        """ Returns the cached answers of a command and whether they are stale, or None when they aren't cached """
+        entry = self._load().get(command)
+        if entry is None:
+            return None
+        if 'failed' in entry and self.now() - entry['failed'] < self.failure_ttl:
+            return entry.get('answers', []), False
+        if 'answers' not in entry:
+            return None
+        return entry['answers'], self.now() - entry['time'] >= self.ttl
+
+    def set(self, command, answers):
+        self.set_many({command: answers})
+
+    def set_many(self, answers_by_command):
+        with _write_lock:
+            entries = self._load()
+            fetched = self.now()
+            for command, answers in answers_by_command.items():
+                entries[command] = {'time': fetched, 'answers': answers}
+            self._save(entries)
+
+    def set_failed(self, command):
+        """ Records that the service didn't answer in time for a command, keeping the answers already cached """
+        with _write_lock:
+            entries = self._load()
+            entries.setdefault(command, {})['failed'] = self.now()
+            self._save(entries)
+
+    def _save(self, entries):
+        try:
+            cache_dir = os.path.dirname(self.path)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # Replace the file at once so that a help call never reads half of it
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(temp_path, self.path)
+        except (OSError, IOError) as ex:
+            logger.debug('Failed to write the example cache %s: %s', self.path, ex)
@@ -17,3 +17,20 @@ helps['ai-examples check-connection'] = """
     type: command
     short-summary: Check if the client can connect to the AI example service.
 """
+
+helps['ai-examples prefetch'] = """
+    type: command
+    short-summary: Cache the AI examples of a command group so that its help shows them without waiting for the service.
+    long-summary: >
+        The examples of a command are otherwise cached by its first "--help", which shows the built in examples when
+        the service doesn't answer within the latency budget. The seconds the examples are cached for, the latency
+        budget and the seconds a command the service failed to answer for isn't asked again are set by "cache_ttl",
+        "latency_budget" and "failure_ttl" in the [ai_examples] section of the CLI configuration.
+    parameters:
+      - name: --command-group
+        short-summary: The command group to cache the examples of, e.g. "vm" or "storage account".
+        long-summary: The examples of all the commands are cached when omitted.
+    examples:
+      - name: Cache the examples of the virtual machine commands.
+        text: az ai-examples prefetch --command-group vm
+"""
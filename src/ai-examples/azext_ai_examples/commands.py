@@ -8,6 +8,7 @@ def load_command_table(self, _):
 
     with self.command_group('ai-examples') as g:
         g.custom_command('check-connection', 'check_connection_aladdin')
+        g.custom_command('prefetch', 'prefetch_examples')
 
     with self.command_group('ai-examples', is_preview=True):
         pass
@@ -4,15 +4,38 @@
 # --------------------------------------------------------------------------------------------
 
 
+import atexit
 import hashlib
 import json
+import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from pkg_resources import parse_version
 
 from azure.cli.core import telemetry as telemetry_core
 from azure.cli.core import __version__ as core_version
 from azure.cli.core._help import HelpExample
+from knack.log import get_logger
+
+from azext_ai_examples._example_cache import ExampleCache
+
+logger = get_logger(__name__)
+
+# Seconds the examples of a command are shown from the cache before they are fetched again
+EXAMPLES_CACHE_TTL = 24 * 60 * 60
+# Seconds "--help" waits for examples which aren't cached before showing the built in ones
+EXAMPLES_LATENCY_BUDGET = 0.5
+# Seconds the examples of a command aren't fetched again after the service failed to answer in time
+EXAMPLES_FAILURE_TTL = 10 * 60
+# Seconds before a request to the service is given up
+EXAMPLES_REQUEST_TIMEOUT = 10
+# Seconds the CLI waits at exit for the examples of an uncached command still fetched, so that they are cached for
+# the next call
+EXAMPLES_EXIT_TIMEOUT = 1
+PREFETCH_CONNECTIONS = 8
 
 
 # Commands
@@ -24,10 +47,32 @@ def check_connection_aladdin():
         print('Connection failed')
 
 
+def prefetch_examples(cmd, command_group=None):
+    from azure.cli.core import MainCommandsLoader
+    args = command_group.split() if command_group else []
+    loader = MainCommandsLoader(cmd.cli_ctx)
+    loader.load_command_table(args)
+    prefix = ' '.join(args)
+    commands = [name for name in list(loader.command_table) + list(loader.command_group_table)
+                if not prefix or name == prefix or name.startswith(prefix + ' ')]
+    if not commands:
+        print('No command found in "{}"'.format(prefix))
+        return
+
+    client = get_examples_client()
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONNECTIONS) as executor:
+        answers = executor.map(lambda command: _fetch_answers(client, command), commands)
+        answers_by_command = {command: command_answers for command, command_answers in zip(commands, answers)
+                              if command_answers is not None}
+    get_example_cache(cmd.cli_ctx).set_many(answers_by_command)
+    print('Cached the examples of {} out of {} commands and groups'.format(len(answers_by_command), len(commands)))
+
+
 def new_examples(help_file):
+    cli_ctx = help_file.help_ctx.cli_ctx
     try:
-        examples = replace_examples(help_file.command)
-    except requests.exceptions.ConnectionError:
+        examples = replace_examples(help_file.command, cli_ctx)
+    except requests.exceptions.RequestException:
         examples = []
 
     if examples:
@@ -35,24 +80,132 @@ def new_examples(help_file):
 
 
 # Replace built in examples with Aladdin ones
-def replace_examples(command):
-    # Specify az to coerce the examples to be for the exact command
-    lookup_term = "az " + command
-    return get_generated_examples(lookup_term)
+def replace_examples(command, cli_ctx):
+    return get_cached_examples(command, cli_ctx)
 
 
 # Support functions
 def get_generated_examples(cli_term):
-    examples = []
-    response = call_aladdin_service(cli_term)
+    answers = get_examples_client().get_answers(cli_term)
+    return clean_from_http_answers(answers or [])
+
+
+def get_cached_examples(command, cli_ctx):
+    """
+    Returns the examples of a command from the cache, fetching them again in the background once they are stale.
+    The examples which aren't cached are fetched for EXAMPLES_LATENCY_BUDGET seconds at most, after which the
+    built in examples are shown while they are still fetched for the next call. A command the service failed to
+    answer for in time shows the built in examples without waiting for EXAMPLES_FAILURE_TTL seconds.
+    """
+    cache = get_example_cache(cli_ctx)
+    client = get_examples_client()
+    cached = cache.get(command)
+    if cached is not None:
+        answers, is_stale = cached
+        if is_stale:
+            _start_fetch(client, cache, command)
+        return clean_from_http_answers(answers)
+
+    budget = cli_ctx.config.getfloat('ai_examples', 'latency_budget', fallback=EXAMPLES_LATENCY_BUDGET)
+    result = {}
+    fetch = _start_fetch(client, cache, command, result)
+    fetch.join(budget)
+    if fetch.is_alive():
+        logger.debug('The examples of "%s" took over %s seconds, showing the built in ones', command, budget)
+        # the answers replace the failure if they come before the CLI exits
+        cache.set_failed(command)
+        return []
+    return clean_from_http_answers(result.get('answers') or [])
+
+
+def _fetch_answers(client, command):
+    # Specify az to coerce the examples to be for the exact command
+    try:
+        return client.get_answers("az " + command)
+    except (requests.exceptions.RequestException, ValueError) as ex:
+        logger.debug('Failed to get the examples of "%s": %s', command, ex)
+        return None
+
+
+_pending_fetches = set()
+_pending_fetches_lock = threading.Lock()
+
+
+def _start_fetch(client, cache, command, result=None):
+    """
+    Fetches the examples of a command in the background. The fetches of uncached commands, which get a result,
+    are waited for at exit while the refreshes of stale examples aren't.
+    """
+    def _fetch():
+        try:
+            answers = _fetch_answers(client, command)
+            if answers is None:
+                cache.set_failed(command)
+            else:
+                cache.set(command, answers)
+                if result is not None:
+                    result['answers'] = answers
+        finally:
+            with _pending_fetches_lock:
+                _pending_fetches.discard(fetch)
+
+    fetch = threading.Thread(target=_fetch)
+    # The interpreter would wait for a non daemon thread for the whole request timeout before the atexit handlers
+    # run, so the fetch is a daemon thread which _wait_for_pending_fetches waits for a bounded time at exit
+    fetch.daemon = True
+    if result is not None:
+        with _pending_fetches_lock:
+            _pending_fetches.add(fetch)
+    fetch.start()
+    return fetch
+
+
+@atexit.register
+def _wait_for_pending_fetches():
+    """ Lets the fetches of uncached commands still running write the cache, for EXAMPLES_EXIT_TIMEOUT seconds """
+    deadline = time.time() + EXAMPLES_EXIT_TIMEOUT
+    with _pending_fetches_lock:
+        fetches = list(_pending_fetches)
+    for fetch in fetches:
+        fetch.join(max(deadline - time.time(), 0))
+
+
+def get_example_cache(cli_ctx):
+    ttl = cli_ctx.config.getint('ai_examples', 'cache_ttl', fallback=EXAMPLES_CACHE_TTL)
+    failure_ttl = cli_ctx.config.getint('ai_examples', 'failure_ttl', fallback=EXAMPLES_FAILURE_TTL)
+    return ExampleCache(os.path.join(cli_ctx.config.config_dir, 'ai_examples'), core_version, ttl,
+                        failure_ttl=failure_ttl)
+
+
+class AladdinExamplesClient(object):  # pylint: disable=too-few-public-methods
+    """ Gets the answers of the example service, replaced by set_examples_client to use another service """
+
+    def __init__(self, timeout=EXAMPLES_REQUEST_TIMEOUT):
+        self.timeout = timeout
+
+    def get_answers(self, query):
+        """ Returns the answers to a query, or None when the service failed to answer """
+        response = call_aladdin_service(query, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        return json.loads(response.content)
+
+
+_examples_client = AladdinExamplesClient()
+
+
+def get_examples_client():
+    return _examples_client
+
+
+def set_examples_client(client):
+    global _examples_client  # pylint: disable=global-statement
+    _examples_client = client
 
-    if response.status_code == 200:
-        for answer in json.loads(response.content):
-            # Ignore pruned responses
-            if answer['source'] != 'pruned':
-                examples.append(clean_from_http_answer(answer))
 
-    return examples
+def clean_from_http_answers(answers):
+    # Ignore pruned responses
+    return [clean_from_http_answer(answer) for answer in answers if answer['source'] != 'pruned']
 
 
 def clean_from_http_answer(http_answer):
@@ -79,12 +232,13 @@ def ping_aladdin_service():
 
     response = requests.get(
         api_url,
-        headers=headers)
+        headers=headers,
+        timeout=EXAMPLES_REQUEST_TIMEOUT)
 
     return response
 
 
-def call_aladdin_service(query):
+def call_aladdin_service(query, timeout=EXAMPLES_REQUEST_TIMEOUT):
     version = str(parse_version(core_version))
     correlation_id = telemetry_core._session.correlation_id   # pylint: disable=protected-access
     subscription_id = telemetry_core._get_azure_subscription_id()  # pylint: disable=protected-access
@@ -119,6 +273,7 @@ def call_aladdin_service(query):
             'commandOnly': True,
             'numberOfExamples': 5
         },
-        headers=headers)
+        headers=headers,
+        timeout=timeout)
 
     return response
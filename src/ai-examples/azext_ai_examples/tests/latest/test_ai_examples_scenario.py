@@ -5,6 +5,14 @@
 
 
 import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
 import unittest
 from unittest import mock
 import requests
@@ -12,7 +20,9 @@ import requests
 from azure_devtools.scenario_tests import AllowLargeResponse
 from azure.cli.testsdk import (ScenarioTest, ResourceGroupPreparer)
 from azext_ai_examples.custom import (call_aladdin_service, ping_aladdin_service,
-                                      clean_from_http_answer, get_generated_examples)
+                                      clean_from_http_answer, get_generated_examples,
+                                      get_cached_examples, get_example_cache, get_examples_client,
+                                      set_examples_client, prefetch_examples, _pending_fetches)
 
 
 def create_valid_http_response():
@@ -107,3 +117,165 @@ class AiExamplesCustomCommandTest(unittest.TestCase):
             examples = get_generated_examples('RunTestAutomation')
 
             self.assertEqual(0, len(examples))
+
+
+class ExamplesServiceStandIn(object):
+    def __init__(self, delay=None, failing=False):
+        self.queries = []
+        self.delay = delay
+        self.failing = failing
+
+    def get_answers(self, query):
+        self.queries.append(query)
+        if self.delay:
+            self.delay.wait(5)
+        if self.failing:
+            return None
+        return [{'title': 'Example of {}'.format(query), 'snippet': query, 'source': 'crawler-example'}]
+
+
+class AiExamplesCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.cli_ctx = mock.MagicMock()
+        self.cli_ctx.config.config_dir = self.config_dir
+        self.cli_ctx.config.getint.side_effect = lambda section, option, fallback: fallback
+        self.cli_ctx.config.getfloat.side_effect = lambda section, option, fallback: fallback
+        self.default_client = get_examples_client()
+
+    def tearDown(self):
+        set_examples_client(self.default_client)
+        shutil.rmtree(self.config_dir)
+
+    def test_ai_examples_cached_examples(self):
+        service = ExamplesServiceStandIn()
+        set_examples_client(service)
+
+        for _ in range(2):
+            examples = get_cached_examples('vm create', self.cli_ctx)
+            self.assertEqual('Example of az vm create', examples[0].short_summary)
+            self.assertEqual('az vm create\n', examples[0].command)
+        self.assertEqual(['az vm create'], service.queries)
+
+    def test_ai_examples_latency_budget(self):
+        release = threading.Event()
+        service = ExamplesServiceStandIn(delay=release)
+        set_examples_client(service)
+        self.cli_ctx.config.getfloat.side_effect = lambda section, option, fallback: 0.01
+
+        # The built in examples are shown while the service answers
+        self.assertEqual([], get_cached_examples('vm create', self.cli_ctx))
+        release.set()
+        for _ in range(500):
+            cached = get_example_cache(self.cli_ctx).get('vm create')
+            if cached and cached[0]:
+                break
+            release.wait(0.01)
+        self.assertEqual(1, len(get_cached_examples('vm create', self.cli_ctx)))
+        self.assertEqual(['az vm create'], service.queries)
+
+    def test_ai_examples_failures_are_cached(self):
+        service = ExamplesServiceStandIn(failing=True)
+        set_examples_client(service)
+
+        # The service isn't asked again until the failure expires
+        for _ in range(2):
+            self.assertEqual([], get_cached_examples('vm create', self.cli_ctx))
+        self.assertEqual(['az vm create'], service.queries)
+        self.assertEqual(([], False), get_example_cache(self.cli_ctx).get('vm create'))
+
+        self.cli_ctx.config.getint.side_effect = lambda section, option, fallback: \
+            0 if option == 'failure_ttl' else fallback
+        service.failing = False
+        self.assertEqual(1, len(get_cached_examples('vm create', self.cli_ctx)))
+        self.assertEqual(['az vm create', 'az vm create'], service.queries)
+
+    def test_ai_examples_stale_examples_are_refreshed(self):
+        release = threading.Event()
+        service = ExamplesServiceStandIn(delay=release)
+        set_examples_client(service)
+        cache = get_example_cache(self.cli_ctx)
+        cache.set('vm create', [{'title': 'Stale example', 'snippet': 'az vm create', 'source': 'crawler-example'}])
+        self.cli_ctx.config.getint.side_effect = lambda section, option, fallback: 0
+
+        examples = get_cached_examples('vm create', self.cli_ctx)
+        self.assertEqual('Stale example', examples[0].short_summary)
+        # The refresh isn't waited for at exit
+        self.assertFalse(_pending_fetches)
+        release.set()
+        for _ in range(500):
+            if cache.get('vm create')[0][0]['title'] != 'Stale example':
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual('Example of az vm create', cache.get('vm create')[0][0]['title'])
+
+    def test_ai_examples_concurrent_cache_writes(self):
+        cache = get_example_cache(self.cli_ctx)
+        barrier = threading.Barrier(10)
+
+        def _set(index):
+            barrier.wait()
+            get_example_cache(self.cli_ctx).set('vm command{}'.format(index), [])
+
+        threads = [threading.Thread(target=_set, args=(index,)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(cache.get('vm command{}'.format(index)) for index in range(10)))
+
+    def _run_help(self, delay):
+        """ Shows the examples of a command in a new process, with a service answering after delay seconds """
+        script = textwrap.dedent("""
+            import sys
+            import time
+            from unittest import mock
+            from azext_ai_examples.custom import get_cached_examples, set_examples_client
+
+            class SlowService(object):
+                def get_answers(self, query):
+                    time.sleep(float(sys.argv[2]))
+                    return [{'title': 'Example of ' + query, 'snippet': query, 'source': 'crawler-example'}]
+
+            set_examples_client(SlowService())
+            cli_ctx = mock.MagicMock()
+            cli_ctx.config.config_dir = sys.argv[1]
+            cli_ctx.config.getint.side_effect = lambda section, option, fallback: fallback
+            cli_ctx.config.getfloat.side_effect = lambda section, option, fallback: 0.01
+            print(len(get_cached_examples('vm create', cli_ctx)))
+        """)
+        extension_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([extension_dir, os.environ.get('PYTHONPATH', '')]))
+        start = time.time()
+        output = subprocess.check_output([sys.executable, '-c', script, self.config_dir, str(delay)], env=env)
+        return output.decode().strip(), time.time() - start
+
+    def test_ai_examples_cache_is_written_at_exit(self):
+        # The built in examples are shown, and the examples are cached before the process exits
+        output, _ = self._run_help(delay=0.5)
+        self.assertEqual('0', output)
+        self.assertEqual('Example of az vm create', get_example_cache(self.cli_ctx).get('vm create')[0][0]['title'])
+
+    def test_ai_examples_exit_waits_for_a_bounded_time(self):
+        output, duration = self._run_help(delay=30)
+        self.assertEqual('0', output)
+        self.assertLess(duration, 20)
+        # The next calls show the built in examples without asking the service
+        self.assertEqual(([], False), get_example_cache(self.cli_ctx).get('vm create'))
+
+    def test_ai_examples_prefetch(self):
+        service = ExamplesServiceStandIn()
+        set_examples_client(service)
+        loader = mock.MagicMock(command_table={'vm create': None, 'vm show': None, 'vmss create': None},
+                                command_group_table={'vm': None, 'vmss': None})
+        cmd = mock.MagicMock(cli_ctx=self.cli_ctx)
+
+        with mock.patch('azure.cli.core.MainCommandsLoader', return_value=loader):
+            prefetch_examples(cmd, 'vm')
+
+        loader.load_command_table.assert_called_once_with(['vm'])
+        self.assertEqual(['az vm', 'az vm create', 'az vm show'], sorted(service.queries))
+        cache = get_example_cache(self.cli_ctx)
+        self.assertFalse(cache.get('vm show')[1])
+        self.assertIsNone(cache.get('vmss create'))
@@ -31,6 +31,8 @@ from azext_alias.hooks import (
 # This cache saves the entire command table globally so custom.py can have access to it.
 # Alter this cache through cache_reserved_commands(load_cmd_tbl_func) in util.py
 cached_reserved_commands = []
+# The index of cached_reserved_commands, see reserved_commands.py
+reserved_command_index = None
 
 
 class AliasExtCommandLoader(AzCommandsLoader):
@@ -13,6 +13,9 @@ ALIAS_HASH_FILE_NAME = 'alias.sha1'
 COLLIDED_ALIAS_FILE_NAME = 'collided_alias'
 ALIAS_TAB_COMP_TABLE_FILE_NAME = 'alias_tab_completion'
 GLOBAL_ALIAS_TAB_COMP_TABLE_PATH = os.path.join(GLOBAL_CONFIG_DIR, ALIAS_TAB_COMP_TABLE_FILE_NAME)
+RESERVED_COMMANDS_INDEX_FILE_NAME = 'alias_reserved_commands.json'
+GLOBAL_RESERVED_COMMANDS_INDEX_PATH = os.path.join(GLOBAL_CONFIG_DIR, RESERVED_COMMANDS_INDEX_FILE_NAME)
+RESERVED_COMMANDS_INDEX_VERSION = 1
 COLLISION_CHECK_LEVEL_DEPTH = 5
 
 INSUFFICIENT_POS_ARG_ERROR = 'alias: "{}" takes exactly {} positional argument{} ({} given)'
@@ -4,7 +4,6 @@
 # --------------------------------------------------------------------------------------------
 
 import os
-import re
 import json
 import shlex
 import hashlib
@@ -12,7 +11,6 @@ from collections import defaultdict
 
 from knack.log import get_logger
 
-import azext_alias
 from azext_alias import telemetry
 from azext_alias._const import (
     GLOBAL_CONFIG_DIR,
@@ -25,10 +23,13 @@ from azext_alias._const import (
     POS_ARG_DEBUG_MSG
 )
 from azext_alias.argument import build_pos_args_table, render_template
+from azext_alias.reserved_commands import get_reserved_command_index
 from azext_alias.util import (
     is_alias_command,
     cache_reserved_commands,
     get_config_parser,
+    read_config_string,
+    write_file_atomically,
     build_tab_completion_table
 )
 
@@ -40,6 +41,19 @@ GLOBAL_COLLIDED_ALIAS_PATH = os.path.join(GLOBAL_CONFIG_DIR, COLLIDED_ALIAS_FILE
 logger = get_logger(__name__)
 
 
+# The alias configuration parsed in this process, reused as long as the modification time and the size
+# of the alias configuration file are unchanged, e.g. by the commands run in az interactive
+_alias_config_cache = {}
+
+
+def _get_file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size
+
+
 class AliasManager(object):
 
     def __init__(self, **kwargs):
@@ -48,19 +62,28 @@ class AliasManager(object):
         self.collided_alias = defaultdict(list)
         self.alias_config_str = ''
         self.alias_config_hash = ''
+        # True if the alias hash and the collided aliases have to be written back
+        self.alias_state_changed = False
         self.load_alias_table()
         self.load_alias_hash()
 
     def load_alias_table(self):
         """
-        Load (create, if not exist) the alias config file.
+        Load the alias config file, reading and parsing it only once while it doesn't change.
         """
         try:
-            # w+ creates the alias config file if it does not exist
-            open_mode = 'r+' if os.path.exists(GLOBAL_ALIAS_PATH) else 'w+'
-            with open(GLOBAL_ALIAS_PATH, open_mode) as alias_config_file:
-                self.alias_config_str = alias_config_file.read()
-            self.alias_table.read(GLOBAL_ALIAS_PATH)
+            stamp = _get_file_stamp(GLOBAL_ALIAS_PATH)
+            cached = _alias_config_cache.get(GLOBAL_ALIAS_PATH)
+            if stamp is not None and cached and cached[0] == stamp:
+                _, self.alias_config_str, self.alias_table = cached
+            else:
+                _alias_config_cache.pop(GLOBAL_ALIAS_PATH, None)
+                if stamp is not None:
+                    with open(GLOBAL_ALIAS_PATH, 'r') as alias_config_file:
+                        self.alias_config_str = alias_config_file.read()
+                read_config_string(self.alias_table, self.alias_config_str, GLOBAL_ALIAS_PATH)
+                if stamp is not None:
+                    _alias_config_cache[GLOBAL_ALIAS_PATH] = (stamp, self.alias_config_str, self.alias_table)
             telemetry.set_number_of_aliases_registered(len(self.alias_table.sections()))
         except Exception as exception:  # pylint: disable=broad-except
             logger.warning(CONFIG_PARSING_ERROR, AliasManager.process_exception_message(exception))
@@ -69,25 +92,24 @@ class AliasManager(object):
 
     def load_alias_hash(self):
         """
-        Load (create, if not exist) the alias hash file.
+        Load the alias hash file, an empty hash if it does not exist.
         """
-        # w+ creates the alias hash file if it does not exist
-        open_mode = 'r+' if os.path.exists(GLOBAL_ALIAS_HASH_PATH) else 'w+'
-        with open(GLOBAL_ALIAS_HASH_PATH, open_mode) as alias_config_hash_file:
-            self.alias_config_hash = alias_config_hash_file.read()
+        if os.path.exists(GLOBAL_ALIAS_HASH_PATH):
+            with open(GLOBAL_ALIAS_HASH_PATH, 'r') as alias_config_hash_file:
+                self.alias_config_hash = alias_config_hash_file.read()
 
     def load_collided_alias(self):
         """
-        Load (create, if not exist) the collided alias file.
+        Load the collided alias file, no collided alias if it does not exist.
         """
-        # w+ creates the alias config file if it does not exist
-        open_mode = 'r+' if os.path.exists(GLOBAL_COLLIDED_ALIAS_PATH) else 'w+'
-        with open(GLOBAL_COLLIDED_ALIAS_PATH, open_mode) as collided_alias_file:
-            collided_alias_str = collided_alias_file.read()
-            try:
-                self.collided_alias = json.loads(collided_alias_str if collided_alias_str else '{}')
-            except Exception:  # pylint: disable=broad-except
-                self.collided_alias = {}
+        collided_alias_str = ''
+        if os.path.exists(GLOBAL_COLLIDED_ALIAS_PATH):
+            with open(GLOBAL_COLLIDED_ALIAS_PATH, 'r') as collided_alias_file:
+                collided_alias_str = collided_alias_file.read()
+        try:
+            self.collided_alias = json.loads(collided_alias_str if collided_alias_str else '{}')
+        except Exception:  # pylint: disable=broad-except
+            self.collided_alias = {}
 
     def detect_alias_config_change(self):
         """
@@ -120,14 +142,16 @@ class AliasManager(object):
         """
         if self.parse_error():
             # Write an empty hash so next run will check the config file against the entire command table again
-            AliasManager.write_alias_config_hash(empty_hash=True)
+            if self.alias_config_hash:
+                AliasManager.write_alias_config_hash(empty_hash=True)
             return args
 
-        # Only load the entire command table if it detects changes in the alias config
+        # Only load the reserved commands if it detects changes in the alias config
         if self.detect_alias_config_change():
             self.load_full_command_table()
             self.collided_alias = AliasManager.build_collision_table(self.alias_table.sections())
             build_tab_completion_table(self.alias_table)
+            self.alias_state_changed = True
         else:
             self.load_collided_alias()
 
@@ -184,15 +208,17 @@ class AliasManager(object):
 
     def load_full_command_table(self):
         """
-        Perform a full load of the command table to get all the reserved command words.
+        Perform a full load of the command table to get all the reserved command words,
+        unless the reserved command index saved on disk is up to date.
         """
         load_cmd_tbl_func = self.kwargs.get('load_cmd_tbl_func', lambda _: {})
-        cache_reserved_commands(load_cmd_tbl_func)
-        telemetry.set_full_command_table_loaded()
+        if cache_reserved_commands(load_cmd_tbl_func):
+            telemetry.set_full_command_table_loaded()
 
     def post_transform(self, args):
         """
-        Inject environment variables, and write hash to alias hash file after transforming alias to commands.
+        Inject environment variables, and write hash to alias hash file after transforming alias to commands
+        if the alias config has changed.
 
         Args:
             args: A list of args to post-transform.
@@ -208,8 +234,11 @@ class AliasManager(object):
             else:
                 post_transform_commands.append(os.path.expandvars(arg))
 
-        AliasManager.write_alias_config_hash(self.alias_config_hash)
-        AliasManager.write_collided_alias(self.collided_alias)
+        # Nothing is written unless the alias config has changed since the last run
+        if self.alias_state_changed:
+            AliasManager.write_alias_config_hash(self.alias_config_hash)
+            AliasManager.write_collided_alias(self.collided_alias)
+            self.alias_state_changed = False
 
         return post_transform_commands
 
@@ -228,7 +257,7 @@ class AliasManager(object):
     @staticmethod
     def build_collision_table(aliases, levels=COLLISION_CHECK_LEVEL_DEPTH):
         """
-        Build the collision table according to the alias configuration file against the entire command table.
+        Build the collision table according to the alias configuration file against the reserved command index.
 
         self.collided_alias is structured as:
         {
@@ -245,15 +274,14 @@ class AliasManager(object):
         Args:
             levels: the amount of levels we tranverse through the command table tree.
         """
+        index = get_reserved_command_index()
         collided_alias = defaultdict(list)
         for alias in aliases:
             # Only care about the first word in the alias because alias
             # cannot have spaces (unless they have positional arguments)
             word = alias.split()[0]
-            for level in range(1, levels + 1):
-                collision_regex = r'^{}{}($|\s)'.format(r'([a-z\-]*\s)' * (level - 1), word.lower())
-                if list(filter(re.compile(collision_regex).match, azext_alias.cached_reserved_commands)) \
-                        and level not in collided_alias[word]:
+            for level in index.get_collision_levels(word, levels):
+                if level not in collided_alias[word]:
                     collided_alias[word].append(level)
 
         telemetry.set_collided_aliases(list(collided_alias.keys()))
@@ -268,19 +296,14 @@ class AliasManager(object):
             empty_hash: True if we want to write an empty string into the file. Empty string in the alias hash file
                 means that we have to perform a full load of the command table in the next run.
         """
-        with open(GLOBAL_ALIAS_HASH_PATH, 'w') as alias_config_hash_file:
-            alias_config_hash_file.write('' if empty_hash else alias_config_hash)
+        write_file_atomically(GLOBAL_ALIAS_HASH_PATH, '' if empty_hash else alias_config_hash)
 
     @staticmethod
     def write_collided_alias(collided_alias_dict):
         """
         Write the collided aliases string into the collided alias file.
         """
-        # w+ creates the alias config file if it does not exist
-        open_mode = 'r+' if os.path.exists(GLOBAL_COLLIDED_ALIAS_PATH) else 'w+'
-        with open(GLOBAL_COLLIDED_ALIAS_PATH, open_mode) as collided_alias_file:
-            collided_alias_file.truncate()
-            collided_alias_file.write(json.dumps(collided_alias_dict))
+        write_file_atomically(GLOBAL_COLLIDED_ALIAS_PATH, json.dumps(collided_alias_dict))
 
     @staticmethod
     def process_exception_message(exception):
@@ -10,7 +10,6 @@ import shlex
 
 from knack.util import CLIError
 
-import jinja2 as jinja
 from azext_alias._const import (
     DUPLICATED_PLACEHOLDER_ERROR,
     RENDER_TEMPLATE_ERROR,
@@ -20,6 +19,33 @@ from azext_alias._const import (
 )
 
 
+# The Jinja templates compiled in this process, keyed by the normalized alias command
+_template_cache = {}
+MAX_CACHED_TEMPLATES = 256
+
+
+def get_template(cmd_derived_from_alias):
+    """
+    Get the compiled Jinja template of an alias command normalized by normalize_placeholders,
+    compiling it only the first time it is used.
+
+    Args:
+        cmd_derived_from_alias: The normalized alias command.
+
+    Returns:
+        The Jinja template of the alias command.
+    """
+    template = _template_cache.get(cmd_derived_from_alias)
+    if template is None:
+        # Jinja is only imported when an alias with positional arguments is used
+        import jinja2 as jinja
+        template = jinja.Template(cmd_derived_from_alias)
+        if len(_template_cache) >= MAX_CACHED_TEMPLATES:
+            _template_cache.clear()
+        _template_cache[cmd_derived_from_alias] = template
+    return template
+
+
 def get_placeholders(arg, check_duplicates=False):
     """
     Get all the placeholders' names in order.
@@ -129,7 +155,7 @@ def render_template(cmd_derived_from_alias, pos_args_table):
     """
     try:
         cmd_derived_from_alias = normalize_placeholders(cmd_derived_from_alias, inject_quotes=True)
-        template = jinja.Template(cmd_derived_from_alias)
+        template = get_template(cmd_derived_from_alias)
 
         # Shlex.split allows us to split a string by spaces while preserving quoted substrings
         # (positional arguments in this case)
@@ -5,6 +5,7 @@
 
 import os
 import hashlib
+from six import StringIO
 
 from knack.util import CLIError
 from knack.log import get_logger
@@ -16,7 +17,8 @@ from azext_alias.util import (
     is_url,
     build_tab_completion_table,
     get_config_parser,
-    retrieve_file_from_url
+    retrieve_file_from_url,
+    write_file_atomically
 )
 
 logger = get_logger(__name__)
@@ -129,12 +131,13 @@ def _commit_change(alias_table, export_path=None, post_commit=True):
         export_path: The path to export the aliases to. Default: GLOBAL_ALIAS_PATH.
         post_commit: True if we want to perform some extra actions after writing alias to file.
     """
-    with open(export_path or GLOBAL_ALIAS_PATH, 'w+') as alias_config_file:
-        alias_table.write(alias_config_file)
-        if post_commit:
-            alias_config_file.seek(0)
-            alias_config_hash = hashlib.sha1(alias_config_file.read().encode('utf-8')).hexdigest()
-            AliasManager.write_alias_config_hash(alias_config_hash)
-            collided_alias = AliasManager.build_collision_table(alias_table.sections())
-            AliasManager.write_collided_alias(collided_alias)
-            build_tab_completion_table(alias_table)
+    alias_config = StringIO()
+    alias_table.write(alias_config)
+    alias_config_str = alias_config.getvalue()
+    write_file_atomically(export_path or GLOBAL_ALIAS_PATH, alias_config_str)
+    if post_commit:
+        alias_config_hash = hashlib.sha1(alias_config_str.encode('utf-8')).hexdigest()
+        AliasManager.write_alias_config_hash(alias_config_hash)
+        collided_alias = AliasManager.build_collision_table(alias_table.sections())
+        AliasManager.write_collided_alias(collided_alias)
+        build_tab_completion_table(alias_table)
@@ -0,0 +1,131 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+# pylint: disable=import-error
+
+import re
+import json
+from collections import defaultdict
+
+from knack.log import get_logger
+
+import azext_alias
+from azext_alias._const import GLOBAL_RESERVED_COMMANDS_INDEX_PATH, RESERVED_COMMANDS_INDEX_VERSION
+from azext_alias.util import write_file_atomically
+
+logger = get_logger(__name__)
+
+# Words a collision is looked for after, see AliasManager.build_collision_table
+PLAIN_WORD_REGEX = re.compile(r'^[a-z\-]*$')
+
+
+class ReservedCommandIndex(object):
+    """
+    Index of the reserved command words, built as a trie of the words of the reserved commands. Every word also
+    points to the parent commands it appears under, so the level at which an alias collides with a reserved command
+    and the parent commands an alias can be completed under are looked up instead of scanning every reserved command.
+    """
+
+    def __init__(self, commands, sources=None):
+        self.commands = commands
+        self.sources = sources
+        self.tree = {}
+        self.parents = defaultdict(list)
+        for command in commands:
+            words = command.split()
+            node = self.tree
+            for level, word in enumerate(words):
+                if word not in node:
+                    node[word] = {}
+                    self.parents[word].append(' '.join(words[:level]))
+                node = node[word]
+
+    def has_command(self, words):
+        """
+        Check if words are the first words of a reserved command.
+        """
+        node = self.tree
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                return False
+        return True
+
+    def get_collision_levels(self, word, levels):
+        """
+        Get the levels of the command tree, up to levels, at which word is a reserved command word.
+        """
+        collision_levels = set()
+        for parent in self.parents.get(word.lower(), []):
+            parent_words = parent.split()
+            if len(parent_words) < levels and all(PLAIN_WORD_REGEX.match(w) for w in parent_words):
+                collision_levels.add(len(parent_words) + 1)
+        return sorted(collision_levels)
+
+    def get_parent_commands(self, alias_command):
+        """
+        Get the parent commands under which alias_command is part of a reserved command, '' meaning the root.
+        """
+        words = alias_command.split()
+        if not words:
+            return []
+        parent_commands = [''] if self.has_command(words) else []
+        for parent in sorted(self.parents.get(words[0], [])):
+            if parent and self.has_command(parent.split() + words):
+                parent_commands.append(parent)
+        return parent_commands
+
+
+def get_command_sources():
+    """
+    Get the versions of the CLI and of the installed extensions the reserved commands come from.
+    """
+    from azure.cli.core import __version__ as core_version
+    from azure.cli.core.extension import get_extensions
+
+    return {
+        'core': core_version,
+        'extensions': {ext.name: ext.version for ext in get_extensions()}
+    }
+
+
+def load_reserved_command_index(sources, index_path=None):
+    """
+    Load the reserved command index saved on disk, None if it is missing or was built for other sources.
+    """
+    try:
+        with open(index_path or GLOBAL_RESERVED_COMMANDS_INDEX_PATH, 'r') as index_file:
+            data = json.load(index_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != RESERVED_COMMANDS_INDEX_VERSION \
+            or data.get('sources') != sources:
+        return None
+    return ReservedCommandIndex(data.get('commands', []), sources)
+
+
+def save_reserved_command_index(index, index_path=None):
+    """
+    Save the reserved command index to disk, replacing the previous one in a single step.
+    """
+    try:
+        write_file_atomically(index_path or GLOBAL_RESERVED_COMMANDS_INDEX_PATH, json.dumps({
+            'version': RESERVED_COMMANDS_INDEX_VERSION,
+            'sources': index.sources,
+            'commands': index.commands
+        }))
+    except (IOError, OSError) as exception:
+        logger.debug('alias: Unable to save the reserved command index: %s', exception)
+
+
+def get_reserved_command_index():
+    """
+    Get the index of azext_alias.cached_reserved_commands.
+    """
+    index = azext_alias.reserved_command_index
+    if index is None or index.commands is not azext_alias.cached_reserved_commands:
+        index = ReservedCommandIndex(azext_alias.cached_reserved_commands)
+        azext_alias.reserved_command_index = index
+    return index
@@ -8,6 +8,9 @@
 import os
 import sys
 import shlex
+import shutil
+import hashlib
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 from six.moves import configparser
@@ -197,6 +200,55 @@ class TestAlias(unittest.TestCase):
         self.assertEqual(shlex.split(value[1]), alias_manager.post_transform(shlex.split(value[0])))
 
 
+class TestAliasState(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_config_dir = tempfile.mkdtemp()
+        self.alias_path = os.path.join(self.mock_config_dir, 'alias')
+        self.hash_path = os.path.join(self.mock_config_dir, 'alias.sha1')
+        self.patchers = [
+            patch('azext_alias.alias.GLOBAL_ALIAS_PATH', self.alias_path),
+            patch('azext_alias.alias.GLOBAL_ALIAS_HASH_PATH', self.hash_path),
+            patch('azext_alias.alias.GLOBAL_COLLIDED_ALIAS_PATH', os.path.join(self.mock_config_dir, 'collided_alias')),
+            patch('azext_alias.util.GLOBAL_ALIAS_TAB_COMP_TABLE_PATH', os.path.join(self.mock_config_dir, 'alias_tab_completion')),
+            patch('azext_alias.cached_reserved_commands', TEST_RESERVED_COMMANDS),
+            patch.object(azext_alias.alias.AliasManager, 'write_alias_config_hash'),
+            patch.object(azext_alias.alias.AliasManager, 'write_collided_alias')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        with open(self.alias_path, 'w') as f:
+            f.write(DEFAULT_MOCK_ALIAS_STRING)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.mock_config_dir)
+
+    def test_unchanged_alias_config_is_not_written(self):
+        with open(self.hash_path, 'w') as f:
+            f.write(hashlib.sha1(DEFAULT_MOCK_ALIAS_STRING.encode('utf-8')).hexdigest())
+        self.assertEqual(['account'], azext_alias.alias.AliasManager().transform(['ac']))
+        azext_alias.alias.AliasManager.write_alias_config_hash.assert_not_called()
+        azext_alias.alias.AliasManager.write_collided_alias.assert_not_called()
+
+    def test_changed_alias_config_is_written(self):
+        azext_alias.alias.AliasManager().transform(['ac'])
+        azext_alias.alias.AliasManager.write_alias_config_hash.assert_called_once_with(
+            hashlib.sha1(DEFAULT_MOCK_ALIAS_STRING.encode('utf-8')).hexdigest())
+        azext_alias.alias.AliasManager.write_collided_alias.assert_called_once()
+
+    def test_alias_config_is_parsed_once(self):
+        alias_table = azext_alias.alias.AliasManager().alias_table
+        self.assertIs(alias_table, azext_alias.alias.AliasManager().alias_table)
+
+        with open(self.alias_path, 'a') as f:
+            f.write('\n[new-alias]\ncommand = group list\n')
+        alias_manager = azext_alias.alias.AliasManager()
+        self.assertIsNot(alias_table, alias_manager.alias_table)
+        self.assertIn('new-alias', alias_manager.alias_table.sections())
+
+
 class MockAliasManager(azext_alias.alias.AliasManager):
 
     def load_alias_table(self):
@@ -14,7 +14,8 @@ from azext_alias.argument import (
     normalize_placeholders,
     build_pos_args_table,
     render_template,
-    check_runtime_errors
+    check_runtime_errors,
+    get_template
 )
 
 
@@ -135,6 +136,11 @@ class TestArgument(unittest.TestCase):
             check_runtime_errors('{{ arg_1.split("_")[2] }} {{ arg_2.split("_")[1] }}', pos_args_table)
         self.assertEqual(str(cm.exception), 'alias: Encounted error when evaluating "arg_1.split("_")[2]". Error detail: list index out of range')
 
+    def test_get_template_is_compiled_once(self):
+        template = get_template('"{{ arg_1 }}" list')
+        self.assertIs(template, get_template('"{{ arg_1 }}" list'))
+        self.assertEqual('"test" list', template.render({'arg_1': 'test'}))
+
 
 if __name__ == '__main__':
     unittest.main()
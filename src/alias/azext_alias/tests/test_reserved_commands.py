@@ -0,0 +1,79 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+# pylint: disable=line-too-long
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import azext_alias
+from azext_alias.reserved_commands import ReservedCommandIndex, load_reserved_command_index, save_reserved_command_index
+from azext_alias.util import cache_reserved_commands
+from azext_alias._const import RESERVED_COMMANDS_INDEX_FILE_NAME
+from azext_alias.tests._const import TEST_RESERVED_COMMANDS
+
+TEST_SOURCES = {'core': '2.20.0', 'extensions': {'alias': '0.5.2'}}
+
+
+class TestReservedCommandIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ReservedCommandIndex(TEST_RESERVED_COMMANDS)
+
+    def test_get_collision_levels(self):
+        self.assertEqual([1, 2], self.index.get_collision_levels('account', 5))
+        self.assertEqual([1], self.index.get_collision_levels('account', 1))
+        self.assertEqual([2], self.index.get_collision_levels('DNS', 5))
+        self.assertEqual([], self.index.get_collision_levels('mn', 5))
+
+    def test_get_parent_commands(self):
+        self.assertEqual(['', 'storage'], self.index.get_parent_commands('account'))
+        self.assertEqual(['account'], self.index.get_parent_commands('list-locations'))
+        self.assertEqual(['network'], self.index.get_parent_commands('dns'))
+        self.assertEqual(['storage'], self.index.get_parent_commands('account create'))
+        self.assertEqual([], self.index.get_parent_commands('account delete'))
+
+
+class TestReservedCommandIndexCache(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_config_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.mock_config_dir, RESERVED_COMMANDS_INDEX_FILE_NAME)
+        self.patchers = []
+        self.patchers.append(mock.patch('azext_alias.reserved_commands.GLOBAL_RESERVED_COMMANDS_INDEX_PATH', self.index_path))
+        self.patchers.append(mock.patch('azext_alias.cached_reserved_commands', []))
+        self.patchers.append(mock.patch('azext_alias.reserved_command_index', None))
+        self.patchers.append(mock.patch('azext_alias.reserved_commands.get_command_sources', return_value=TEST_SOURCES))
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.mock_config_dir)
+
+    def test_save_and_load_index(self):
+        save_reserved_command_index(ReservedCommandIndex(TEST_RESERVED_COMMANDS, TEST_SOURCES))
+        self.assertEqual(TEST_RESERVED_COMMANDS, load_reserved_command_index(TEST_SOURCES).commands)
+        self.assertIsNone(load_reserved_command_index({'core': '2.21.0', 'extensions': {'alias': '0.5.2'}}))
+        self.assertIsNone(load_reserved_command_index({'core': '2.20.0', 'extensions': {}}))
+
+    def test_command_table_is_loaded_once(self):
+        load_cmd_tbl_func = mock.Mock(return_value={command: None for command in TEST_RESERVED_COMMANDS})
+        self.assertTrue(cache_reserved_commands(load_cmd_tbl_func))
+        self.assertTrue(os.path.isfile(self.index_path))
+
+        # a new invocation reads the reserved commands from the index
+        azext_alias.cached_reserved_commands = []
+        self.assertFalse(cache_reserved_commands(load_cmd_tbl_func))
+        self.assertEqual(TEST_RESERVED_COMMANDS, azext_alias.cached_reserved_commands)
+        load_cmd_tbl_func.assert_called_once_with([])
+
+
+if __name__ == '__main__':
+    unittest.main()
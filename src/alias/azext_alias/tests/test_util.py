@@ -11,7 +11,7 @@ import tempfile
 import unittest
 from unittest import mock
 
-from azext_alias.util import remove_pos_arg_placeholders, build_tab_completion_table, get_config_parser
+from azext_alias.util import remove_pos_arg_placeholders, build_tab_completion_table, get_config_parser, write_file_atomically
 from azext_alias._const import ALIAS_TAB_COMP_TABLE_FILE_NAME
 from azext_alias.tests._const import TEST_RESERVED_COMMANDS
 
@@ -61,6 +61,14 @@ class TestUtil(unittest.TestCase):
             'account list-locations': ['']
         }, tab_completion_table)
 
+    def test_write_file_atomically(self):
+        path = os.path.join(self.mock_config_dir, 'alias.sha1')
+        write_file_atomically(path, 'old')
+        write_file_atomically(path, 'new')
+        with open(path) as f:
+            self.assertEqual('new', f.read())
+        self.assertEqual(['alias.sha1'], os.listdir(self.mock_config_dir))
+
 
 if __name__ == '__main__':
     unittest.main()
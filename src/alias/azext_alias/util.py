@@ -5,11 +5,11 @@
 
 # pylint: disable=wrong-import-order,import-error,relative-import
 
+import os
 import re
 import sys
 import json
 import shlex
-from collections import defaultdict
 from six.moves import configparser
 from six.moves.urllib.parse import urlparse
 from six.moves.urllib.request import urlretrieve
@@ -32,6 +32,42 @@ def get_config_parser():
     return configparser.ConfigParser()  # pylint: disable=undefined-variable
 
 
+def read_config_string(config_parser, config_str, source):
+    """
+    Parse an alias configuration already read from source into config_parser.
+
+    Args:
+        config_parser: The config parser to read into.
+        config_str: The content of the alias configuration file.
+        source: The path of the alias configuration file, used in the parsing errors.
+    """
+    if sys.version_info.major == 3:
+        config_parser.read_string(config_str, source=source)
+    else:
+        from StringIO import StringIO
+        config_parser.readfp(StringIO(config_str), source)  # pylint: disable=deprecated-method
+
+
+def write_file_atomically(path, content):
+    """
+    Write content to path through a temporary file which then replaces path, so concurrent
+    invocations never read a partially written file.
+
+    Args:
+        path: The path of the file to write.
+        content: The string to write.
+    """
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'w') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def get_alias_table():
     """
     Get the current alias table.
@@ -72,11 +108,37 @@ def cache_reserved_commands(load_cmd_tbl_func):
     This cache saves the entire command table globally so custom.py can have access to it.
     Alter this cache through cache_reserved_commands(load_cmd_tbl_func) in util.py.
 
+    The reserved commands are saved in an index on disk, so the entire command table is only loaded
+    again when the CLI or the installed extensions have changed.
+
     Args:
         load_cmd_tbl_func: The function to load the entire command table.
+
+    Returns:
+        True if the entire command table has been loaded.
     """
-    if not azext_alias.cached_reserved_commands:
-        azext_alias.cached_reserved_commands = list(load_cmd_tbl_func([]).keys())
+    from azext_alias.reserved_commands import (
+        ReservedCommandIndex,
+        get_command_sources,
+        load_reserved_command_index,
+        save_reserved_command_index
+    )
+
+    if azext_alias.cached_reserved_commands:
+        return False
+
+    sources = get_command_sources()
+    index = load_reserved_command_index(sources)
+    if index is not None:
+        azext_alias.cached_reserved_commands = index.commands
+        azext_alias.reserved_command_index = index
+        return False
+
+    azext_alias.cached_reserved_commands = list(load_cmd_tbl_func([]).keys())
+    index = ReservedCommandIndex(azext_alias.cached_reserved_commands, sources)
+    azext_alias.reserved_command_index = index
+    save_reserved_command_index(index)
+    return True
 
 
 def remove_pos_arg_placeholders(alias_command):
@@ -134,23 +196,17 @@ def build_tab_completion_table(alias_table):
     Returns:
         The tab completion table.
     """
-    alias_commands = [t[1] for t in filter_aliases(alias_table)]
-    tab_completion_table = defaultdict(list)
-    for alias_command in alias_commands:
-        for reserved_command in azext_alias.cached_reserved_commands:
-            # Check if alias_command has no parent command
-            if reserved_command == alias_command or reserved_command.startswith(alias_command + ' ') \
-                    and '' not in tab_completion_table[alias_command]:
-                tab_completion_table[alias_command].append('')
-            elif ' {} '.format(alias_command) in reserved_command or reserved_command.endswith(' ' + alias_command):
-                # Extract parent commands
-                index = reserved_command.index(alias_command)
-                parent_command = reserved_command[:index - 1]
-                if parent_command not in tab_completion_table[alias_command]:
-                    tab_completion_table[alias_command].append(parent_command)
-
-    with open(GLOBAL_ALIAS_TAB_COMP_TABLE_PATH, 'w') as f:
-        f.write(json.dumps(tab_completion_table))
+    from azext_alias.reserved_commands import get_reserved_command_index
+
+    index = get_reserved_command_index()
+    tab_completion_table = {}
+    for _, alias_command in filter_aliases(alias_table):
+        if alias_command not in tab_completion_table:
+            parent_commands = index.get_parent_commands(alias_command)
+            if parent_commands:
+                tab_completion_table[alias_command] = parent_commands
+
+    write_file_atomically(GLOBAL_ALIAS_TAB_COMP_TABLE_PATH, json.dumps(tab_completion_table))
 
     return tab_completion_table
 
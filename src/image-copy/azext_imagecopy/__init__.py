@@ -54,6 +54,9 @@ class ImageCopyCommandsLoader(AzCommandsLoader):
                             '--temporary_resource_group_name will be deprecated in 0.2.7.')
             c.argument('export_as_snapshot', options_list=['--export-as-snapshot'], action='store_true', default=False,
                        help='Include this switch to export the copies as snapshots instead of images.')
+            c.argument('engine', options_list=['--engine'], choices=['sdk', 'cli'], default='sdk',
+                       help='Run the copy with the Azure SDK in this process, or with a new az process for every '
+                            'step (slower, used when the Azure SDK is not available).')
             c.argument('tags', tags_type)
             c.ignore('_subscription')
 
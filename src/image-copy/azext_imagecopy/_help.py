@@ -9,6 +9,9 @@ from knack.help_files import helps
 helps['image copy'] = """
     type: command
     short-summary: Copy a managed image (or vm) to other regions. It requires the source disk to be available.
+    long-summary: >
+        The steps completed in every target location are saved, so running the same command again after a failure
+        or a cancellation resumes the copy after the last completed steps.
     examples:
         - name: Copy an image to several regions and cleanup at the end.
           text: >
@@ -3,16 +3,20 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-from multiprocessing import Pool
-
 from knack.util import CLIError
 from knack.log import get_logger
 
-from azext_imagecopy.cli_utils import run_cli_command, prepare_cli_command, get_storage_account_id_from_blob_path
-from azext_imagecopy.create_target import create_target_image
+from azext_imagecopy.create_target import (create_target_storage_account, start_target_copy, create_target_snapshot,
+                                           create_target_image, TARGET_STEPS, STEP_STORAGE_ACCOUNT,
+                                           STEP_COPY_STARTED, STEP_BLOB_COPY, STEP_SNAPSHOT, STEP_IMAGE)
+from azext_imagecopy.engines import get_engine, ENGINE_SDK
+from azext_imagecopy.scheduler import (CopyState, SubscriptionThrottle, ThrottledEngine, TargetCopyScheduler,
+                                       get_copy_state_path, STATUS_FAILED, MAX_ARM_CALLS_PER_SUBSCRIPTION)
 
 logger = get_logger(__name__)
 
+STEP_SOURCE_SNAPSHOT = 'snapshot'
+
 
 # pylint: disable=too-many-statements
 # pylint: disable=too-many-locals
@@ -20,24 +24,30 @@ logger = get_logger(__name__)
 def imagecopy(cmd, source_resource_group_name, source_object_name, target_location,
               target_resource_group_name, temporary_resource_group_name='image-copy-rg',
               source_type='image', cleanup=False, parallel_degree=-1, tags=None, target_name=None,
-              target_subscription=None, export_as_snapshot='false', timeout=3600):
-    if cleanup:
+              target_subscription=None, export_as_snapshot='false', timeout=3600, engine=ENGINE_SDK):
+    engine = get_engine(cmd, engine)
+    if hasattr(engine, 'throttle'):
+        throttle = SubscriptionThrottle()
+    else:
+        # the az subprocesses keep their slot until the operation ends, which mustn't hold back the locations
+        throttle = SubscriptionThrottle(max(MAX_ARM_CALLS_PER_SUBSCRIPTION, len(target_location)))
+    engine = ThrottledEngine(engine, throttle)
+    state = CopyState(get_copy_state_path(source_resource_group_name, source_object_name, source_type,
+                                          target_resource_group_name, temporary_resource_group_name,
+                                          target_subscription, target_name, bool(export_as_snapshot)))
+    if state.resumed:
+        logger.warning("Resuming the copy from the state saved in %s", state.path)
+
+    if cleanup and not state.resumed:
         # If --cleanup is set, forbid using an existing temporary resource group name.
         # It is dangerous to clean up an existing resource group.
-        cli_cmd = prepare_cli_command(['group', 'exists', '-n', temporary_resource_group_name],
-                                      output_as_json=False)
-        cmd_output = run_cli_command(cli_cmd)
-        if 'true' in cmd_output:
+        if engine.resource_group_exists(temporary_resource_group_name):
             raise CLIError('Don\'t specify an existing resource group in --temporary-resource-group-name '
                            'when --cleanup is set')
 
     # get the os disk id from source vm/image
     logger.warning("Getting OS disk ID of the source VM/image")
-    cli_cmd = prepare_cli_command([source_type, 'show',
-                                   '--name', source_object_name,
-                                   '--resource-group', source_resource_group_name])
-
-    json_cmd_output = run_cli_command(cli_cmd, return_as_json=True)
+    json_cmd_output = engine.show_source(source_type, source_resource_group_name, source_object_name)
 
     if json_cmd_output['storageProfile']['dataDisks']:
         logger.warning(
@@ -82,151 +92,118 @@ def imagecopy(cmd, source_resource_group_name, source_object_name, target_locati
 
     # create source snapshots
     # TODO: skip creating another snapshot when the source is a snapshot
-    logger.warning("Creating source snapshot")
     source_os_disk_snapshot_name = source_object_name + '_os_disk_snapshot'
-    snapshot_location = json_cmd_output['location']
-    if source_os_disk_type == "BLOB":
-        source_storage_account_id = get_storage_account_id_from_blob_path(cmd,
-                                                                          source_os_disk_id,
-                                                                          source_resource_group_name)
-        cli_cmd = prepare_cli_command(['snapshot', 'create',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--location', snapshot_location,
-                                       '--resource-group', source_resource_group_name,
-                                       '--source', source_os_disk_id,
-                                       '--source-storage-account-id', source_storage_account_id])
-    else:
-        cli_cmd = prepare_cli_command(['snapshot', 'create',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--location', snapshot_location,
-                                       '--resource-group', source_resource_group_name,
-                                       '--source', source_os_disk_id])
+    if not state.source.get(STEP_SOURCE_SNAPSHOT):
+        logger.warning("Creating source snapshot")
+        snapshot_location = json_cmd_output['location']
+        source_storage_account_id = None
+        if source_os_disk_type == "BLOB":
+            source_storage_account_id = engine.get_storage_account_id(source_os_disk_id,
+                                                                      source_resource_group_name)
+
+        engine.create_snapshot(source_resource_group_name, source_os_disk_snapshot_name, snapshot_location,
+                               source_os_disk_id, source_storage_account_id)
+        state.complete_source_step(STEP_SOURCE_SNAPSHOT)
 
-    run_cli_command(cli_cmd)
+    # Start processing in the target locations
+    target_copies = [state.get_target_copy(location.strip(), target_subscription) for location in target_location]
 
     # Get SAS URL for the snapshotName
-    logger.warning(
-        "Getting sas url for the source snapshot with timeout: %d seconds", timeout)
     if timeout < 3600:
         logger.error("Timeout should be greater than 3600 seconds")
         raise CLIError('Invalid Timeout')
 
-    cli_cmd = prepare_cli_command(['snapshot', 'grant-access',
-                                   '--name', source_os_disk_snapshot_name,
-                                   '--resource-group', source_resource_group_name,
-                                   '--duration-in-seconds', str(timeout)])
-
-    json_output = run_cli_command(cli_cmd, return_as_json=True)
-
-    source_os_disk_snapshot_url = json_output['accessSas']
-    logger.debug("source os disk snapshot url: %s",
-                 source_os_disk_snapshot_url)
-
-    # Start processing in the target locations
+    source_os_disk_snapshot_url = None
+    if any(TARGET_STEPS.index(target_copy.get('step') or STEP_STORAGE_ACCOUNT) < TARGET_STEPS.index(STEP_COPY_STARTED)
+           for target_copy in target_copies):
+        logger.warning(
+            "Getting sas url for the source snapshot with timeout: %d seconds", timeout)
+        source_os_disk_snapshot_url = engine.grant_snapshot_access(source_resource_group_name,
+                                                                   source_os_disk_snapshot_name, timeout)
+        logger.debug("source os disk snapshot url: %s",
+                     source_os_disk_snapshot_url)
 
     transient_resource_group_name = temporary_resource_group_name
     # pick the first location for the temp group
     transient_resource_group_location = target_location[0].strip()
-    create_resource_group(transient_resource_group_name,
+    create_resource_group(engine, transient_resource_group_name,
                           transient_resource_group_location,
                           target_subscription)
 
     target_locations_count = len(target_location)
     logger.warning("Target location count: %s", target_locations_count)
 
-    create_resource_group(target_resource_group_name,
+    create_resource_group(engine, target_resource_group_name,
                           target_location[0].strip(),
                           target_subscription)
 
-    try:
-
-        # try to get a handle on arm's 409s
-        azure_pool_frequency = 5
-        if target_locations_count >= 5:
-            azure_pool_frequency = 15
-        elif target_locations_count >= 3:
-            azure_pool_frequency = 10
-
-        if (target_locations_count == 1) or (parallel_degree == 1):
-            # Going to copy to targets one-by-one
-            logger.debug("Starting sync process for all locations")
-            for location in target_location:
-                location = location.strip()
-                create_target_image(cmd, location, transient_resource_group_name, source_type,
-                                    source_object_name, source_os_disk_snapshot_name, source_os_disk_snapshot_url,
-                                    source_os_type, target_resource_group_name, azure_pool_frequency,
-                                    tags, target_name, target_subscription, export_as_snapshot, timeout)
-        else:
-            if parallel_degree == -1:
-                pool = Pool(target_locations_count)
-            else:
-                pool = Pool(min(parallel_degree, target_locations_count))
-
-            tasks = []
-            for location in target_location:
-                location = location.strip()
-                tasks.append((location, transient_resource_group_name, source_type,
-                              source_object_name, source_os_disk_snapshot_name, source_os_disk_snapshot_url,
-                              source_os_type, target_resource_group_name, azure_pool_frequency,
-                              tags, target_name, target_subscription, export_as_snapshot, timeout))
-
-            logger.warning("Starting async process for all locations")
-
-            for task in tasks:
-                pool.apply_async(create_target_image, task)
-
-            pool.close()
-            pool.join()
+    # try to get a handle on arm's 409s
+    azure_pool_frequency = 5
+    if target_locations_count >= 5:
+        azure_pool_frequency = 15
+    elif target_locations_count >= 3:
+        azure_pool_frequency = 10
+
+    steps = {
+        STEP_STORAGE_ACCOUNT: lambda target_engine, target_copy: create_target_storage_account(
+            target_engine, target_copy, transient_resource_group_name),
+        STEP_COPY_STARTED: lambda target_engine, target_copy: start_target_copy(
+            target_engine, target_copy, transient_resource_group_name, source_os_disk_snapshot_name,
+            source_os_disk_snapshot_url, timeout),
+        STEP_BLOB_COPY: None,
+        STEP_SNAPSHOT: lambda target_engine, target_copy: create_target_snapshot(
+            target_engine, target_copy, transient_resource_group_name, source_os_disk_snapshot_name,
+            target_resource_group_name, export_as_snapshot)
+    }
+    if export_as_snapshot:
+        logger.warning("Skipping image creation")
+    else:
+        steps[STEP_IMAGE] = lambda target_engine, target_copy: create_target_image(
+            target_engine, target_copy, source_type, source_object_name, source_os_type, target_resource_group_name,
+            tags, target_name)
 
+    logger.warning("Starting the copy to all locations")
+    scheduler = TargetCopyScheduler(engine, state, steps, transient_resource_group_name,
+                                    parallel_degree=parallel_degree, azure_pool_frequency=azure_pool_frequency)
+    try:
+        scheduler.run(target_copies)
     except KeyboardInterrupt:
         logger.warning('User cancelled the operation')
+        logger.warning('Run the same command again to resume the copy after the last completed steps')
         if cleanup:
             logger.warning('To cleanup temporary resources look for ones tagged with "image-copy-extension". \n'
                            'You can use the following command: az resource list --tag created_by=image-copy-extension')
-        pool.terminate()
         return
 
+    failed_locations = [target_copy['location'] for target_copy in target_copies
+                        if target_copy['status'] == STATUS_FAILED]
+    if failed_locations:
+        if cleanup:
+            logger.warning('Skipping the cleanup, the temporary resources are needed to resume the copy')
+        raise CLIError('The copy to {} failed. Run the same command again to resume it after the last completed '
+                       'steps.'.format(', '.join(failed_locations)))
+    state.delete()
+
     # Cleanup
     if cleanup:
         logger.warning('Deleting transient resources')
 
         # Delete resource group
-        cli_cmd = prepare_cli_command(['group', 'delete', '--no-wait', '--yes',
-                                       '--name', transient_resource_group_name],
-                                      subscription=target_subscription)
-        run_cli_command(cli_cmd)
+        engine.delete_resource_group(transient_resource_group_name, subscription=target_subscription)
 
         # Revoke sas for source snapshot
-        cli_cmd = prepare_cli_command(['snapshot', 'revoke-access',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--resource-group', source_resource_group_name])
-        run_cli_command(cli_cmd)
+        engine.revoke_snapshot_access(source_resource_group_name, source_os_disk_snapshot_name)
 
         # Delete source snapshot
         # TODO: skip this if source is snapshot and not creating a new one
-        cli_cmd = prepare_cli_command(['snapshot', 'delete',
-                                       '--name', source_os_disk_snapshot_name,
-                                       '--resource-group', source_resource_group_name])
-        run_cli_command(cli_cmd)
+        engine.delete_snapshot(source_resource_group_name, source_os_disk_snapshot_name)
 
 
-def create_resource_group(resource_group_name, location, subscription=None):
+def create_resource_group(engine, resource_group_name, location, subscription=None):
     # check if target resource group exists
-    cli_cmd = prepare_cli_command(['group', 'exists',
-                                   '--name', resource_group_name],
-                                  output_as_json=False,
-                                  subscription=subscription)
-
-    cmd_output = run_cli_command(cli_cmd)
-
-    if 'true' in cmd_output:
+    if engine.resource_group_exists(resource_group_name, subscription=subscription):
         return
 
     # create the target resource group
     logger.warning("Creating resource group: %s", resource_group_name)
-    cli_cmd = prepare_cli_command(['group', 'create',
-                                   '--name', resource_group_name,
-                                   '--location', location],
-                                  subscription=subscription)
-
-    run_cli_command(cli_cmd)
+    engine.create_resource_group(resource_group_name, location, subscription=subscription)
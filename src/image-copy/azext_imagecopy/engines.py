@@ -0,0 +1,380 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import datetime
+import threading
+
+from knack.util import todict
+from knack.log import get_logger
+
+from azext_imagecopy.cli_utils import (run_cli_command, prepare_cli_command, get_storage_account_id_from_blob_path,
+                                       EXTENSION_TAG_STRING)
+
+logger = get_logger(__name__)
+
+ENGINE_SDK = 'sdk'
+ENGINE_CLI = 'cli'
+
+# the number of connections kept open to the target storage accounts while polling the copies
+BLOB_CONNECTION_POOL_SIZE = 32
+
+
+def get_engine(cmd, engine=ENGINE_SDK):
+    """ returns the engine running the steps of the copy, falling back to az subprocesses if the SDKs are missing """
+    if engine == ENGINE_SDK:
+        try:
+            import azure.mgmt.compute  # pylint: disable=unused-import
+            import azure.mgmt.storage  # pylint: disable=unused-import
+            import azure.mgmt.resource  # pylint: disable=unused-import
+            import azure.multiapi.storage  # pylint: disable=unused-import
+        except ImportError as ex:
+            logger.warning("Unable to load the Azure SDK (%s), running the copy with az subprocesses instead", ex)
+        else:
+            return SdkEngine(cmd.cli_ctx)
+    return CliEngine(cmd)
+
+
+def _get_creation_tags(tags=None):
+    creation_tags = dict([EXTENSION_TAG_STRING.split('=')])
+    creation_tags.update(tags or {})
+    return creation_tags
+
+
+class CliEngine(object):
+    """ runs every step of the copy in a new az process """
+
+    name = ENGINE_CLI
+    # the storage commands call ARM too, to get the key of the account
+    unthrottled_operations = ('get_storage_account_id',)
+
+    def __init__(self, cmd):
+        from azure.cli.core.commands.client_factory import get_subscription_id
+        self.subscription_id = get_subscription_id(cmd.cli_ctx)
+
+    @staticmethod
+    def resource_group_exists(name, subscription=None):
+        cli_cmd = prepare_cli_command(['group', 'exists', '--name', name],
+                                      output_as_json=False,
+                                      subscription=subscription)
+        return 'true' in run_cli_command(cli_cmd)
+
+    @staticmethod
+    def create_resource_group(name, location, subscription=None):
+        cli_cmd = prepare_cli_command(['group', 'create',
+                                       '--name', name,
+                                       '--location', location],
+                                      subscription=subscription)
+        run_cli_command(cli_cmd)
+
+    @staticmethod
+    def delete_resource_group(name, subscription=None):
+        cli_cmd = prepare_cli_command(['group', 'delete', '--no-wait', '--yes',
+                                       '--name', name],
+                                      subscription=subscription)
+        run_cli_command(cli_cmd)
+
+    @staticmethod
+    def show_source(source_type, resource_group_name, name):
+        cli_cmd = prepare_cli_command([source_type, 'show',
+                                       '--name', name,
+                                       '--resource-group', resource_group_name])
+        return run_cli_command(cli_cmd, return_as_json=True)
+
+    def get_storage_account_id(self, blob_path, resource_group_name, subscription=None):
+        return get_storage_account_id_from_blob_path(None, blob_path, resource_group_name,
+                                                     subscription or self.subscription_id)
+
+    @staticmethod
+    def create_snapshot(resource_group_name, name, location, source, source_storage_account_id=None,
+                        subscription=None):
+        cli_cmd = ['snapshot', 'create',
+                   '--name', name,
+                   '--location', location,
+                   '--resource-group', resource_group_name,
+                   '--source', source]
+        if source_storage_account_id:
+            cli_cmd += ['--source-storage-account-id', source_storage_account_id]
+        return run_cli_command(prepare_cli_command(cli_cmd, subscription=subscription), return_as_json=True)
+
+    @staticmethod
+    def grant_snapshot_access(resource_group_name, name, duration_in_seconds):
+        cli_cmd = prepare_cli_command(['snapshot', 'grant-access',
+                                       '--name', name,
+                                       '--resource-group', resource_group_name,
+                                       '--duration-in-seconds', str(duration_in_seconds)])
+        return run_cli_command(cli_cmd, return_as_json=True)['accessSas']
+
+    @staticmethod
+    def revoke_snapshot_access(resource_group_name, name):
+        cli_cmd = prepare_cli_command(['snapshot', 'revoke-access',
+                                       '--name', name,
+                                       '--resource-group', resource_group_name])
+        run_cli_command(cli_cmd)
+
+    @staticmethod
+    def delete_snapshot(resource_group_name, name):
+        cli_cmd = prepare_cli_command(['snapshot', 'delete',
+                                       '--name', name,
+                                       '--resource-group', resource_group_name])
+        run_cli_command(cli_cmd)
+
+    @staticmethod
+    def create_storage_account(resource_group_name, name, location, subscription=None):
+        """ returns the blob endpoint of the new storage account """
+        cli_cmd = prepare_cli_command(['storage', 'account', 'create',
+                                       '--name', name,
+                                       '--resource-group', resource_group_name,
+                                       '--location', location,
+                                       '--sku', 'Standard_LRS'],
+                                      subscription=subscription)
+        return run_cli_command(cli_cmd, return_as_json=True)['primaryEndpoints']['blob']
+
+    @staticmethod
+    def get_storage_account_key(resource_group_name, name, subscription=None):
+        cli_cmd = prepare_cli_command(['storage', 'account', 'keys', 'list',
+                                       '--account-name', name,
+                                       '--resource-group', resource_group_name],
+                                      subscription=subscription)
+        return run_cli_command(cli_cmd, return_as_json=True)[0]['value']
+
+    @staticmethod
+    def create_container(account_name, account_key, container_name,  # pylint: disable=unused-argument
+                         subscription=None):
+        cli_cmd = prepare_cli_command(['storage', 'container', 'create',
+                                       '--name', container_name,
+                                       '--account-name', account_name],
+                                      subscription=subscription)
+        run_cli_command(cli_cmd)
+
+    @staticmethod
+    def start_blob_copy(account_name, account_key, container_name, blob_name, source_url, timeout,
+                        subscription=None):
+        expiry_format = "%Y-%m-%dT%H:%MZ"
+        expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=timeout)
+        logger.debug("create target storage sas using timeout seconds: %d", timeout)
+
+        cli_cmd = prepare_cli_command(['storage', 'account', 'generate-sas',
+                                       '--account-name', account_name,
+                                       '--account-key', account_key,
+                                       '--expiry', expiry.strftime(expiry_format),
+                                       '--permissions', 'aclrpuw', '--resource-types',
+                                       'sco', '--services', 'b', '--https-only'],
+                                      output_as_json=False,
+                                      subscription=subscription)
+
+        sas_token = run_cli_command(cli_cmd)
+        sas_token = sas_token.rstrip("\n\r")  # STRANGE
+        logger.debug("sas token: %s", sas_token)
+
+        cli_cmd = prepare_cli_command(['storage', 'blob', 'copy', 'start',
+                                       '--source-uri', source_url,
+                                       '--destination-blob', blob_name,
+                                       '--destination-container', container_name,
+                                       '--account-name', account_name,
+                                       '--sas-token', sas_token],
+                                      subscription=subscription)
+        run_cli_command(cli_cmd)
+
+    @staticmethod
+    def get_blob_copy_status(account_name, account_key, container_name, blob_name,  # pylint: disable=unused-argument
+                             subscription=None):
+        """ returns the status and the progress ('<bytes copied>/<total bytes>') of the copy to the blob """
+        cli_cmd = prepare_cli_command(['storage', 'blob', 'show',
+                                       '--name', blob_name,
+                                       '--container-name', container_name,
+                                       '--account-name', account_name],
+                                      subscription=subscription)
+        json_output = run_cli_command(cli_cmd, return_as_json=True)
+        return json_output["properties"]["copy"]["status"], json_output["properties"]["copy"]["progress"]
+
+    @staticmethod
+    def create_image(resource_group_name, name, location, os_type, snapshot_id, tags=None, subscription=None):
+        cli_cmd = prepare_cli_command(['image', 'create',
+                                       '--resource-group', resource_group_name,
+                                       '--name', name,
+                                       '--location', location,
+                                       '--os-type', os_type,
+                                       '--source', snapshot_id],
+                                      tags=tags,
+                                      subscription=subscription)
+        return run_cli_command(cli_cmd, return_as_json=True)
+
+
+class SdkEngine(object):
+    """
+    runs every step of the copy in this process with the management and storage SDK clients. The clients are
+    created once per subscription and the target storage accounts share one pool of connections.
+    """
+
+    name = ENGINE_SDK
+    # the blob operations go to the target storage accounts instead of ARM
+    unthrottled_operations = ('get_storage_account_id', 'create_container', 'start_blob_copy',
+                              'get_blob_copy_status')
+
+    def __init__(self, cli_ctx):
+        self.cli_ctx = cli_ctx
+        # the SubscriptionThrottle of the calls, set by the ThrottledEngine running them
+        self.throttle = None
+        self._clients = {}
+        self._subscription_ids = {}
+        self._blob_services = {}
+        self._request_session = None
+        self._lock = threading.Lock()
+
+    def _get_subscription_id(self, subscription=None):
+        if subscription not in self._subscription_ids:
+            from azure.cli.core._profile import Profile
+            self._subscription_ids[subscription] = Profile(cli_ctx=self.cli_ctx).get_subscription_id(subscription)
+        return self._subscription_ids[subscription]
+
+    def _get_client(self, resource_type, subscription=None):
+        from azure.cli.core.commands.client_factory import get_mgmt_service_client
+        with self._lock:
+            subscription_id = self._get_subscription_id(subscription)
+            key = (resource_type, subscription_id)
+            if key not in self._clients:
+                self._clients[key] = get_mgmt_service_client(self.cli_ctx, resource_type,
+                                                             subscription_id=subscription_id)
+            return self._clients[key]
+
+    def _compute(self, subscription=None):
+        from azure.cli.core.profiles import ResourceType
+        return self._get_client(ResourceType.MGMT_COMPUTE, subscription)
+
+    def _storage(self, subscription=None):
+        from azure.cli.core.profiles import ResourceType
+        return self._get_client(ResourceType.MGMT_STORAGE, subscription)
+
+    def _resources(self, subscription=None):
+        from azure.cli.core.profiles import ResourceType
+        return self._get_client(ResourceType.MGMT_RESOURCE_RESOURCES, subscription)
+
+    def _get_models(self, resource_type, *models, **kwargs):
+        from azure.cli.core.profiles import get_sdk
+        return get_sdk(self.cli_ctx, resource_type, *models, mod='models', **kwargs)
+
+    def _get_blob_service(self, account_name, account_key):
+        from azure.cli.core.profiles import ResourceType, get_sdk
+        with self._lock:
+            if account_name not in self._blob_services:
+                if self._request_session is None:
+                    import requests
+                    self._request_session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=BLOB_CONNECTION_POOL_SIZE,
+                                                            pool_maxsize=BLOB_CONNECTION_POOL_SIZE)
+                    self._request_session.mount('https://', adapter)
+                    self._request_session.mount('http://', adapter)
+                block_blob_service = get_sdk(self.cli_ctx, ResourceType.DATA_STORAGE, 'blob#BlockBlobService')
+                self._blob_services[account_name] = block_blob_service(
+                    account_name=account_name, account_key=account_key,
+                    endpoint_suffix=self.cli_ctx.cloud.suffixes.storage_endpoint,
+                    request_session=self._request_session)
+            return self._blob_services[account_name]
+
+    def _wait(self, operations, name, *args):
+        """
+        runs a long running operation of a track 1 or a track 2 SDK and returns its result. Only the request
+        starting the operation is throttled, not the wait for its end.
+        """
+        operation = getattr(operations, 'begin_' + name, None) or getattr(operations, name)
+        poller = operation(*args)
+        if not hasattr(poller, 'result'):
+            return poller
+        if self.throttle is None:
+            return poller.result()
+        with self.throttle.released():
+            return poller.result()
+
+    def resource_group_exists(self, name, subscription=None):
+        return self._resources(subscription).resource_groups.check_existence(name)
+
+    def create_resource_group(self, name, location, subscription=None):
+        from azure.cli.core.profiles import ResourceType
+        ResourceGroup = self._get_models(ResourceType.MGMT_RESOURCE_RESOURCES, 'ResourceGroup')
+        self._resources(subscription).resource_groups.create_or_update(
+            name, ResourceGroup(location=location, tags=_get_creation_tags()))
+
+    def delete_resource_group(self, name, subscription=None):
+        resource_groups = self._resources(subscription).resource_groups
+        # don't wait for the deletion
+        (getattr(resource_groups, 'begin_delete', None) or resource_groups.delete)(name)
+
+    def show_source(self, source_type, resource_group_name, name):
+        compute = self._compute()
+        if source_type == 'vm':
+            return todict(compute.virtual_machines.get(resource_group_name, name))
+        return todict(compute.images.get(resource_group_name, name))
+
+    def get_storage_account_id(self, blob_path, resource_group_name, subscription=None):
+        return get_storage_account_id_from_blob_path(None, blob_path, resource_group_name,
+                                                     self._get_subscription_id(subscription))
+
+    def create_snapshot(self, resource_group_name, name, location, source, source_storage_account_id=None,
+                        subscription=None):
+        from azure.cli.core.profiles import ResourceType
+        Snapshot, CreationData = self._get_models(ResourceType.MGMT_COMPUTE, 'Snapshot', 'CreationData',
+                                                  operation_group='snapshots')
+        if source_storage_account_id:
+            creation_data = CreationData(create_option='Import', source_uri=source,
+                                         storage_account_id=source_storage_account_id)
+        else:
+            creation_data = CreationData(create_option='Copy', source_resource_id=source)
+        snapshot = Snapshot(location=location, creation_data=creation_data, tags=_get_creation_tags())
+        return todict(self._wait(self._compute(subscription).snapshots, 'create_or_update',
+                                 resource_group_name, name, snapshot))
+
+    def grant_snapshot_access(self, resource_group_name, name, duration_in_seconds):
+        from azure.cli.core.profiles import ResourceType
+        GrantAccessData = self._get_models(ResourceType.MGMT_COMPUTE, 'GrantAccessData',
+                                           operation_group='snapshots')
+        access = self._wait(self._compute().snapshots, 'grant_access', resource_group_name, name,
+                            GrantAccessData(access='Read', duration_in_seconds=duration_in_seconds))
+        return access.access_sas
+
+    def revoke_snapshot_access(self, resource_group_name, name):
+        self._wait(self._compute().snapshots, 'revoke_access', resource_group_name, name)
+
+    def delete_snapshot(self, resource_group_name, name):
+        self._wait(self._compute().snapshots, 'delete', resource_group_name, name)
+
+    def create_storage_account(self, resource_group_name, name, location, subscription=None):
+        """ returns the blob endpoint of the new storage account """
+        from azure.cli.core.profiles import ResourceType
+        StorageAccountCreateParameters, Sku = self._get_models(ResourceType.MGMT_STORAGE,
+                                                               'StorageAccountCreateParameters', 'Sku')
+        parameters = StorageAccountCreateParameters(sku=Sku(name='Standard_LRS'), kind='StorageV2',
+                                                    location=location, tags=_get_creation_tags())
+        account = self._wait(self._storage(subscription).storage_accounts, 'create',
+                             resource_group_name, name, parameters)
+        return account.primary_endpoints.blob
+
+    def get_storage_account_key(self, resource_group_name, name, subscription=None):
+        return self._storage(subscription).storage_accounts.list_keys(resource_group_name, name).keys[0].value
+
+    def create_container(self, account_name, account_key, container_name,
+                         subscription=None):  # pylint: disable=unused-argument
+        self._get_blob_service(account_name, account_key).create_container(container_name)
+
+    def start_blob_copy(self, account_name, account_key, container_name, blob_name, source_url,
+                        timeout, subscription=None):  # pylint: disable=unused-argument
+        self._get_blob_service(account_name, account_key).copy_blob(container_name, blob_name, source_url)
+
+    def get_blob_copy_status(self, account_name, account_key, container_name, blob_name,
+                             subscription=None):  # pylint: disable=unused-argument
+        """ returns the status and the progress ('<bytes copied>/<total bytes>') of the copy to the blob """
+        blob = self._get_blob_service(account_name, account_key).get_blob_properties(container_name, blob_name)
+        return blob.properties.copy.status, blob.properties.copy.progress
+
+    def create_image(self, resource_group_name, name, location, os_type, snapshot_id, tags=None,
+                     subscription=None):
+        from azure.cli.core.profiles import ResourceType
+        Image, ImageStorageProfile, ImageOSDisk, SubResource = self._get_models(
+            ResourceType.MGMT_COMPUTE, 'Image', 'ImageStorageProfile', 'ImageOSDisk', 'SubResource',
+            operation_group='images')
+        os_disk = ImageOSDisk(os_type=os_type, os_state='Generalized', snapshot=SubResource(id=snapshot_id))
+        image = Image(location=location, storage_profile=ImageStorageProfile(os_disk=os_disk),
+                      tags=_get_creation_tags(tags))
+        return todict(self._wait(self._compute(subscription).images, 'create_or_update',
+                                 resource_group_name, name, image))
@@ -0,0 +1,307 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from knack.log import get_logger
+
+from azext_imagecopy.create_target import (TARGET_STEPS, STEP_STORAGE_ACCOUNT, STEP_BLOB_COPY,
+                                           get_target_storage_account_key, poll_target_copy)
+
+logger = get_logger(__name__)
+
+COPY_STATE_DIR = 'imagecopy'
+COPY_STATE_VERSION = 1
+
+# The ARM calls running at the same time in a subscription
+MAX_ARM_CALLS_PER_SUBSCRIPTION = 4
+
+# The fields of a target copy kept in the state file, the storage account key is listed again instead
+PERSISTED_TARGET_FIELDS = ['location', 'subscription', 'step', 'storage_account_name', 'blob_endpoint',
+                           'container_name', 'blob_name', 'snapshot_id', 'image_id']
+
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+
+
+def get_copy_state_path(*copy_args):
+    """ the state file of a copy is named after the arguments identifying the source and the targets """
+    from azure.cli.core._environment import get_config_dir
+    digest = hashlib.sha1(json.dumps(copy_args).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(get_config_dir(), COPY_STATE_DIR, '{}.json'.format(digest))
+
+
+class CopyState(object):
+    """ the steps completed by a copy in the source and in every target location, saved after every step """
+
+    def __init__(self, path):
+        self.path = path
+        self.source = {}
+        self.targets = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as state_file:
+                data = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == COPY_STATE_VERSION:
+            self.source = data.get('source', {})
+            self.targets = data.get('targets', {})
+
+    @property
+    def resumed(self):
+        return bool(self.source or self.targets)
+
+    def get_target_copy(self, location, subscription):
+        target_copy = dict(self.targets.get(location, {}))
+        target_copy.update({'location': location, 'subscription': subscription})
+        return target_copy
+
+    def complete_source_step(self, step):
+        with self._lock:
+            self.source[step] = True
+            self._save()
+
+    def complete_target_step(self, target_copy, step):
+        with self._lock:
+            target_copy['step'] = step
+            self.targets[target_copy['location']] = {k: target_copy[k] for k in PERSISTED_TARGET_FIELDS
+                                                     if k in target_copy}
+            self._save()
+
+    def _save(self):
+        state_dir = os.path.dirname(self.path)
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as state_file:
+            json.dump({'version': COPY_STATE_VERSION, 'source': self.source, 'targets': self.targets}, state_file)
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+class SubscriptionThrottle(object):
+    """
+    limits the number of ARM calls running at the same time in every subscription. A call waiting for a long
+    running operation gives its slot back while it waits, so that only the requests sent to ARM are limited.
+    """
+
+    def __init__(self, max_calls=MAX_ARM_CALLS_PER_SUBSCRIPTION):
+        self.max_calls = max_calls
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._held = threading.local()
+
+    def get(self, subscription):
+        with self._lock:
+            if subscription not in self._semaphores:
+                self._semaphores[subscription] = threading.BoundedSemaphore(self.max_calls)
+            return self._semaphores[subscription]
+
+    @contextmanager
+    def acquire(self, subscription):
+        semaphore = self.get(subscription)
+        with semaphore:
+            self._held.semaphore = semaphore
+            try:
+                yield
+            finally:
+                self._held.semaphore = None
+
+    @contextmanager
+    def released(self):
+        """ gives back the slot held by the current thread, if any, until the end of the block """
+        semaphore = getattr(self._held, 'semaphore', None)
+        if semaphore is None:
+            yield
+            return
+        semaphore.release()
+        try:
+            yield
+        finally:
+            semaphore.acquire()
+
+
+class ThrottledEngine(object):
+    """
+    runs the ARM calls of an engine through the throttle of their subscription. An engine with a 'throttle'
+    attribute gets the throttle, to give its slot back while it waits for a long running operation.
+    """
+
+    def __init__(self, engine, throttle):
+        self._engine = engine
+        self._throttle = throttle
+        if hasattr(engine, 'throttle'):
+            engine.throttle = throttle
+
+    def __getattr__(self, name):
+        attr = getattr(self._engine, name)
+        if not callable(attr) or name in self._engine.unthrottled_operations:
+            return attr
+
+        def _throttled(*args, **kwargs):
+            with self._throttle.acquire(kwargs.get('subscription')):
+                return attr(*args, **kwargs)
+        return _throttled
+
+
+class TargetCopyScheduler(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Runs the steps of the copy to every target location in a pool of threads, a location going on with its next
+    step as soon as the previous one is completed. The blob copies are polled together from the scheduler loop.
+    A failed location doesn't stop the others, its error is kept in the 'error' of its target copy.
+    """
+
+    def __init__(self, engine, state, steps, transient_resource_group_name, parallel_degree=-1,
+                 azure_pool_frequency=5, stream=None, now=time.time):
+        self.engine = engine
+        self.state = state
+        self.steps = steps
+        self.transient_resource_group_name = transient_resource_group_name
+        self.parallel_degree = parallel_degree
+        self.azure_pool_frequency = azure_pool_frequency
+        self.stream = stream or sys.stderr
+        self.now = now
+        self.target_copies = []
+        self._running = {}
+        self._polling = []
+        self._start_time = None
+        self._last_table = None
+
+    def run(self, target_copies):
+        self.target_copies = target_copies
+        self._start_time = self.now()
+        max_workers = len(target_copies) if self.parallel_degree == -1 else self.parallel_degree
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(target_copies))))
+        try:
+            for target_copy in target_copies:
+                target_copy['status'] = STATUS_RUNNING
+                if target_copy.get('step'):
+                    logger.warning("%s - Resuming after the %s step", target_copy['location'],
+                                   target_copy['step'].replace('_', ' '))
+                self._schedule_next_step(executor, target_copy)
+            self._loop(executor)
+        except KeyboardInterrupt:
+            for future in self._running:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+            self.print_progress()
+        return target_copies
+
+    def _loop(self, executor):
+        next_poll = self.now()
+        while self._running or self._polling:
+            timeout = max(0, next_poll - self.now()) if self._polling else None
+            if self._running:
+                done, _ = wait(list(self._running), timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(timeout)
+                done = []
+
+            for future in done:
+                target_copy = self._running.pop(future)
+                try:
+                    future.result()
+                except Exception as ex:  # pylint: disable=broad-except
+                    self._fail(target_copy, ex)
+                else:
+                    self._schedule_next_step(executor, target_copy)
+
+            if self._polling and self.now() >= next_poll:
+                self._poll_copies(executor)
+                next_poll = self.now() + self.azure_pool_frequency
+            self.print_progress(changed_only=True)
+
+    def _poll_copies(self, executor):
+        for target_copy in list(self._polling):
+            try:
+                copy_status = poll_target_copy(self.engine, target_copy)
+            except Exception as ex:  # pylint: disable=broad-except
+                self._polling.remove(target_copy)
+                if target_copy.get('copy_status') not in (None, 'pending', 'success'):
+                    # the blob copy failed or was aborted, a resumed copy starts it again
+                    self.state.complete_target_step(target_copy, STEP_STORAGE_ACCOUNT)
+                self._fail(target_copy, ex)
+                continue
+            if copy_status == 'success':
+                self._polling.remove(target_copy)
+                logger.warning("%s - Copy time: %s", target_copy['location'],
+                               datetime.timedelta(seconds=int(self.now() - self._start_time)))
+                self.state.complete_target_step(target_copy, STEP_BLOB_COPY)
+                self._schedule_next_step(executor, target_copy)
+
+    def _get_next_step(self, target_copy):
+        completed = TARGET_STEPS.index(target_copy['step']) + 1 if target_copy.get('step') else 0
+        return next((step for step in TARGET_STEPS[completed:] if step in self.steps), None)
+
+    def _schedule_next_step(self, executor, target_copy):
+        step = self._get_next_step(target_copy)
+        if step is None:
+            target_copy['status'] = STATUS_SUCCEEDED
+        elif step != STEP_BLOB_COPY:
+            self._running[executor.submit(self._run_step, target_copy, step)] = target_copy
+        elif not target_copy.get('storage_account_key'):
+            # a resumed copy gets the key of its storage account before it is polled
+            self._running[executor.submit(get_target_storage_account_key, self.engine, target_copy,
+                                          self.transient_resource_group_name)] = target_copy
+        else:
+            self._polling.append(target_copy)
+
+    def _run_step(self, target_copy, step):
+        self.steps[step](self.engine, target_copy)
+        self.state.complete_target_step(target_copy, step)
+
+    @staticmethod
+    def _fail(target_copy, ex):
+        logger.error("%s - %s", target_copy['location'], ex)
+        target_copy['status'] = STATUS_FAILED
+        target_copy['error'] = str(ex) or type(ex).__name__
+
+    def format_progress(self):
+        rows = [('Location', 'Step', 'Copy', 'Elapsed', 'Status')]
+        elapsed = datetime.timedelta(seconds=int(self.now() - self._start_time))
+        for target_copy in self.target_copies:
+            if target_copy['status'] == STATUS_RUNNING:
+                step = self._get_next_step(target_copy)
+                step = step.replace('_', ' ') if step else ''
+            else:
+                step = ''
+            copy_progress = target_copy.get('copy_progress')
+            if copy_progress is None and target_copy.get('step') and \
+                    TARGET_STEPS.index(target_copy['step']) >= TARGET_STEPS.index(STEP_BLOB_COPY):
+                copy_progress = 100
+            rows.append((target_copy['location'], step,
+                         '' if copy_progress is None else '{}%'.format(copy_progress),
+                         str(elapsed) if target_copy['status'] == STATUS_RUNNING else '',
+                         target_copy['status']))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return '\n'.join('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+                         for row in rows)
+
+    def print_progress(self, changed_only=False):
+        if not self.target_copies:
+            return
+        table = self.format_progress()
+        # the elapsed time alone doesn't make the table print again
+        summary = [(c['status'], c.get('step'), c.get('copy_progress')) for c in self.target_copies]
+        if changed_only and summary == self._last_table:
+            return
+        self._last_table = summary
+        self.stream.write(table + '\n')
+        self.stream.flush()
@@ -0,0 +1,203 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from knack.util import CLIError
+from azure.cli.core.mock import DummyCli
+from azure.cli.core.profiles import ResourceType
+
+from azext_imagecopy.create_target import poll_target_copy
+from azext_imagecopy.custom import imagecopy
+from azext_imagecopy.engines import SdkEngine
+from azext_imagecopy.scheduler import SubscriptionThrottle, ThrottledEngine
+
+BLOB_SERVICE = 'azure.multiapi.storage.v2018_11_09.blob.BlockBlobService'
+
+
+class _Resource(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, resource_id):
+        self.id = resource_id
+
+
+def _poller(result=None):
+    return mock.MagicMock(**{'result.return_value': result})
+
+
+def _copy_properties(status, progress):
+    blob = mock.MagicMock()
+    blob.properties.copy.status = status
+    blob.properties.copy.progress = progress
+    return blob
+
+
+class _ManagementClients(object):
+    """ the compute, storage and resource clients returned by get_mgmt_service_client """
+
+    def __init__(self, source_image=None):
+        self.compute = mock.MagicMock()
+        self.compute.images.get.return_value = source_image
+        self.compute.snapshots.begin_create_or_update.side_effect = \
+            lambda resource_group_name, name, snapshot: _poller(_Resource('/snapshots/' + name))
+        self.compute.snapshots.begin_grant_access.return_value = _poller(mock.MagicMock(access_sas='https://sas'))
+        self.compute.images.begin_create_or_update.side_effect = \
+            lambda resource_group_name, name, image: _poller(_Resource('/images/' + name))
+        self.storage = mock.MagicMock()
+        self.storage.storage_accounts.begin_create.side_effect = lambda resource_group_name, name, parameters: \
+            _poller(mock.MagicMock(**{'primary_endpoints.blob': 'https://{}.blob.core.windows.net/'.format(name)}))
+        self.storage.storage_accounts.list_keys.return_value.keys = [mock.MagicMock(value='key')]
+        self.resources = mock.MagicMock()
+        self.resources.resource_groups.check_existence.return_value = False
+        self.subscription_ids = []
+
+    def get_client(self, _, resource_type, subscription_id=None):
+        self.subscription_ids.append(subscription_id)
+        return {ResourceType.MGMT_COMPUTE: self.compute,
+                ResourceType.MGMT_STORAGE: self.storage,
+                ResourceType.MGMT_RESOURCE_RESOURCES: self.resources}[resource_type]
+
+
+class TestSdkEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = _ManagementClients()
+        self.block_blob_service = mock.MagicMock()
+        for patcher in [mock.patch('azure.cli.core.commands.client_factory.get_mgmt_service_client',
+                                   self.clients.get_client),
+                        mock.patch('azure.cli.core._profile.Profile', **{
+                            'return_value.get_subscription_id.side_effect': lambda sub=None: sub or 'sub1'}),
+                        mock.patch(BLOB_SERVICE, self.block_blob_service)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.engine = SdkEngine(DummyCli())
+
+    def test_create_snapshot(self):
+        snapshot = self.engine.create_snapshot('rg1', 'snapshot1', 'eastus', '/disks/disk1')
+        self.assertEqual(snapshot['id'], '/snapshots/snapshot1')
+        resource_group_name, name, model = self.clients.compute.snapshots.begin_create_or_update.call_args[0]
+        self.assertEqual((resource_group_name, name, model.location), ('rg1', 'snapshot1', 'eastus'))
+        self.assertEqual((model.creation_data.create_option, model.creation_data.source_resource_id),
+                         ('Copy', '/disks/disk1'))
+        self.assertEqual(model.tags, {'created_by': 'image-copy-extension'})
+
+        # a blob is imported from its storage account
+        self.engine.create_snapshot('rg1', 'snapshot2', 'eastus', 'https://account1.blob.core.windows.net/vhds/a.vhd',
+                                    '/storageAccounts/account1', subscription='sub2')
+        model = self.clients.compute.snapshots.begin_create_or_update.call_args[0][2]
+        self.assertEqual((model.creation_data.create_option, model.creation_data.source_uri,
+                          model.creation_data.storage_account_id),
+                         ('Import', 'https://account1.blob.core.windows.net/vhds/a.vhd', '/storageAccounts/account1'))
+        # the clients are created once per subscription
+        self.engine.create_snapshot('rg1', 'snapshot3', 'eastus', '/disks/disk3')
+        self.assertEqual(self.clients.subscription_ids, ['sub1', 'sub2'])
+
+    def test_only_the_requests_are_throttled(self):
+        # the long running operations end together, which needs them to run at the same time
+        barrier = threading.Barrier(3, timeout=5)
+        self.clients.compute.snapshots.begin_create_or_update.side_effect = \
+            lambda resource_group_name, name, snapshot: mock.MagicMock(**{
+                'result.side_effect': lambda: barrier.wait() and _Resource('/snapshots/' + name)})
+        engine = ThrottledEngine(self.engine, SubscriptionThrottle(max_calls=1))
+        errors = []
+
+        def _create_snapshot(name):
+            try:
+                engine.create_snapshot('rg1', name, 'eastus', '/disks/disk1', subscription='sub2')
+            except threading.BrokenBarrierError as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=_create_snapshot, args=('snapshot{}'.format(i),)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.clients.compute.snapshots.begin_create_or_update.call_count, 3)
+
+    def test_blob_copy_polling(self):
+        blob_service = self.block_blob_service.return_value
+        blob_service.get_blob_properties.side_effect = [_copy_properties('pending', '0/200'),
+                                                        _copy_properties('pending', '100/200'),
+                                                        _copy_properties('success', '200/200')]
+        target_copy = {'location': 'westus', 'subscription': None, 'storage_account_name': 'westus1',
+                       'storage_account_key': 'key', 'container_name': 'snapshots', 'blob_name': 'a.vhd'}
+
+        self.engine.create_container('westus1', 'key', 'snapshots')
+        self.engine.start_blob_copy('westus1', 'key', 'snapshots', 'a.vhd', 'https://source/a?sas', 3600)
+        statuses = [poll_target_copy(self.engine, target_copy) for _ in range(3)]
+
+        self.assertEqual(statuses, ['pending', 'pending', 'success'])
+        self.assertEqual(target_copy['copy_progress'], 100)
+        blob_service.create_container.assert_called_once_with('snapshots')
+        blob_service.copy_blob.assert_called_once_with('snapshots', 'a.vhd', 'https://source/a?sas')
+        blob_service.get_blob_properties.assert_called_with('snapshots', 'a.vhd')
+        # a single blob service per account, sharing the pool of connections of the engine
+        self.block_blob_service.assert_called_once()
+        self.assertIsNotNone(self.block_blob_service.call_args[1]['request_session'])
+
+        blob_service.get_blob_properties.side_effect = [_copy_properties('failed', '10/200')]
+        with self.assertRaisesRegex(CLIError, 'Blob copy failed'):
+            poll_target_copy(self.engine, target_copy)
+
+
+class TestImageCopyWithSdkEngine(unittest.TestCase):
+
+    def setUp(self):
+        from azure.cli.core.profiles import get_sdk
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        cli_ctx = DummyCli()
+        Image, ImageStorageProfile, ImageOSDisk, SubResource = get_sdk(
+            cli_ctx, ResourceType.MGMT_COMPUTE, 'Image', 'ImageStorageProfile', 'ImageOSDisk', 'SubResource',
+            mod='models', operation_group='images')
+        self.clients = _ManagementClients(Image(location='eastus', storage_profile=ImageStorageProfile(
+            os_disk=ImageOSDisk(os_type='Linux', os_state='Generalized', snapshot=SubResource(id='/snapshots/s1')),
+            data_disks=[])))
+        self.block_blob_service = mock.MagicMock()
+        for patcher in [mock.patch('azure.cli.core.commands.client_factory.get_mgmt_service_client',
+                                   self.clients.get_client),
+                        mock.patch('azure.cli.core._profile.Profile', **{
+                            'return_value.get_subscription_id.return_value': 'sub1'}),
+                        mock.patch(BLOB_SERVICE, self.block_blob_service),
+                        mock.patch('azure.cli.core._environment.get_config_dir', return_value=self.config_dir)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cmd = mock.MagicMock(cli_ctx=cli_ctx)
+
+    def _imagecopy(self, copy_status):
+        blob_service = self.block_blob_service.return_value
+        blob_service.get_blob_properties.return_value = _copy_properties(copy_status, '100/100')
+        imagecopy(self.cmd, 'rg1', 'image1', ['westus'], 'rg2', temporary_resource_group_name='image-copy-tmp',
+                  cleanup=True, export_as_snapshot=False)
+
+    def test_failed_copy_keeps_the_temporary_resources(self):
+        with self.assertRaisesRegex(CLIError, 'The copy to westus failed'):
+            self._imagecopy('failed')
+
+        self.clients.resources.resource_groups.begin_delete.assert_not_called()
+        self.clients.compute.snapshots.begin_revoke_access.assert_not_called()
+        self.clients.compute.snapshots.begin_delete.assert_not_called()
+        self.clients.compute.images.begin_create_or_update.assert_not_called()
+        # the state of the copy is kept to resume it
+        self.assertTrue(os.listdir(os.path.join(self.config_dir, 'imagecopy')))
+
+    def test_cleanup_after_the_copy(self):
+        self._imagecopy('success')
+
+        self.assertEqual(self.clients.compute.images.begin_create_or_update.call_args[0][:2],
+                         ('rg2', 'image1-westus'))
+        self.clients.resources.resource_groups.begin_delete.assert_called_once_with('image-copy-tmp')
+        self.clients.compute.snapshots.begin_revoke_access.assert_called_once_with('rg1', 'image1_os_disk_snapshot')
+        self.clients.compute.snapshots.begin_delete.assert_called_once_with('rg1', 'image1_os_disk_snapshot')
+        self.assertFalse(os.listdir(os.path.join(self.config_dir, 'imagecopy')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from azext_imagecopy.create_target import (create_target_storage_account, start_target_copy, create_target_snapshot,
+                                           STEP_STORAGE_ACCOUNT, STEP_COPY_STARTED, STEP_BLOB_COPY, STEP_SNAPSHOT)
+from azext_imagecopy.scheduler import (CopyState, SubscriptionThrottle, ThrottledEngine, TargetCopyScheduler,
+                                       STATUS_SUCCEEDED, STATUS_FAILED)
+
+
+class _CopyEngine(object):
+    """ completes every step at once and reports the progress of the copies from a list per storage account """
+
+    unthrottled_operations = ('get_storage_account_id', 'create_container', 'start_blob_copy',
+                              'get_blob_copy_status')
+
+    def __init__(self, copies, failing_locations=()):
+        self.copies = copies
+        self.failing_locations = failing_locations
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _call(self, name, *args):
+        with self.lock:
+            self.calls.append((name,) + args)
+
+    def create_storage_account(self, resource_group_name, name, location, subscription=None):
+        self._call('create_storage_account', location)
+        if location in self.failing_locations:
+            raise RuntimeError('quota exceeded')
+        return 'https://{}.blob.core.windows.net/'.format(name)
+
+    def get_storage_account_key(self, resource_group_name, name, subscription=None):
+        self._call('get_storage_account_key', name)
+        return 'key'
+
+    def create_container(self, account_name, account_key, container_name, subscription=None):
+        self._call('create_container', account_name)
+
+    def start_blob_copy(self, account_name, account_key, container_name, blob_name, source_url, timeout,
+                        subscription=None):
+        self._call('start_blob_copy', account_name)
+
+    def get_blob_copy_status(self, account_name, account_key, container_name, blob_name, subscription=None):
+        self._call('get_blob_copy_status', account_name[:6])
+        return self.copies[account_name[:6]].pop(0)
+
+    @staticmethod
+    def get_storage_account_id(blob_path, resource_group_name, subscription=None):
+        return '/subscriptions/sub1/resourceGroups/{}/providers/Microsoft.Storage/storageAccounts/{}'.format(
+            resource_group_name, blob_path.split('.')[0].split('/')[-1])
+
+    def create_snapshot(self, resource_group_name, name, location, source, source_storage_account_id=None,
+                        subscription=None):
+        self._call('create_snapshot', location)
+        return {'id': '/snapshots/' + name}
+
+
+def _get_steps():
+    return {
+        STEP_STORAGE_ACCOUNT: lambda engine, target_copy: create_target_storage_account(engine, target_copy, 'rg1'),
+        STEP_COPY_STARTED: lambda engine, target_copy: start_target_copy(
+            engine, target_copy, 'rg1', 'image1_os_disk_snapshot', 'https://source/snapshot?sas', 3600),
+        STEP_BLOB_COPY: None,
+        STEP_SNAPSHOT: lambda engine, target_copy: create_target_snapshot(
+            engine, target_copy, 'rg1', 'image1_os_disk_snapshot', 'rg2', True)
+    }
+
+
+class TestTargetCopyScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.state_dir, 'imagecopy', 'copy.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.state_dir)
+
+    def _run(self, engine, locations, stream=None):
+        state = CopyState(self.state_path)
+        scheduler = TargetCopyScheduler(engine, state, _get_steps(), 'rg1', azure_pool_frequency=0,
+                                        stream=stream or io.StringIO())
+        return scheduler.run([state.get_target_copy(location, None) for location in locations])
+
+    def test_copies_are_polled_together(self):
+        engine = _CopyEngine({
+            'eastus': [('pending', '0/100'), ('success', '100/100')],
+            'westus': [('pending', '10/100'), ('pending', '50/100'), ('success', '100/100')]
+        })
+        stream = io.StringIO()
+        target_copies = self._run(engine, ['eastus', 'westus'], stream)
+
+        self.assertEqual([c['status'] for c in target_copies], [STATUS_SUCCEEDED, STATUS_SUCCEEDED])
+        self.assertEqual([c['snapshot_id'] for c in target_copies],
+                         ['/snapshots/image1_os_disk_snapshot-eastus', '/snapshots/image1_os_disk_snapshot-westus'])
+        self.assertEqual(len([call for call in engine.calls if call[0] == 'get_blob_copy_status']), 5)
+        self.assertIn('Location', stream.getvalue())
+        self.assertIn('succeeded', stream.getvalue().splitlines()[-1])
+
+    def test_failed_location_does_not_stop_the_others(self):
+        engine = _CopyEngine({'westus': [('success', '100/100')]}, failing_locations=['eastus'])
+        target_copies = self._run(engine, ['eastus', 'westus'])
+
+        self.assertEqual([c['status'] for c in target_copies], [STATUS_FAILED, STATUS_SUCCEEDED])
+        self.assertEqual(target_copies[0]['error'], 'quota exceeded')
+
+    def test_copy_is_resumed_after_the_last_completed_step(self):
+        engine = _CopyEngine({'eastus': [('failed', '10/100')]})
+        target_copies = self._run(engine, ['eastus'])
+        self.assertEqual(target_copies[0]['status'], STATUS_FAILED)
+        storage_account_name = target_copies[0]['storage_account_name']
+
+        state = CopyState(self.state_path)
+        self.assertTrue(state.resumed)
+        # the failed blob copy is started again
+        self.assertEqual(state.targets['eastus']['step'], STEP_STORAGE_ACCOUNT)
+        self.assertNotIn('storage_account_key', state.targets['eastus'])
+
+        # the storage account isn't created again and its key is listed before the copy is started
+        engine = _CopyEngine({'eastus': [('success', '100/100')]})
+        target_copies = self._run(engine, ['eastus'])
+        self.assertEqual(target_copies[0]['status'], STATUS_SUCCEEDED)
+        self.assertEqual([call[0] for call in engine.calls],
+                         ['get_storage_account_key', 'create_container', 'start_blob_copy', 'get_blob_copy_status',
+                          'create_snapshot'])
+        self.assertEqual(CopyState(self.state_path).targets['eastus']['storage_account_name'], storage_account_name)
+
+    def test_copy_is_polled_again_after_an_interruption(self):
+        engine = _CopyEngine({'eastus': [('pending', '10/100')]})
+        state = CopyState(self.state_path)
+        target_copy = state.get_target_copy('eastus', None)
+        _get_steps()[STEP_STORAGE_ACCOUNT](engine, target_copy)
+        state.complete_target_step(target_copy, STEP_STORAGE_ACCOUNT)
+        _get_steps()[STEP_COPY_STARTED](engine, target_copy)
+        state.complete_target_step(target_copy, STEP_COPY_STARTED)
+
+        # the copy still running is polled without being started again
+        engine = _CopyEngine({'eastus': [('success', '100/100')]})
+        target_copies = self._run(engine, ['eastus'])
+        self.assertEqual(target_copies[0]['status'], STATUS_SUCCEEDED)
+        self.assertEqual([call[0] for call in engine.calls],
+                         ['get_storage_account_key', 'get_blob_copy_status', 'create_snapshot'])
+
+
+class TestSubscriptionThrottle(unittest.TestCase):
+
+    def test_arm_calls_are_limited_per_subscription(self):
+        running = {'sub1': 0, 'sub2': 0}
+        peak = {'sub1': 0, 'sub2': 0}
+        lock = threading.Lock()
+
+        class _Engine(object):
+            unthrottled_operations = ()
+
+            @staticmethod
+            def create_resource_group(name, location, subscription=None):
+                with lock:
+                    running[subscription] += 1
+                    peak[subscription] = max(peak[subscription], running[subscription])
+                time.sleep(0.02)
+                with lock:
+                    running[subscription] -= 1
+
+        engine = ThrottledEngine(_Engine(), SubscriptionThrottle(max_calls=2))
+        threads = [threading.Thread(target=engine.create_resource_group, args=('rg', 'eastus'),
+                                    kwargs={'subscription': subscription})
+                   for subscription in ['sub1', 'sub2'] * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak, {'sub1': 2, 'sub2': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@
 
 import json
 import os
+import sys
 import yaml  # pylint: disable=import-error
 
 from azure.cli.core import MainCommandsLoader
@@ -13,9 +14,13 @@ from knack.help import REQUIRED_TAG
 from knack.help_files import helps
 from knack.log import get_logger
 
+from .gather_commands import build_command_index, save_command_index
 
 logger = get_logger(__name__)
 
+# bump whenever the layout of the cached command table changes
+SOURCES_FORMAT = 1
+
 
 class AzInteractiveCommandsLoader(MainCommandsLoader):  # pylint: disable=too-few-public-methods
 
@@ -62,6 +67,104 @@ class AzInteractiveCommandsLoader(MainCommandsLoader):  # pylint: disable=too-fe
                 self.cli_ctx.invocation.commands_loader.extra_argument_registry = self.extra_argument_registry
                 loader._update_command_definitions()  # pylint: disable=protected-access
 
+    def load_extension_command_tables(self, extension_names):
+        """ loads the command tables of the given extensions only """
+        from azure.cli.core.commands import _load_extension_command_loader, ExtensionCommandSource
+        from azure.cli.core.extension import get_extension, get_extension_path, get_extension_modname
+
+        for ext_name in extension_names:
+            ext = get_extension(ext_name)
+            ext_dir = ext.path or get_extension_path(ext_name)
+            if ext_dir not in sys.path:
+                sys.path.append(ext_dir)
+            ext_mod = get_extension_modname(ext_name, ext_dir=ext_dir)
+            command_table, group_table = _load_extension_command_loader(self, None, ext_mod)
+            for cmd in command_table.values():
+                cmd.command_source = ExtensionCommandSource(extension_name=ext_name)
+            self.command_table.update(command_table)
+            self.command_group_table.update(group_table)
+
+
+def get_command_sources():
+    """ fingerprints what the command table is loaded from, the modules by the version of the CLI """
+    from azure.cli.core import __version__ as core_version
+    from azure.cli.core.extension import get_extensions
+
+    return {
+        'format': SOURCES_FORMAT,
+        'core': core_version,
+        'extensions': {ext.name: ext.version for ext in get_extensions()}
+    }
+
+
+def get_sources_file(help_file):
+    """ the sources of the cached command table are stored next to the help file """
+    return os.path.splitext(help_file)[0] + '_sources.json'
+
+
+def merge_command_table_data(data, stale_commands, new_data):
+    """ replaces the stale commands of the cached help data with new_data and drops the groups left empty """
+    stale_groups = set()
+    for command_name in stale_commands:
+        data.pop(command_name, None)
+        words = command_name.split()
+        stale_groups.update(' '.join(words[:i]) for i in range(1, len(words)))
+    data.update(new_data)
+
+    for command_name in data:
+        words = command_name.split()
+        stale_groups.difference_update(' '.join(words[:i]) for i in range(1, len(words)))
+    for group_name in stale_groups:
+        data.pop(group_name, None)
+    return data
+
+
+def _get_extension_commands(cmd_table):
+    """ maps each extension to the commands it provides and whether it overrides any command of a module """
+    extension_commands = {}
+    overrides = set()
+    for command_name, cmd in cmd_table.items():
+        ext_name = getattr(getattr(cmd, 'command_source', None), 'extension_name', None)
+        if ext_name:
+            extension_commands.setdefault(ext_name, []).append(command_name)
+            if cmd.command_source.overrides_command:
+                overrides.add(ext_name)
+    return extension_commands, sorted(overrides)
+
+
+def _get_command_table_data(cmd_table):
+    """ extracts the descriptions and parameters of the commands to dump """
+    cmd_table_data = {}
+    for command_name, cmd in cmd_table.items():
+
+        try:
+            command_description = cmd.description
+            if callable(command_description):
+                command_description = command_description()
+
+            # checking all the parameters for a single command
+            parameter_metadata = {}
+            for arg in cmd.arguments.values():
+                options = {
+                    'name': [name for name in arg.options_list],
+                    'required': REQUIRED_TAG if arg.type.settings.get('required') else '',
+                    'help': arg.type.settings.get('help') or ''
+                }
+                # the key is the first alias option
+                if arg.options_list:
+                    parameter_metadata[arg.options_list[0]] = options
+
+            cmd_table_data[command_name] = {
+                'parameters': parameter_metadata,
+                'help': command_description,
+                'examples': ''
+            }
+        except (ImportError, ValueError):
+            pass
+
+    load_help_files(cmd_table_data)
+    return cmd_table_data
+
 
 # pylint: disable=too-few-public-methods
 class FreshTable(object):
@@ -74,61 +177,119 @@ class FreshTable(object):
     def __init__(self, shell_ctx):
         self.shell_ctx = shell_ctx
 
-    def dump_command_table(self, shell_ctx=None):
-        """ dumps the command table """
+    def load_command_table(self, shell_ctx=None, extension_names=None):
+        """ loads the command table with its arguments, of the given extensions only if any """
         from azure.cli.core.commands.arm import register_global_subscription_argument, register_ids_argument
         from knack import events
-        import timeit
 
-        start_time = timeit.default_timer()
         shell_ctx = shell_ctx or self.shell_ctx
         main_loader = AzInteractiveCommandsLoader(shell_ctx.cli_ctx)
 
-        main_loader.load_command_table(None)
+        if extension_names is None:
+            main_loader.load_command_table(None)
+        else:
+            main_loader.load_extension_command_tables(extension_names)
         main_loader.load_arguments(None)
         register_global_subscription_argument(shell_ctx.cli_ctx)
         register_ids_argument(shell_ctx.cli_ctx)
         shell_ctx.cli_ctx.raise_event(events.EVENT_INVOKER_POST_CMD_TBL_CREATE, commands_loader=main_loader)
-        cmd_table = main_loader.command_table
-
-        cmd_table_data = {}
-        for command_name, cmd in cmd_table.items():
-
-            try:
-                command_description = cmd.description
-                if callable(command_description):
-                    command_description = command_description()
-
-                # checking all the parameters for a single command
-                parameter_metadata = {}
-                for arg in cmd.arguments.values():
-                    options = {
-                        'name': [name for name in arg.options_list],
-                        'required': REQUIRED_TAG if arg.type.settings.get('required') else '',
-                        'help': arg.type.settings.get('help') or ''
-                    }
-                    # the key is the first alias option
-                    if arg.options_list:
-                        parameter_metadata[arg.options_list[0]] = options
-
-                cmd_table_data[command_name] = {
-                    'parameters': parameter_metadata,
-                    'help': command_description,
-                    'examples': ''
-                }
-            except (ImportError, ValueError):
-                pass
+        if extension_names is None:
+            FreshTable.loader = main_loader
+        return main_loader
 
-        load_help_files(cmd_table_data)
+    def dump_command_table(self, shell_ctx=None):
+        """ dumps the command table """
+        import timeit
+
+        start_time = timeit.default_timer()
+        shell_ctx = shell_ctx or self.shell_ctx
+        sources = get_command_sources()
+        cmd_table = self.load_command_table(shell_ctx).command_table
+        cmd_table_data = _get_command_table_data(cmd_table)
         elapsed = timeit.default_timer() - start_time
         logger.debug('Command table dumped: %s sec', elapsed)
-        FreshTable.loader = main_loader
 
+        sources['commands'], sources['overrides'] = _get_extension_commands(cmd_table)
+        self._save(shell_ctx, cmd_table_data, sources)
+
+    def update_command_table(self, shell_ctx=None):
+        """
+        brings the cached command table up to date with the installed modules and extensions, only reloading the
+        extensions which were added, removed or updated since it was dumped. returns whether the cache changed
+        """
+        import timeit
+
+        shell_ctx = shell_ctx or self.shell_ctx
+        help_path = os.path.join(get_cache_dir(shell_ctx), shell_ctx.config.get_help_files())
+        sources = get_command_sources()
+        try:
+            with open(get_sources_file(help_path), 'r') as sources_file:
+                cached_sources = json.load(sources_file)
+            with open(help_path, 'r') as help_file:
+                data = json.load(help_file)
+        except (OSError, ValueError):
+            cached_sources = data = None
+
+        if not cached_sources or any(cached_sources.get(key) != sources[key] for key in ['format', 'core']):
+            self.dump_command_table(shell_ctx)
+            return True
+
+        cached_extensions = cached_sources['extensions']
+        changed = [name for name, version in cached_extensions.items()
+                   if sources['extensions'].get(name) != version]
+        added = [name for name in sources['extensions'] if name not in cached_extensions]
+        if not changed and not added:
+            logger.debug('Command table cache is up to date')
+            return False
+        if any(name in cached_sources['overrides'] for name in changed):
+            # the commands of the modules they replace are not in the cache anymore
+            self.dump_command_table(shell_ctx)
+            return True
+
+        start_time = timeit.default_timer()
+        reload_names = [name for name in changed + added if name in sources['extensions']]
+        try:
+            cmd_table = self.load_command_table(shell_ctx, extension_names=reload_names).command_table
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug('Unable to reload extensions %s, reloading all the commands: %s', reload_names, ex)
+            self.dump_command_table(shell_ctx)
+            return True
+
+        stale_commands = set()
+        for ext_name in changed:
+            stale_commands.update(cached_sources['commands'].pop(ext_name, []))
+        if any(name in data and 'parameters' in data[name] and name not in stale_commands for name in cmd_table):
+            # an extension now overrides a command of a module
+            self.dump_command_table(shell_ctx)
+            return True
+
+        merge_command_table_data(data, stale_commands, _get_command_table_data(cmd_table))
+        logger.debug('Command table of %s updated: %s sec', reload_names, timeit.default_timer() - start_time)
+
+        cached_sources['commands'].update(_get_extension_commands(cmd_table)[0])
+        cached_sources['extensions'] = sources['extensions']
+        self._save(shell_ctx, data, cached_sources)
+        return True
+
+    @staticmethod
+    def _save(shell_ctx, cmd_table_data, sources):
         # dump into the cache file
         command_file = shell_ctx.config.get_help_files()
-        with open(os.path.join(get_cache_dir(shell_ctx), command_file), 'w') as help_file:
+        help_path = os.path.join(get_cache_dir(shell_ctx), command_file)
+        with open(help_path, 'w') as help_file:
             json.dump(cmd_table_data, help_file, default=lambda x: x.target or '', skipkeys=True)
 
+        # pre-build the lookup tables of the shell so that the next start doesn't need to parse the dump
+        try:
+            with open(help_path, 'r') as help_file:
+                save_command_index(build_command_index(json.load(help_file)), help_path)
+        except (OSError, TypeError, KeyError, ValueError) as ex:
+            logger.debug('Unable to save the command index: %s', ex)
+
+        # written last, a cache interrupted before this point is rebuilt from scratch
+        with open(get_sources_file(help_path), 'w') as sources_file:
+            json.dump(sources, sources_file)
+
 
 def load_help_files(data):
     """ loads all the extra information from help files """
@@ -12,6 +12,8 @@ import os
 import re
 import subprocess
 import sys
+import time
+import timeit
 from threading import Thread
 
 from six.moves import configparser
@@ -75,6 +77,15 @@ def space_toolbar(settings_items, empty_space):
     return settings, empty_space
 
 
+def _get_file_stamp(path):
+    """ the modification time and the size of a file, None if it doesn't exist """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
 # pylint: disable=too-many-instance-attributes
 class AzInteractiveShell(object):
 
@@ -122,6 +133,9 @@ class AzInteractiveShell(object):
         self.intermediate_sleep = intermediate_sleep
         self.final_sleep = final_sleep
         self.command_table_thread = None
+        self.warm_invocation = None
+        self._session_stamps = {}
+        self.show_timings = False
 
         # try to consolidate state information here...
         # Used by key bindings and layout
@@ -394,8 +408,24 @@ class AzInteractiveShell(object):
             self.default_command += ' ' + value
         else:
             self.default_command += value
+        self.completer.prefetch_completions(self.default_command)
         return value
 
+    def refresh_completions(self):
+        """ completes the line again once the values of an argument completed in the background are ready """
+        cli = self._cli
+        if cli is None or cli.eventloop is None:
+            return
+
+        def _restart_completion():
+            buffer = cli.current_buffer
+            # the user may be going through the completions already shown
+            if buffer.complete_state and buffer.complete_state.complete_index is not None:
+                return
+            buffer.complete_state = None
+            cli.start_completion()
+        cli.eventloop.call_from_executor(_restart_completion)
+
     def handle_example(self, text, continue_flag):
         """ parses for the tutorial """
         cmd = text.partition(SELECT_SYMBOL['example'])[0].rstrip()
@@ -508,6 +538,9 @@ class AzInteractiveShell(object):
             telemetry.track_query_gesture()
         elif not args:
             continue_flag = True
+        elif args == ['--timings']:
+            continue_flag = True
+            self._toggle_timings()
         elif args[0] == '--version' or args[0] == '-v':
             try:
                 continue_flag = True
@@ -622,9 +655,65 @@ class AzInteractiveShell(object):
         self.history = FileHistory(history_file_path)
         self.cli.buffers[DEFAULT_BUFFER].history = self.history
 
+    def _load_sessions(self):
+        """
+        loads the profile, the configuration and the session of the CLI again when their files changed. The
+        commands loaded by the warm invocation are dropped when the configuration changed, their parsers holding
+        the defaults of the arguments
+        """
+        azure_folder = get_config_dir()
+        if not os.path.exists(azure_folder):
+            os.makedirs(azure_folder)
+        config_changed = False
+        for session, file_name, max_age in [(ACCOUNT, 'azureProfile.json', None), (CONFIG, 'az.json', None),
+                                            (SESSION, 'az.sess', 3600)]:
+            path = os.path.join(azure_folder, file_name)
+            stamp = _get_file_stamp(path)
+            # a session expires once its file is older than max_age
+            expired = max_age and stamp and time.time() - stamp[0] > max_age
+            if stamp is None or expired or self._session_stamps.get(path) != stamp:
+                session.load(path, **({'max_age': max_age} if max_age else {}))
+                config_changed = config_changed or (session is CONFIG and self._session_stamps.get(path) != stamp)
+                self._session_stamps[path] = stamp
+
+        # the defaults of the arguments and the switch of the local context are in the config file of the CLI
+        config_path = self.cli_ctx.config.config_path
+        stamp = _get_file_stamp(config_path)
+        if self._session_stamps.get(config_path) != stamp:
+            config_changed = True
+            self._session_stamps[config_path] = stamp
+        if config_changed and self.warm_invocation is not None:
+            self.warm_invocation.unload()
+
+    def _get_invocation(self):
+        """ the invocation running the commands, reused between them in the warm execution mode """
+        if not self.config.is_warm_execution():
+            return self.cli_ctx.invocation_cls(cli_ctx=self.cli_ctx,
+                                               parser_cls=self.cli_ctx.parser_cls,
+                                               commands_loader_cls=self.cli_ctx.commands_loader_cls,
+                                               help_cls=self.cli_ctx.help_cls)
+        if self.warm_invocation is None:
+            from ._dump_commands import FreshTable
+            from .invocation import WarmCommandInvoker
+            # the commands loaded before the command table of the shell aren't kept, it completes their arguments
+            self.warm_invocation = WarmCommandInvoker(cli_ctx=self.cli_ctx,
+                                                      commands_loader_cls=self.cli_ctx.commands_loader_cls,
+                                                      help_cls=self.cli_ctx.help_cls,
+                                                      keep_loaded=lambda: FreshTable.loader is not None)
+        return self.warm_invocation
+
+    def _toggle_timings(self):
+        self.show_timings = not self.show_timings
+        print("Timings are {}".format('on' if self.show_timings else 'off'), file=self.output)
+
+    def _print_timings(self, timings):
+        print('  '.join('{}: {:.3f}s'.format(phase, timings.get(phase, 0))
+                        for phase in ['parse', 'load', 'execute', 'render']), file=self.output)
+
     def cli_execute(self, cmd):
         """ sends the command to the CLI to be executed """
 
+        timings = {}
         try:
             args = parse_quotes(cmd)
 
@@ -632,19 +721,16 @@ class AzInteractiveShell(object):
                 self.config.set_feedback('yes')
                 self.user_feedback = False
 
-            azure_folder = get_config_dir()
-            if not os.path.exists(azure_folder):
-                os.makedirs(azure_folder)
-            ACCOUNT.load(os.path.join(azure_folder, 'azureProfile.json'))
-            CONFIG.load(os.path.join(azure_folder, 'az.json'))
-            SESSION.load(os.path.join(azure_folder, 'az.sess'), max_age=3600)
-
-            invocation = self.cli_ctx.invocation_cls(cli_ctx=self.cli_ctx,
-                                                     parser_cls=self.cli_ctx.parser_cls,
-                                                     commands_loader_cls=self.cli_ctx.commands_loader_cls,
-                                                     help_cls=self.cli_ctx.help_cls)
+            start_time = timeit.default_timer()
+            self._load_sessions()
+            sessions_time = timeit.default_timer() - start_time
 
             if '--progress' in args:
+                # the command runs while the shell goes on, with an invocation of its own
+                invocation = self.cli_ctx.invocation_cls(cli_ctx=self.cli_ctx,
+                                                         parser_cls=self.cli_ctx.parser_cls,
+                                                         commands_loader_cls=self.cli_ctx.commands_loader_cls,
+                                                         help_cls=self.cli_ctx.help_cls)
                 args.remove('--progress')
                 execute_args = [args]
                 thread = Thread(target=invocation.execute, args=execute_args)
@@ -660,10 +746,19 @@ class AzInteractiveShell(object):
                 self.threads.append(thread)
                 result = None
             else:
-                result = invocation.execute(args)
+                invocation = self._get_invocation()
+                try:
+                    result = invocation.execute(args)
+                finally:
+                    timings = getattr(invocation, 'get_timings', dict)()
+                    timings['load'] = timings.get('load', 0) + sessions_time
+                    if invocation is self.warm_invocation and self.cli_ctx.local_context.is_on:
+                        # the values saved to the local context by the run are defaults of the next runs
+                        invocation.unload()
 
             self.last_exit = 0
             if result and result.result is not None:
+                start_time = timeit.default_timer()
                 if self.output:
                     self.output.write(result)
                     self.output.flush()
@@ -671,11 +766,15 @@ class AzInteractiveShell(object):
                     formatter = self.cli_ctx.output.get_formatter(self.cli_ctx.invocation.data['output'])
                     self.cli_ctx.output.out(result, formatter=formatter, out_file=sys.stdout)
                     self.last = result
+                timings['render'] = timeit.default_timer() - start_time
 
         except Exception as ex:  # pylint: disable=broad-except
             self.last_exit = handle_exception(ex)
         except SystemExit as ex:
             self.last_exit = int(ex.code)
+        finally:
+            if self.show_timings and timings:
+                self._print_timings(timings)
 
     def progress_patch(self, *args, **kwargs):
         """ forces to use the Shell Progress """
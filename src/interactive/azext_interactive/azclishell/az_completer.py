@@ -17,10 +17,15 @@ from prompt_toolkit.completion import Completer, Completion  # pylint: disable=i
 
 from . import configuration
 from .argfinder import ArgsFinder
+from .completion_cache import CompletionCache
+from .completion_index import PrefixIndex
 from .util import parse_quotes
 
 SELECT_SYMBOL = configuration.SELECT_SYMBOL
 
+# how long, in seconds, a key press waits for the values of a completer before they are filled in in the background
+DYNAMIC_COMPLETION_WAIT = 0.1
+
 
 def error_pass(_, message):  # pylint: disable=unused-argument
     return
@@ -34,18 +39,45 @@ def _check_value_muted(_, action, value):
         raise argparse.ArgumentError(action, msg)
 
 
+def _get_weight(text, display_meta):
+    """ weights the completions with required things first the lexicographically"""
+    from knack.help import REQUIRED_TAG
+
+    priority = ''
+    if display_meta and display_meta.startswith(REQUIRED_TAG):
+        priority = ' '  # a space has the lowest ordinance
+    return priority + text
+
+
 def sort_completions(completions_gen):
     """ sorts the completions """
-    from knack.help import REQUIRED_TAG
+    return sorted(completions_gen, key=lambda val: _get_weight(val.text, val.display_meta))
+
+
+def call_completer(completer, prefix, parsed_args):
+    """ calls a completer with whichever of the 3 formats for completers the cli uses it takes """
+    try:
+        return completer(prefix=prefix, action=None, parsed_args=parsed_args)
+    except TypeError:
+        try:
+            return completer(prefix=prefix)
+        except TypeError:
+            try:
+                return completer()
+            except TypeError:
+                return []  # other completion method used
+
 
-    def _get_weight(val):
-        """ weights the completions with required things first the lexicographically"""
-        priority = ''
-        if val.display_meta and val.display_meta.startswith(REQUIRED_TAG):
-            priority = ' '  # a space has the lowest ordinance
-        return priority + val.text
+def is_local_completer(completer):
+    """ whether a completer lists local paths from the prefix, which is cheap and can't be cached by argument """
+    from argcomplete.completers import FilesCompleter, DirectoriesCompleter
+    return isinstance(completer, (FilesCompleter, DirectoriesCompleter))
 
-    return sorted(completions_gen, key=_get_weight)
+
+def get_common_completers():
+    """ the completers used by the arguments of most commands, whose values don't depend on the command """
+    from azure.cli.core.commands.parameters import get_resource_group_completion_list, get_location_completion_list
+    return get_resource_group_completion_list, get_location_completion_list
 
 
 # pylint: disable=too-many-instance-attributes
@@ -88,6 +120,16 @@ class AzCompleter(Completer):
         self.argsfinder = ArgsFinder(self.parser)
         self.cmdtab = {}
 
+        # indexes of the completions, built the first time a command or group is completed
+        self._subcommand_indexes = {}
+        self._param_indexes = {}
+        self._option_to_arg = {}
+        # fall back to the subcommands containing the typed letters in order when none starts with them
+        self.fuzzy = shell_ctx.config.is_fuzzy_completion() if shell_ctx else False
+        # the values of the argument completers, which usually call ARM, completed in the background
+        self.completion_cache = CompletionCache(
+            ttl=shell_ctx.config.get_completion_cache_ttl()) if shell_ctx else CompletionCache()
+
         if commands:
             self.start(commands, global_params=global_params)
 
@@ -102,6 +144,8 @@ class AzCompleter(Completer):
         self.param_description = commands.param_descript
         self.command_examples = commands.command_example
         self.command_param_info = commands.command_param_info or self.command_param_info
+        self._subcommand_indexes = {}
+        self._param_indexes = {}
 
         if global_params:
             self.global_param = commands.global_param
@@ -114,6 +158,7 @@ class AzCompleter(Completer):
         loader = FreshTable(self.shell_ctx).loader
         if loader and loader.command_table:
             self.cmdtab = loader.command_table
+            self._option_to_arg = {}
             self.parser.load_command_table(loader)
             self.argsfinder = ArgsFinder(self.parser)
 
@@ -171,7 +216,8 @@ class AzCompleter(Completer):
         self.shell_ctx.cli_ctx.raise_event(EVENT_INTERACTIVE_POST_SUB_TREE_CREATE, subtree=self.subtree)
         self.complete_command = not self.subtree.children
 
-        for comp in sort_completions(self.gen_cmd_and_param_completions()):
+        # the indexes already yield these in order
+        for comp in self.gen_cmd_and_param_completions():
             yield comp
 
         for comp in sort_completions(self.gen_global_params_and_arg_completions()):
@@ -193,13 +239,37 @@ class AzCompleter(Completer):
 
     def get_arg_name(self, param):
         """ gets the argument name used in the command table for a parameter """
-        if self.current_command in self.cmdtab:
-            for arg in self.cmdtab[self.current_command].arguments:
-
-                for name in self.cmdtab[self.current_command].arguments[arg].options_list:
-                    if name == param:
-                        return arg
-        return None
+        if self.current_command not in self.cmdtab:
+            return None
+        option_to_arg = self._option_to_arg.get(self.current_command)
+        if option_to_arg is None:
+            option_to_arg = {}
+            arguments = self.cmdtab[self.current_command].arguments
+            for arg in arguments:
+                for name in arguments[arg].options_list:
+                    # the first argument using an option wins, like the scan this replaces
+                    option_to_arg.setdefault(name, arg)
+            self._option_to_arg[self.current_command] = option_to_arg
+        return option_to_arg.get(param)
+
+    def get_subcommand_index(self, tree):
+        """ the index of the subcommands of a node of the command tree """
+        entry = self._subcommand_indexes.get(id(tree))
+        # handlers of EVENT_INTERACTIVE_POST_SUB_TREE_CREATE may add children to the tree
+        if entry is None or entry[1] is not tree or len(entry[0]) != len(tree.children):
+            entry = (PrefixIndex(tree.children), tree)
+            self._subcommand_indexes[id(tree)] = entry
+        return entry[0]
+
+    def get_param_index(self, command):
+        """ the index of the parameters of a command, with the required parameters first """
+        index = self._param_indexes.get(command)
+        if index is None:
+            index = PrefixIndex(
+                self.command_param_info.get(command, []),
+                order_key=lambda param: _get_weight(param, self._get_param_description(command, param)))
+            self._param_indexes[command] = index
+        return index
 
     # pylint: disable=protected-access
     def mute_parse_args(self, text):
@@ -220,10 +290,9 @@ class AzCompleter(Completer):
         AzCliCommandParser._check_value = _check_value
         return parse_args
 
-    # pylint: disable=too-many-branches
     def gen_dynamic_completions(self, text):
         """ generates the dynamic values, like the names of resource groups """
-        try:  # pylint: disable=too-many-nested-blocks
+        try:
             param = self.leftover_args[-1]
 
             # command table specific name
@@ -232,26 +301,19 @@ class AzCompleter(Completer):
             for comp in self.gen_enum_completions(arg_name):
                 yield comp
 
-            parsed_args = self.mute_parse_args(text)
-
-            # there are 3 formats for completers the cli uses
-            # this try catches which format it is
-            if self.cmdtab[self.current_command].arguments[arg_name].completer:
-                completions = []
-                try:
-                    completions = self.cmdtab[self.current_command].arguments[arg_name].completer(
-                        prefix=self.unfinished_word, action=None, parsed_args=parsed_args)
-                except TypeError:
-                    try:
-                        completions = self.cmdtab[self.current_command].arguments[arg_name].completer(
-                            prefix=self.unfinished_word)
-                    except TypeError:
-                        try:
-                            completions = self.cmdtab[self.current_command].arguments[arg_name].completer()
-                        except TypeError:
-                            pass  # other completion method used
-
-                for comp in completions:
+            completer = self.cmdtab[self.current_command].arguments[arg_name].completer
+            if completer:
+                parsed_args = self.mute_parse_args(text)
+                if is_local_completer(completer):
+                    completions = call_completer(completer, self.unfinished_word, parsed_args)
+                else:
+                    # the values are cached for every prefix, the unfinished word filters them
+                    completions = self.completion_cache.get(
+                        self._get_completion_key(self.current_command, arg_name, completer, parsed_args),
+                        lambda: call_completer(completer, '', parsed_args),
+                        on_ready=self._on_completions_ready, timeout=DYNAMIC_COMPLETION_WAIT)
+
+                for comp in completions or []:
                     for completion in self.process_dynamic_completion(comp):
                         yield completion
 
@@ -259,21 +321,71 @@ class AzCompleter(Completer):
         except Exception:  # pylint: disable=broad-except
             pass
 
+    def _get_completion_key(self, command, arg_name, completer, parsed_args):
+        """
+        identifies the values of a completer by the command, the argument, the subscription and the other args, the
+        values of the common completers are shared by every command
+        """
+        subscription = getattr(parsed_args, '_subscription', None) or self._get_subscription()
+        if completer in get_common_completers():
+            return None, completer, subscription, ()
+        arguments = self.cmdtab[command].arguments
+        other_args = tuple(sorted(
+            (dest, str(value)) for dest, value in vars(parsed_args).items()
+            if dest in arguments and dest != arg_name and value is not None))
+        return command, arg_name, subscription, other_args
+
+    def _get_subscription(self):
+        from azure.cli.core._profile import Profile
+        try:
+            return Profile(cli_ctx=self.shell_ctx.cli_ctx).get_subscription_id()
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    def _on_completions_ready(self):
+        if self.shell_ctx:
+            self.shell_ctx.refresh_completions()
+
+    def prefetch_completions(self, scope):
+        """ completes the resource groups and locations in the background once the commands are scoped """
+        import argparse
+        prefetched = set()
+        for command in sorted(self.cmdtab):
+            if command != scope and not command.startswith(scope + ' '):
+                continue
+            for arg_name, argument in self.cmdtab[command].arguments.items():
+                completer = argument.completer
+                if completer in get_common_completers() and completer not in prefetched:
+                    prefetched.add(completer)
+                    parsed_args = argparse.Namespace(_cmd=self.cmdtab[command])
+                    self.completion_cache.prefetch(
+                        self._get_completion_key(command, arg_name, completer, parsed_args),
+                        lambda completer=completer, parsed_args=parsed_args: call_completer(
+                            completer, '', parsed_args))
+            if len(prefetched) == len(get_common_completers()):
+                return
+
+    def _get_param_description(self, command, param):
+        return self.param_description.get(command + " " + str(param), '').replace(os.linesep, '')
+
     def yield_param_completion(self, param, last_word):
         """ yields a parameter """
-        return Completion(param, -len(last_word), display_meta=self.param_description.get(
-            self.current_command + " " + str(param), '').replace(os.linesep, ''))
+        return Completion(param, -len(last_word),
+                          display_meta=self._get_param_description(self.current_command, param))
 
     def gen_cmd_and_param_completions(self):
         """ generates command and parameter completions """
         if self.complete_command:
-            for param in self.command_param_info.get(self.current_command, []):
+            for param in self.get_param_index(self.current_command).match(self.unfinished_word):
                 if self.validate_param_completion(param, self.leftover_args):
                     yield self.yield_param_completion(param, self.unfinished_word)
         elif not self.leftover_args:
-            for child_command in self.subtree.children:
-                if self.validate_completion(child_command):
-                    yield Completion(child_command, -len(self.unfinished_word))
+            index = self.get_subcommand_index(self.subtree)
+            child_commands = index.match(self.unfinished_word)
+            if not child_commands and self.fuzzy:
+                child_commands = index.fuzzy_match(self.unfinished_word)
+            for child_command in child_commands:
+                yield Completion(child_command, -len(self.unfinished_word))
 
     def gen_global_params_and_arg_completions(self):
         # global parameters
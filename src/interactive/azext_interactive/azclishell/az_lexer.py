@@ -2,39 +2,47 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
-from pygments.lexer import RegexLexer, words  # pylint: disable=import-error
-from pygments.token import Name, Keyword, Operator, Number  # pylint: disable=import-error
+import re
+
+from pygments.lexer import Lexer, RegexLexer  # pylint: disable=import-error
+from pygments.token import Name, Keyword, Operator, Number, Text  # pylint: disable=import-error
+
+WORD_REGEX = re.compile(r'\S+|\s+')
 
 
 # pylint: disable=too-few-public-methods
 def get_az_lexer(commands):
+    """ returns a lexer classifying the words of the command line with the word sets of the command index """
+    if not commands.top_level_commands:
+        return None
 
-    class AzLexer(RegexLexer):
+    class AzLexer(Lexer):
         """
         A custom lexer for Azure CLI
         """
-        try:
-            tokens = {
-                'root': [
-                    (words(tuple(kid for kid in commands.command_tree.children),
-                           prefix=r'\b',
-                           suffix=r'\b'),
-                     Keyword),  # top level commands
-                    (words(tuple(commands.get_all_subcommands()),
-                           prefix=r'\b',
-                           suffix=r'\b'),
-                     Keyword.Declaration),  # all other commands
-                    (words(tuple(param for param in commands.completable_param + commands.global_param),
-                           prefix=r'\B',
-                           suffix=r'\b'),
-                     Name.Class),  # parameters
-                    (r'.', Keyword),  # all else
-                    (r' .', Keyword),
-                ]
-            }
-        except IOError:  # if there is no cache
-            pass
-    return AzLexer if AzLexer.tokens else None
+        top_level_commands = commands.top_level_commands
+        subcommands = commands.subcommands
+        params = commands.params
+
+        def get_tokens_unprocessed(self, text):
+            for match in WORD_REGEX.finditer(text):
+                word = match.group()
+                if word.isspace():
+                    yield match.start(), Text, word
+                elif word in self.top_level_commands:
+                    yield match.start(), Keyword, word  # top level commands
+                elif word in self.subcommands:
+                    yield match.start(), Keyword.Declaration, word  # all other commands
+                elif word.startswith('-'):
+                    # parameters, with their value when given as --name=value
+                    param, equals, value = word.partition('=')
+                    yield match.start(), Name.Class if param in self.params else Keyword, param
+                    if equals:
+                        yield match.start() + len(param), Keyword, equals + value
+                else:
+                    yield match.start(), Keyword, word  # all else
+
+    return AzLexer
 
 
 class ExampleLexer(RegexLexer):
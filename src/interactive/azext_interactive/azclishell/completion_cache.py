@@ -0,0 +1,80 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+# how long, in seconds, the values of a completion are kept
+DEFAULT_TTL = 60
+# a failed completer, e.g. when the user isn't logged in, is called again sooner
+FAILURE_TTL = 5
+
+
+class CompletionCache(object):
+    """
+    the values completed for the arguments of the commands in this session, kept for a while so that the completers,
+    which usually call ARM, aren't called again on every key press
+
+    the completers run on background threads, which don't keep the shell from exiting, and a completion that isn't
+    ready is filled in once its values are
+    """
+    def __init__(self, ttl=DEFAULT_TTL, now=time.time):
+        self.ttl = ttl
+        self.now = now
+        self._entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, completer, on_ready=None, timeout=0):
+        """
+        the values of the completion identified by key, or None when they aren't ready after timeout seconds
+
+        completer is called on a background thread if the values aren't cached, on_ready is called once they are
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self.now() < entry[0]:
+                return entry[1]
+            future = self._pending.get(key)
+            submitted = future is None
+            if submitted:
+                future = Future()
+                self._pending[key] = future
+                thread = threading.Thread(target=self._complete, args=(key, completer, future))
+                thread.daemon = True
+                thread.start()
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # the key presses made while the completer runs don't ask for the completion again
+            if submitted and on_ready:
+                future.add_done_callback(lambda done: on_ready() if done.result() else None)
+            return None
+
+    def prefetch(self, key, completer):
+        """ completes key in the background, before the user gets to the argument """
+        self.get(key, completer)
+
+    def _complete(self, key, completer, future):
+        ttl = self.ttl
+        try:
+            values = list(completer() or [])
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug("Completing %s failed: %s", key, ex)
+            values = []
+            ttl = min(ttl, FAILURE_TTL)
+        with self._lock:
+            self._entries[key] = (self.now() + ttl, values)
+            self._pending.pop(key, None)
+        future.set_result(values)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
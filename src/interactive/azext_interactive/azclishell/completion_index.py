@@ -0,0 +1,55 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import re
+from bisect import bisect_left, bisect_right
+
+
+class PrefixIndex(object):
+    """
+    an index of words which returns the words matching a prefix, ignoring the case, in their display order
+
+    the lower-cased words are kept sorted so that the words sharing a prefix are contiguous, like the leaves under a
+    node of a trie, and a lookup only costs a binary search plus the number of matches
+    """
+    def __init__(self, words, order_key=None):
+        # the order the completions are displayed in
+        self.ordered = sorted(set(words), key=order_key)
+        self._keys = sorted((word.lower(), rank) for rank, word in enumerate(self.ordered))
+        self._lowered = [key for key, _ in self._keys]
+        self._blob = None
+        self._line_starts = None
+
+    def __len__(self):
+        return len(self.ordered)
+
+    def match(self, prefix):
+        """ the words starting with prefix """
+        if not prefix:
+            return self.ordered
+        prefix = prefix.lower()
+        start = bisect_left(self._lowered, prefix)
+        ranks = []
+        for index in range(start, len(self._lowered)):
+            if not self._lowered[index].startswith(prefix):
+                break
+            ranks.append(self._keys[index][1])
+        return [self.ordered[rank] for rank in sorted(ranks)]
+
+    def fuzzy_match(self, pattern):
+        """ the words starting with the first character of pattern and containing the others in the same order """
+        if not pattern:
+            return self.ordered
+        if self._blob is None:
+            # a single string scanned by the regular expression engine, one word per line in display order
+            lowered = [word.lower() for word in self.ordered]
+            self._blob = '\n'.join(lowered)
+            self._line_starts = [0]
+            for word in lowered[:-1]:
+                self._line_starts.append(self._line_starts[-1] + len(word) + 1)
+        regex = re.compile('^' + '[^\n]*?'.join(re.escape(char) for char in pattern.lower()) + '[^\n]*$',
+                           re.MULTILINE)
+        return [self.ordered[bisect_right(self._line_starts, found.start()) - 1]
+                for found in regex.finditer(self._blob)]
@@ -31,6 +31,7 @@ GESTURE_INFO = {
     SELECT_SYMBOL['exit_code']: "get the exit code of the previous command",
     SELECT_SYMBOL['scope'] + '[cmd]': "set a scope, and scopes can be chained with spaces",
     SELECT_SYMBOL['scope'] + ' ' + SELECT_SYMBOL['unscope']: "go back a scope",
+    '--timings': "toggle the time spent parsing, loading, executing and rendering each command",
 }
 
 CONFIG_FILE_NAME = 'shell-config'
@@ -64,12 +65,17 @@ class Configuration(object):
         self.cli_config = cli_config
         self.config.add_section('Help Files')
         self.config.add_section('Layout')
+        self.config.add_section('Completion')
+        self.config.add_section('Execution')
         self.config.set('Help Files', 'command', 'help_dump.json')
         self.config.set('Help Files', 'history', 'history.txt')
         self.config.set('Help Files', 'frequency', 'frequency.json')
         self.config.set('Layout', 'command_description', 'yes')
         self.config.set('Layout', 'param_description', 'yes')
         self.config.set('Layout', 'examples', 'yes')
+        self.config.set('Completion', 'fuzzy', 'no')
+        self.config.set('Completion', 'cache_ttl', '60')
+        self.config.set('Execution', 'warm', 'yes')
         self.config_dir = os.getenv('AZURE_CONFIG_DIR') or os.path.expanduser(os.path.join('~', '.azure-shell'))
 
         if not os.path.exists(self.config_dir):
@@ -97,6 +103,18 @@ class Configuration(object):
         """ returns the name of the frequency file """
         return self.config.get('Help Files', 'frequency')
 
+    def is_fuzzy_completion(self):
+        """ whether subcommands are also completed from letters they contain in order """
+        return self.BOOLEAN_STATES.get(self.config.get('Completion', 'fuzzy'), False)
+
+    def get_completion_cache_ttl(self):
+        """ how long, in seconds, the values completed for the arguments are kept """
+        return self.config.getint('Completion', 'cache_ttl')
+
+    def is_warm_execution(self):
+        """ whether the commands reuse the command table, arguments and parser loaded by their previous runs """
+        return self.BOOLEAN_STATES.get(self.config.get('Execution', 'warm'), False)
+
     def load(self, path):
         """ loads the configuration settings """
         self.config.read(path)
@@ -6,6 +6,9 @@
 import math
 import os
 import json
+import pickle
+from collections.abc import MutableMapping
+
 from knack.log import get_logger
 
 from .command_tree import CommandBranch, CommandHead
@@ -26,6 +29,10 @@ OUTPUT_CHOICES = ['json', 'tsv', 'table', 'jsonc']
 OUTPUT_OPTIONS = ['--output', '-o']
 GLOBAL_PARAM = list(GLOBAL_PARAM_DESCRIPTIONS.keys())
 
+# bump whenever the layout of the pickled command index changes
+INDEX_VERSION = 2
+INDEX_FILE_EXTENSION = '.index'
+
 
 def _get_window_columns():
     _, col = get_window_dim()
@@ -68,6 +75,140 @@ def add_new_lines(long_phrase, line_min=None, tolerance=TOLERANCE):
     return long_phrase + "\n"
 
 
+class LazyWrappedText(MutableMapping):
+    """ a dictionary of raw help text which only adds the newlines to the entries that are looked up """
+    def __init__(self, raw=None, wrap=None):
+        self.raw = raw if raw is not None else {}
+        self.wrap = wrap or (lambda text: text)
+        self._wrapped = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._wrapped[key]
+        except KeyError:
+            value = self.wrap(self.raw[key])
+            self._wrapped[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        self.raw[key] = value
+        self._wrapped[key] = value
+
+    def __delitem__(self, key):
+        del self.raw[key]
+        self._wrapped.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.raw
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+
+def get_index_file(help_file):
+    """ the pre-built index is stored next to the help file it is built from """
+    return os.path.splitext(help_file)[0] + INDEX_FILE_EXTENSION
+
+
+def _get_file_fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_command_index(data):
+    """ builds the command tree and the lookup tables of the shell from the dumped help data """
+    completable = ['quit', 'exit']
+    seen_completable = set(completable)
+    completable_param = []
+    seen_param = set()
+    command_tree = CommandHead()
+    command_tree.add_child(CommandBranch('quit'))
+    command_tree.add_child(CommandBranch('exit'))
+    # the words the lexer classifies the command line with
+    top_level_commands = {'quit', 'exit'}
+    subcommands = set()
+    descrip = {'quit': 'Exits the program', 'exit': 'Exits the program'}
+    command_example = {}
+    param_descript = {}
+    command_param_info = {}
+
+    for command, command_data in data.items():
+        branch = command_tree
+        for position, word in enumerate(command.split()):
+            (subcommands if position else top_level_commands).add(word)
+            if word not in seen_completable:
+                seen_completable.add(word)
+                completable.append(word)
+            if not branch.has_child(word):
+                branch.add_child(CommandBranch(word))
+            branch = branch.get_child(word)
+
+        descrip[command] = command_data['help']
+
+        if 'examples' in command_data:
+            command_example[command] = [[example[0], example[1]] for example in command_data['examples']]
+
+        command_params = command_data.get('parameters', {})
+        for param in command_params:
+            if '==SUPPRESS==' not in command_params[param]['help']:
+                param_aliases = set()
+                param_help = command_params[param]['required'] + " " + command_params[param]['help']
+
+                for par in command_params[param]['name']:
+                    param_aliases.add(par)
+                    param_descript[command + " " + par] = param_help
+                    if par not in seen_param:
+                        seen_param.add(par)
+                        completable_param.append(par)
+
+                param_doubles = command_param_info.setdefault(command, {})
+                for alias in param_aliases:
+                    param_doubles[alias] = param_aliases
+
+    return {
+        'version': INDEX_VERSION,
+        'completable': completable,
+        'completable_param': completable_param,
+        'command_tree': command_tree,
+        'descrip': descrip,
+        'command_example': command_example,
+        'param_descript': param_descript,
+        'command_param_info': command_param_info,
+        'top_level_commands': top_level_commands,
+        'subcommands': subcommands,
+        'params': seen_param | set(GLOBAL_PARAM)
+    }
+
+
+def save_command_index(index, help_path):
+    """ pickles the index of the help file at help_path next to it """
+    index = dict(index, source=_get_file_fingerprint(help_path))
+    index_path = get_index_file(help_path)
+    temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    with open(temp_path, 'wb') as index_file:
+        pickle.dump(index, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+    # readers never see a partially written index
+    os.replace(temp_path, index_path)
+
+
+def load_command_index(help_path):
+    """ returns the pre-built index of the help file at help_path, or None if it is missing or out of date """
+    index_path = get_index_file(help_path)
+    try:
+        with open(index_path, 'rb') as index_file:
+            index = pickle.load(index_file)
+        if index.get('version') != INDEX_VERSION or index.get('source') != _get_file_fingerprint(help_path):
+            logger.debug('Ignore outdated command index %s', index_path)
+            return None
+        return index
+    except (OSError, EOFError, AttributeError, ImportError, IndexError, TypeError, pickle.UnpicklingError) as ex:
+        logger.debug('Unable to load command index %s: %s', index_path, ex)
+        return None
+
+
 # pylint: disable=too-many-instance-attributes
 class GatherCommands(object):
     """ grabs all the cached commands from files """
@@ -85,6 +226,9 @@ class GatherCommands(object):
         self.param_descript = {}
         self.completer = None
         self.command_param_info = {}
+        self.top_level_commands = set()
+        self.subcommands = set()
+        self.params = set(GLOBAL_PARAM)
 
         self.global_param_descriptions = GLOBAL_PARAM_DESCRIPTIONS
         self.output_choices = OUTPUT_CHOICES
@@ -96,78 +240,34 @@ class GatherCommands(object):
         except (TypeError, KeyError, ValueError):
             logger.warning('Encountered unrecognizable cache, interactive will create a new updated cache for use.')
 
-    def add_exit(self):
-        """ adds the exits from the application """
-        self.completable.append("quit")
-        self.completable.append("exit")
-
-        self.descrip["quit"] = "Exits the program"
-        self.descrip["exit"] = "Exits the program"
-
-        self.command_tree.add_child(CommandBranch("quit"))
-        self.command_tree.add_child(CommandBranch("exit"))
-
-        self.command_param["quit"] = ""
-        self.command_param["exit"] = ""
-
     def _gather_from_files(self, config):
         """ gathers from the files in a way that is convienent to use """
         command_file = config.get_help_files()
         cache_path = os.path.join(config.get_config_dir(), 'cache')
-        cols = _get_window_columns()
-
-        with open(os.path.join(cache_path, command_file), 'r') as help_file:
-            data = json.load(help_file)
-        self.add_exit()
-        commands = data.keys()
-
-        for command in commands:
-            branch = self.command_tree
-            for word in command.split():
-                if word not in self.completable:
-                    self.completable.append(word)
-                if not branch.has_child(word):
-                    branch.add_child(CommandBranch(word))
-                branch = branch.get_child(word)
-
-            description = data[command]['help']
-            self.descrip[command] = add_new_lines(description, line_min=int(cols) - 2 * TOLERANCE)
-
-            if 'examples' in data[command]:
-                examples = []
-                for example in data[command]['examples']:
-                    examples.append([
-                        add_new_lines(example[0], line_min=int(cols) - 2 * TOLERANCE),
-                        add_new_lines(example[1], line_min=int(cols) - 2 * TOLERANCE)])
-                self.command_example[command] = examples
-
-            command_params = data[command].get('parameters', {})
-            for param in command_params:
-                if '==SUPPRESS==' not in command_params[param]['help']:
-                    param_aliases = set()
-
-                    for par in command_params[param]['name']:
-                        param_aliases.add(par)
-
-                        self.param_descript[command + " " + par] = \
-                            add_new_lines(
-                                command_params[param]['required'] +
-                                " " + command_params[param]['help'],
-                                line_min=int(cols) - 2 * TOLERANCE)
-                        if par not in self.completable_param:
-                            self.completable_param.append(par)
-
-                    param_doubles = self.command_param_info.get(command, {})
-                    for alias in param_aliases:
-                        param_doubles[alias] = param_aliases
-                    self.command_param_info[command] = param_doubles
-
-    def get_all_subcommands(self):
-        """ returns all the subcommands """
-        subcommands = []
-        for command in self.descrip:
-            for word in command.split():
-                for kid in self.command_tree.children:
-                    if word != kid and word not in subcommands:
-                        subcommands.append(word)
-        return subcommands
+        help_path = os.path.join(cache_path, command_file)
+
+        index = load_command_index(help_path)
+        if index is None:
+            with open(help_path, 'r') as help_file:
+                index = build_command_index(json.load(help_file))
+
+        line_min = int(_get_window_columns()) - 2 * TOLERANCE
+
+        def _wrap(text):
+            return add_new_lines(text, line_min=line_min)
+
+        def _wrap_examples(examples):
+            return [[_wrap(example[0]), _wrap(example[1])] for example in examples]
+
+        self.completable = index['completable']
+        self.completable_param = index['completable_param']
+        self.command_tree = index['command_tree']
+        self.command_param_info = index['command_param_info']
+        self.top_level_commands = index['top_level_commands']
+        self.subcommands = index['subcommands']
+        self.params = index['params']
+        # text is only wrapped to the window width when it is displayed
+        self.descrip = LazyWrappedText(index['descrip'], _wrap)
+        self.param_descript = LazyWrappedText(index['param_descript'], _wrap)
+        self.command_example = LazyWrappedText(index['command_example'], _wrap_examples)
+        self.command_param['quit'] = self.command_param['exit'] = ''
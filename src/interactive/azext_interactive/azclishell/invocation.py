@@ -0,0 +1,157 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import functools
+import timeit
+from collections import defaultdict
+from contextlib import contextmanager
+
+from azure.cli.core.commands import AzCliCommandInvoker
+from azure.cli.core.commands.events import EVENT_INVOKER_PRE_LOAD_ARGUMENTS, EVENT_INVOKER_POST_LOAD_ARGUMENTS
+from azure.cli.core.parser import AzCliCommandParser
+from azure.cli.core.util import roughly_parse_command
+from knack.events import (EVENT_INVOKER_PRE_CMD_TBL_CREATE, EVENT_INVOKER_POST_CMD_TBL_CREATE,
+                          EVENT_INVOKER_CMD_TBL_LOADED, EVENT_INVOKER_POST_PARSE_ARGS)
+
+# the events completing the arguments of a command, already raised when its table was loaded
+ARGUMENT_LOADING_EVENTS = [EVENT_INVOKER_PRE_LOAD_ARGUMENTS, EVENT_INVOKER_POST_LOAD_ARGUMENTS,
+                           EVENT_INVOKER_POST_CMD_TBL_CREATE]
+
+# the phases of a run and the events they start with
+PHASE_EVENTS = [('load', EVENT_INVOKER_PRE_CMD_TBL_CREATE), ('parse', EVENT_INVOKER_CMD_TBL_LOADED),
+                ('execute', EVENT_INVOKER_POST_PARSE_ARGS)]
+
+
+@contextmanager
+def suspended_events(cli_ctx, event_names):
+    """ the handlers of the events aren't called in this context """
+    handlers = {name: list(cli_ctx._event_handlers[name]) for name in event_names}  # pylint: disable=protected-access
+    for name, event_handlers in handlers.items():
+        for handler in event_handlers:
+            cli_ctx.unregister_event(name, handler)
+    try:
+        yield
+    finally:
+        for name, event_handlers in handlers.items():
+            for handler in event_handlers:
+                cli_ctx.register_event(name, handler)
+
+
+class WarmCommandParser(AzCliCommandParser):
+    """ a parser which is loaded with the table of a command once and parses its runs """
+
+    def load_command_table(self, command_loader):
+        if self.subparser_map and all(name in self.subparser_map for name in command_loader.command_table):
+            return
+        super(WarmCommandParser, self).load_command_table(command_loader)
+
+    def parse_args(self, args=None, namespace=None):
+        # the arguments specified by the previous runs are saved to the local context otherwise
+        for subparser in self.subparser_map.values():
+            subparser.specified_arguments = []
+        return super(WarmCommandParser, self).parse_args(args, namespace)
+
+
+class _CommandNotLoaded(Exception):
+    pass
+
+
+class LoadedCommandsLoader(object):
+    """ serves the table of a command, with its arguments, loaded by a previous run """
+
+    def __init__(self, commands_loader):
+        self._commands_loader = commands_loader
+        self.loaded_command_table = commands_loader.command_table
+        self.command_table = self.loaded_command_table
+
+    def load_command_table(self, args):
+        # handlers of EVENT_INVOKER_PRE_CMD_TBL_CREATE, like the aliases, may have changed the command
+        command = next(iter(self.loaded_command_table))
+        if roughly_parse_command(args).split()[:len(command.split())] != command.split():
+            raise _CommandNotLoaded()
+        self.command_table = self.loaded_command_table
+        return self.command_table
+
+    def load_arguments(self, command=None):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._commands_loader, name)
+
+
+class WarmCommandInvoker(AzCliCommandInvoker):
+    """
+    runs the commands of the shell, reusing the command table, the argument registry and the parser loaded for a
+    command by its first run, and times the phases of every run
+    """
+
+    def __init__(self, cli_ctx=None, commands_loader_cls=None, help_cls=None, keep_loaded=lambda: True):
+        super(WarmCommandInvoker, self).__init__(cli_ctx=cli_ctx, parser_cls=WarmCommandParser,
+                                                 commands_loader_cls=commands_loader_cls, help_cls=help_cls)
+        self.commands_loader_cls = commands_loader_cls
+        # whether the commands loaded from now on can be reused
+        self.keep_loaded = keep_loaded
+        # the loaders and parsers of the commands run so far, by command name
+        self.loaded = {}
+        self.phases = []
+        for phase, event_name in PHASE_EVENTS:
+            cli_ctx.register_event(event_name, functools.partial(self._start_phase, phase))
+
+    def _start_phase(self, phase, _, **kwargs):  # pylint: disable=unused-argument
+        self.phases.append((phase, timeit.default_timer()))
+
+    def get_timings(self):
+        """ the seconds spent in each phase of the last run """
+        timings = {}
+        for (phase, start), (_, end) in zip(self.phases, self.phases[1:]):
+            timings[phase] = timings.get(phase, 0) + end - start
+        return timings
+
+    def unload(self):
+        """ drops the commands loaded so far, their parsers hold the defaults of the arguments when they loaded """
+        self.loaded.clear()
+
+    def find_loaded_command(self, args):
+        nouns = roughly_parse_command(args).split()
+        matches = [command for command in self.loaded if nouns[:len(command.split())] == command.split()]
+        return max(matches, key=len) if matches else None
+
+    def execute(self, args):
+        self.phases = []
+        try:
+            command = self.find_loaded_command(args)
+            if command:
+                try:
+                    return self._execute_loaded(command, args)
+                except _CommandNotLoaded:
+                    self.phases = []
+            return self._execute_cold(args)
+        finally:
+            self.phases.append((None, timeit.default_timer()))
+
+    def _reset(self):
+        self.data = defaultdict(lambda: None)
+        self.data['command'] = 'unknown'
+
+    def _execute_loaded(self, command, args):
+        self._reset()
+        self.commands_loader, self.parser = self.loaded[command]
+        with suspended_events(self.cli_ctx, ARGUMENT_LOADING_EVENTS):
+            return super(WarmCommandInvoker, self).execute(list(args))
+
+    def _execute_cold(self, args):
+        self._reset()
+        keep_loaded = self.keep_loaded()
+        self.commands_loader = self.commands_loader_cls(cli_ctx=self.cli_ctx)
+        self.parser = WarmCommandParser(cli_ctx=self.cli_ctx, cli_help=self.help, prog=self.cli_ctx.name,
+                                        parents=[self._global_parser])
+        try:
+            return super(WarmCommandInvoker, self).execute(list(args))
+        finally:
+            command = getattr(self.commands_loader, 'command_name', None)
+            # the table of a group isn't kept, nor the table of a command which failed to load
+            if keep_loaded and command and list(self.commands_loader.command_table) == [command] and \
+                    command in self.parser.subparser_map:
+                self.loaded[command] = (LoadedCommandsLoader(self.commands_loader), self.parser)
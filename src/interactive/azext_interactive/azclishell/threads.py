@@ -18,7 +18,13 @@ class LoadCommandTableThread(threading.Thread):
         from ._dump_commands import FreshTable
 
         try:
-            FreshTable(self.shell).dump_command_table(self.shell)
+            fresh_table = FreshTable(self.shell)
+            if fresh_table.update_command_table(self.shell) and not FreshTable.loader:
+                # completions from the updated cache don't need to wait for the whole command table
+                self.initialize_function()
+            if not FreshTable.loader:
+                # argument values are completed from the live command table
+                fresh_table.load_command_table(self.shell)
             self.initialize_function()
         except KeyboardInterrupt:
             pass
@@ -0,0 +1,83 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Replays typed command lines one keystroke at a time through the completer of the shell and reports the latency
+percentiles of computing the completions of a keystroke.
+
+    python -m azext_interactive.tests.latest.benchmark_completion [--config-dir ~/.azure-shell] [--repeat 20]
+
+Without --config-dir, the commands cached for the tests are used.
+"""
+
+import argparse
+import os
+import timeit
+from unittest import mock
+
+from azure.cli.core.mock import DummyCli
+from azext_interactive.azclishell.configuration import Configuration
+from azext_interactive.azclishell.app import AzInteractiveShell
+
+from prompt_toolkit.document import Document
+
+
+TEST_DIR = os.path.abspath(os.path.join(os.path.abspath(__file__), '..'))
+
+TYPED_LINES = [
+    'vm create --resource-group myGroup --name myVM --image UbuntuLTS --generate-ssh-keys',
+    'vmss create -g myGroup -n myScaleSet --upgrade-policy-mode automatic --subnet mySubnet',
+    'storage account create -n mystorage -g myGroup --sku Standard_LRS --access-tier Hot',
+    'storage account check-name --name mystorage -o table',
+]
+
+
+def _create_completer(config_dir):
+    help_file = Configuration(DummyCli().config).get_help_files() if config_dir else 'help_dump_test.json'
+    with mock.patch.object(Configuration, 'get_help_files', lambda _: help_file):
+        with mock.patch.object(Configuration, 'get_config_dir', lambda _: config_dir or TEST_DIR):
+            return AzInteractiveShell(DummyCli(), None).completer
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def replay_keystrokes(completer, lines, repeat):
+    """ the seconds spent computing the completions of each keystroke """
+    latencies = []
+    for _ in range(repeat):
+        for line in lines:
+            for end in range(1, len(line) + 1):
+                document = Document(line[:end])
+                start = timeit.default_timer()
+                for _ in completer.get_completions(document, None):
+                    pass
+                latencies.append(timeit.default_timer() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config-dir', help='directory of the shell configuration with a cached command table')
+    parser.add_argument('--repeat', type=int, default=20, help='number of times every line is replayed')
+    args = parser.parse_args()
+
+    config_dir = os.path.expanduser(args.config_dir) if args.config_dir else None
+    completer = _create_completer(config_dir)
+    # the first replay builds the indexes
+    cold = sorted(replay_keystrokes(completer, TYPED_LINES, 1))
+    warm = sorted(replay_keystrokes(completer, TYPED_LINES, args.repeat))
+
+    print('{:<6} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('', 'keystrokes', 'p50 (us)', 'p90 (us)', 'p99 (us)',
+                                                              'max (us)'))
+    for name, latencies in [('cold', cold), ('warm', warm)]:
+        print('{:<6} {:>10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            name, len(latencies), *[_percentile(latencies, percent) * 1e6 for percent in [50, 90, 99, 100]]))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import argparse
 import os
 import unittest
 from unittest import mock
@@ -10,6 +11,7 @@ from unittest import mock
 from azure.cli.core.mock import DummyCli
 from azext_interactive.azclishell.configuration import Configuration
 from azext_interactive.azclishell.app import AzInteractiveShell
+from azext_interactive.azclishell.az_completer import sort_completions
 
 from prompt_toolkit.document import Document
 
@@ -142,6 +144,84 @@ class CompletionTest(unittest.TestCase):
         self.assertEqual(completion.text, '-g')
         self.assertIn('Name of resource group', completion._display_meta)
 
+    def test_completion_order(self):
+        # the indexes yield the completions in the order they used to be sorted in
+        for text in [u' ', u'vm', u'vm create ', u'vm create --', u'vm create --s', u'storage account create -']:
+            completions = [completion.text for completion in self.completer.get_completions(Document(text), None)]
+            command_completions = list(self.completer.gen_cmd_and_param_completions())
+            self.assertEqual([c.text for c in command_completions],
+                             [c.text for c in sort_completions(command_completions)])
+            self.assertEqual(completions[:len(command_completions)], [c.text for c in command_completions])
+
+    def test_fuzzy_completion(self):
+        doc = Document(u'storage acnt')
+        self.verify_completions(self.completer.get_completions(doc, None), set(), -4)
+        self.completer.fuzzy = True
+        try:
+            self.verify_completions(self.completer.get_completions(doc, None), set(['account']), -4)
+            # prefix matches take precedence
+            doc = Document(u'vm')
+            self.verify_completions(self.completer.get_completions(doc, None), set(['vm', 'vmss']), -2)
+        finally:
+            self.completer.fuzzy = False
+
+    def test_get_arg_name(self):
+        self.completer.cmdtab = {'vm create': mock.MagicMock(arguments={
+            'resource_group_name': mock.MagicMock(options_list=['--resource-group', '-g']),
+            'vm_name': mock.MagicMock(options_list=['--name', '-n'])})}
+        self.completer.current_command = 'vm create'
+        try:
+            self.assertEqual(self.completer.get_arg_name('-g'), 'resource_group_name')
+            self.assertEqual(self.completer.get_arg_name('--name'), 'vm_name')
+            self.assertIsNone(self.completer.get_arg_name('--size'))
+            self.completer.current_command = 'vmss create'
+            self.assertIsNone(self.completer.get_arg_name('-g'))
+        finally:
+            self.completer.cmdtab = {}
+            self.completer._option_to_arg = {}  # pylint: disable=protected-access
+
+    def test_dynamic_completion_cache(self):
+        from azure.cli.core.commands.parameters import get_location_completion_list
+        calls = []
+
+        def vm_name_completer(prefix, action, parsed_args):  # pylint: disable=unused-argument
+            calls.append(parsed_args.resource_group_name)
+            return ['vm1', 'vm2', 'other vm']
+
+        self.completer.cmdtab = {'vm show': mock.MagicMock(arguments={
+            'resource_group_name': mock.MagicMock(options_list=['--resource-group', '-g'], completer=None),
+            'vm_name': mock.MagicMock(options_list=['--name', '-n'], choices=None, completer=vm_name_completer),
+            'location': mock.MagicMock(options_list=['--location', '-l'], completer=get_location_completion_list)})}
+        self.completer.current_command = 'vm show'
+        self.completer.unfinished_word = 'v'
+        self.completer.leftover_args = ['-g', 'rg1', '-n']
+        parsed_args = argparse.Namespace(resource_group_name='rg1', vm_name=None, location=None, _subscription='sub1')
+        try:
+            with mock.patch.object(self.completer, 'mute_parse_args', lambda _: parsed_args):
+                for _ in range(2):
+                    self.verify_completions(
+                        self.completer.gen_dynamic_completions('vm show -g rg1 -n v'), set(['vm1', 'vm2']), -1)
+                # the values are completed again for another resource group
+                parsed_args.resource_group_name = 'rg2'
+                self.verify_completions(
+                    self.completer.gen_dynamic_completions('vm show -g rg2 -n v'), set(['vm1', 'vm2']), -1)
+            self.assertEqual(calls, ['rg1', 'rg2'])
+
+            # the locations don't depend on the command
+            completion_key = self.completer._get_completion_key(  # pylint: disable=protected-access
+                'vm show', 'location', get_location_completion_list, parsed_args)
+            self.assertEqual(completion_key, (None, get_location_completion_list, 'sub1', ()))
+            with mock.patch.object(self.completer.completion_cache, 'prefetch') as prefetch:
+                self.completer.prefetch_completions('vm')
+                self.assertEqual(prefetch.call_args[0][0][1], get_location_completion_list)
+                prefetch.reset_mock()
+                self.completer.prefetch_completions('storage')
+                prefetch.assert_not_called()
+        finally:
+            self.completer.cmdtab = {}
+            self.completer._option_to_arg = {}  # pylint: disable=protected-access
+            self.completer.completion_cache.clear()
+
 
 if __name__ == '__main__':
     unittest.main()
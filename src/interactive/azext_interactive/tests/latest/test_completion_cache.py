@@ -0,0 +1,71 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+import unittest
+
+from azext_interactive.azclishell.completion_cache import CompletionCache
+
+
+class CompletionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.time = 0
+        self.cache = CompletionCache(ttl=60, now=lambda: self.time)
+        self.calls = []
+
+    def _completer(self, values):
+        def _complete():
+            self.calls.append(values)
+            return values
+        return _complete
+
+    def test_values_are_kept_until_they_expire(self):
+        self.assertEqual(self.cache.get('rg', self._completer(['rg1']), timeout=1), ['rg1'])
+        self.time = 59
+        self.assertEqual(self.cache.get('rg', self._completer(['rg2']), timeout=1), ['rg1'])
+        self.assertEqual(self.cache.get('location', self._completer(['eastus']), timeout=1), ['eastus'])
+        self.time = 60
+        self.assertEqual(self.cache.get('rg', self._completer(['rg2']), timeout=1), ['rg2'])
+        self.assertEqual(self.calls, [['rg1'], ['eastus'], ['rg2']])
+
+    def test_failed_completer_is_called_again_sooner(self):
+        def _fail():
+            self.calls.append('failed')
+            raise ValueError('Please run az login')
+
+        self.assertEqual(self.cache.get('rg', _fail, timeout=1), [])
+        self.assertEqual(self.cache.get('rg', _fail, timeout=1), [])
+        self.time = 5
+        self.assertEqual(self.cache.get('rg', self._completer(['rg1']), timeout=1), ['rg1'])
+        self.assertEqual(self.calls, ['failed', ['rg1']])
+
+    def test_slow_completer_is_filled_in_when_ready(self):
+        release = threading.Event()
+        ready = threading.Event()
+
+        def _slow():
+            release.wait(5)
+            self.calls.append('called')
+            return ['rg1']
+
+        self.assertIsNone(self.cache.get('rg', _slow, on_ready=ready.set))
+        # the completer isn't called again while it runs
+        self.assertIsNone(self.cache.get('rg', _slow, on_ready=ready.set))
+        self.assertFalse(ready.is_set())
+
+        release.set()
+        self.assertTrue(ready.wait(5))
+        self.assertEqual(self.cache.get('rg', _slow), ['rg1'])
+        self.assertEqual(self.calls, ['called'])
+
+    def test_prefetch(self):
+        self.cache.prefetch('location', self._completer(['eastus']))
+        self.assertEqual(self.cache.get('location', self._completer(['westus']), timeout=1), ['eastus'])
+        self.cache.clear()
+        self.assertEqual(self.cache.get('location', self._completer(['westus']), timeout=1), ['westus'])
+
+
+if __name__ == '__main__':
+    unittest.main()
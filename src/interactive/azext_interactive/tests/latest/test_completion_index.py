@@ -0,0 +1,42 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+
+from azext_interactive.azclishell.completion_index import PrefixIndex
+
+
+class PrefixIndexTest(unittest.TestCase):
+    def test_match(self):
+        index = PrefixIndex(['vmss', 'vm', 'storage', 'Storage-Sync', 'vnet', 'vm'])
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.match(''), ['Storage-Sync', 'storage', 'vm', 'vmss', 'vnet'])
+        self.assertEqual(index.match('v'), ['vm', 'vmss', 'vnet'])
+        self.assertEqual(index.match('VM'), ['vm', 'vmss'])
+        self.assertEqual(index.match('sto'), ['Storage-Sync', 'storage'])
+        self.assertEqual(index.match('storage-'), ['Storage-Sync'])
+        self.assertEqual(index.match('x'), [])
+        self.assertEqual(index.match('vmssx'), [])
+
+    def test_match_in_display_order(self):
+        required = set(['--name', '--resource-group'])
+        index = PrefixIndex(['--tags', '--name', '--nsg', '--resource-group', '-n'],
+                            order_key=lambda param: (' ' if param in required else '') + param)
+        self.assertEqual(index.match(''), ['--name', '--resource-group', '--nsg', '--tags', '-n'])
+        self.assertEqual(index.match('--n'), ['--name', '--nsg'])
+
+    def test_fuzzy_match(self):
+        index = PrefixIndex(['vmss', 'vm', 'storage', 'virtual-wan', 'webapp'])
+        self.assertEqual(index.fuzzy_match('vw'), ['virtual-wan'])
+        self.assertEqual(index.fuzzy_match('VS'), ['vmss'])
+        self.assertEqual(index.fuzzy_match('sae'), ['storage'])
+        self.assertEqual(index.fuzzy_match('m'), [])
+        self.assertEqual(index.fuzzy_match('vm'), ['vm', 'vmss'])
+        self.assertEqual(index.fuzzy_match('.'), [])
+        self.assertEqual(index.fuzzy_match(''), index.ordered)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from azext_interactive.azclishell._dump_commands import (
+    FreshTable, SOURCES_FORMAT, get_sources_file, merge_command_table_data)
+from azext_interactive.azclishell.gather_commands import load_command_index
+
+
+def _sources(**extensions):
+    return {'format': SOURCES_FORMAT, 'core': '2.20.0', 'extensions': extensions}
+
+
+def _command(ext_name, description):
+    cmd = mock.MagicMock(description=description, arguments={})
+    cmd.command_source.extension_name = ext_name
+    cmd.command_source.overrides_command = False
+    return cmd
+
+
+class _Config(object):
+    def __init__(self, config_dir):
+        self.config_dir = config_dir
+
+    def get_help_files(self):  # pylint: disable=no-self-use
+        return 'help_dump.json'
+
+    def get_config_dir(self):
+        return self.config_dir
+
+
+class _ShellContext(object):
+    def __init__(self, config_dir):
+        self.config = _Config(config_dir)
+
+
+class MergeCommandTableTest(unittest.TestCase):
+    def test_merge_command_table_data(self):
+        data = {
+            'vm': {'help': 'Manage virtual machines'},
+            'vm create': {'help': 'Create a VM', 'parameters': {}},
+            'foo': {'help': 'Foo group'},
+            'foo bar': {'help': 'Foo bar', 'parameters': {}},
+            'foo bar baz': {'help': 'Foo bar baz', 'parameters': {}},
+            'qux': {'help': 'Qux group'},
+            'qux run': {'help': 'Qux run', 'parameters': {}}
+        }
+        new_data = {'foo new': {'help': 'Foo new', 'parameters': {}}}
+        merge_command_table_data(data, ['foo bar', 'foo bar baz', 'qux run'], new_data)
+        self.assertEqual(sorted(data), ['foo', 'foo new', 'vm', 'vm create'])
+
+
+@mock.patch('azext_interactive.azclishell.gather_commands._get_window_columns', lambda: 80)
+class UpdateCommandTableTest(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.shell_ctx = _ShellContext(self.config_dir)
+        self.help_path = os.path.join(self.config_dir, 'cache', 'help_dump.json')
+        self.table = FreshTable(self.shell_ctx)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def _dump(self, sources, cmd_table):
+        with mock.patch('azext_interactive.azclishell._dump_commands.get_command_sources', return_value=sources):
+            with mock.patch.object(FreshTable, 'load_command_table',
+                                   return_value=mock.MagicMock(command_table=cmd_table)):
+                self.table.dump_command_table()
+
+    def _update(self, sources, cmd_table=None):
+        loader = mock.MagicMock(command_table=cmd_table or {})
+        with mock.patch('azext_interactive.azclishell._dump_commands.get_command_sources', return_value=sources):
+            with mock.patch.object(FreshTable, 'load_command_table', return_value=loader) as load_command_table:
+                with mock.patch.object(FreshTable, 'dump_command_table') as dump_command_table:
+                    updated = self.table.update_command_table()
+        return updated, load_command_table, dump_command_table
+
+    def _load_data(self):
+        with open(self.help_path, 'r') as help_file:
+            return json.load(help_file)
+
+    def test_missing_cache_is_dumped(self):
+        updated, load_command_table, dump_command_table = self._update(_sources(ext1='1.0'))
+        self.assertTrue(updated)
+        dump_command_table.assert_called_once()
+        load_command_table.assert_not_called()
+
+    def test_core_update_is_dumped(self):
+        self._dump(_sources(ext1='1.0'), {'ext1 run': _command('ext1', 'Run it')})
+        sources = _sources(ext1='1.0')
+        sources['core'] = '2.21.0'
+        _, _, dump_command_table = self._update(sources)
+        dump_command_table.assert_called_once()
+
+    def test_unchanged_cache_is_kept(self):
+        self._dump(_sources(ext1='1.0'), {'ext1 run': _command('ext1', 'Run it')})
+        updated, load_command_table, dump_command_table = self._update(_sources(ext1='1.0'))
+        self.assertFalse(updated)
+        load_command_table.assert_not_called()
+        dump_command_table.assert_not_called()
+
+    def test_changed_extensions_are_merged(self):
+        self._dump(_sources(ext1='1.0', ext2='1.0'), {
+            'vm create': _command(None, 'Create a VM'),
+            'ext1 run': _command('ext1', 'Run it'),
+            'ext1 old': _command('ext1', 'Removed in 1.1'),
+            'ext2 run': _command('ext2', 'Run it too')
+        })
+
+        updated, load_command_table, dump_command_table = self._update(
+            _sources(ext1='1.1', ext3='1.0'),
+            {'ext1 run': _command('ext1', 'Run it faster'), 'ext3 run': _command('ext3', 'Run something else')})
+        self.assertTrue(updated)
+        dump_command_table.assert_not_called()
+        self.assertEqual(sorted(load_command_table.call_args[1]['extension_names']), ['ext1', 'ext3'])
+
+        data = self._load_data()
+        self.assertEqual(sorted(name for name in data if 'parameters' in data[name]),
+                         ['ext1 run', 'ext3 run', 'vm create'])
+        self.assertEqual(data['ext1 run']['help'], 'Run it faster')
+        with open(get_sources_file(self.help_path), 'r') as sources_file:
+            sources = json.load(sources_file)
+        self.assertEqual(sources['extensions'], {'ext1': '1.1', 'ext3': '1.0'})
+        self.assertEqual(sources['commands'], {'ext1': ['ext1 run'], 'ext3': ['ext3 run']})
+        self.assertIsNotNone(load_command_index(self.help_path))
+
+    def test_new_override_is_dumped(self):
+        self._dump(_sources(), {'vm create': _command(None, 'Create a VM')})
+        _, _, dump_command_table = self._update(_sources(ext1='1.0'), {'vm create': _command('ext1', 'Create')})
+        dump_command_table.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
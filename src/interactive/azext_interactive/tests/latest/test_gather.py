@@ -3,8 +3,33 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import json
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+
+from pygments.token import Keyword, Name, Text  # pylint: disable=import-error
+
+from azext_interactive.azclishell.az_lexer import get_az_lexer
 from azext_interactive.azclishell.gather_commands import add_new_lines as nl
+from azext_interactive.azclishell.gather_commands import (
+    GatherCommands, build_command_index, get_index_file, load_command_index, save_command_index)
+
+
+TEST_DIR = os.path.abspath(os.path.join(os.path.abspath(__file__), '..'))
+
+
+class _Config(object):
+    def __init__(self, config_dir):
+        self.config_dir = config_dir
+
+    def get_help_files(self):  # pylint: disable=no-self-use
+        return 'help_dump_test.json'
+
+    def get_config_dir(self):
+        return self.config_dir
 
 
 class GatherTest(unittest.TestCase):
@@ -56,5 +81,72 @@ class GatherTest(unittest.TestCase):
         )
 
 
+@mock.patch('azext_interactive.azclishell.gather_commands._get_window_columns', lambda: 80)
+class CommandIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.config_dir, 'cache'))
+        self.help_path = os.path.join(self.config_dir, 'cache', 'help_dump_test.json')
+        shutil.copy(os.path.join(TEST_DIR, 'cache', 'help_dump_test.json'), self.help_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def test_index_matches_help_file(self):
+        from_json = GatherCommands(_Config(self.config_dir))
+
+        with open(self.help_path, 'r') as help_file:
+            save_command_index(build_command_index(json.load(help_file)), self.help_path)
+        self.assertIsNotNone(load_command_index(self.help_path))
+        from_index = GatherCommands(_Config(self.config_dir))
+
+        for commands in [from_json, from_index]:
+            self.assertEqual(commands.completable[:2], ['quit', 'exit'])
+            self.assertEqual(len(commands.completable), len(set(commands.completable)))
+            self.assertEqual(len(commands.completable_param), len(set(commands.completable_param)))
+            self.assertTrue(commands.command_tree.in_tree(['storage', 'account']))
+        self.assertEqual(from_json.completable, from_index.completable)
+        self.assertEqual(from_json.completable_param, from_index.completable_param)
+        self.assertEqual(dict(from_json.descrip), dict(from_index.descrip))
+        self.assertEqual(dict(from_json.param_descript), dict(from_index.param_descript))
+        self.assertEqual(dict(from_json.command_example), dict(from_index.command_example))
+        self.assertEqual(from_json.command_param_info, from_index.command_param_info)
+
+    def test_lexer_word_sets(self):
+        commands = GatherCommands(_Config(self.config_dir))
+        self.assertIn('storage', commands.top_level_commands)
+        self.assertIn('account', commands.subcommands)
+        self.assertNotIn('storage', commands.subcommands)
+        self.assertIn('-g', commands.params)
+        self.assertIn('--output', commands.params)
+
+        lexer = get_az_lexer(commands)()
+        tokens = [(token, value) for _, token, value in lexer.get_tokens_unprocessed(
+            'storage account create -g=myrg --name  --unknown')]
+        self.assertEqual(tokens, [
+            (Keyword, 'storage'), (Text, ' '), (Keyword.Declaration, 'account'), (Text, ' '),
+            (Keyword.Declaration, 'create'), (Text, ' '), (Name.Class, '-g'), (Keyword, '=myrg'), (Text, ' '),
+            (Name.Class, '--name'), (Text, '  '), (Keyword, '--unknown')])
+
+    def test_text_is_wrapped_on_lookup(self):
+        commands = GatherCommands(_Config(self.config_dir))
+        command = next(name for name in commands.descrip if len(commands.descrip.raw[name] or '') > 60)
+        self.assertNotIn(command, commands.descrip._wrapped)  # pylint: disable=protected-access
+        self.assertEqual(commands.descrip[command], nl(commands.descrip.raw[command], line_min=60))
+        self.assertIn(command, commands.descrip._wrapped)  # pylint: disable=protected-access
+
+    def test_outdated_index_is_ignored(self):
+        with open(self.help_path, 'r') as help_file:
+            save_command_index(build_command_index(json.load(help_file)), self.help_path)
+        with open(self.help_path, 'a') as help_file:
+            help_file.write(' ')
+        self.assertIsNone(load_command_index(self.help_path))
+
+        with open(get_index_file(self.help_path), 'wb') as index_file:
+            index_file.write(b'not an index')
+        self.assertIsNone(load_command_index(self.help_path))
+        self.assertIn('storage', GatherCommands(_Config(self.config_dir)).completable)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from azure.cli.core import AzCommandsLoader
+from azure.cli.core.mock import DummyCli
+from knack.events import EVENT_INVOKER_POST_CMD_TBL_CREATE
+
+from azext_interactive.azclishell.gather_commands import GatherCommands
+from azext_interactive.azclishell.invocation import WarmCommandInvoker
+
+
+def sample_show(name, resource_group_name=None):
+    return {'name': name, 'resourceGroup': resource_group_name}
+
+
+class SampleCommandsLoader(AzCommandsLoader):
+    loads = []
+
+    def load_command_table(self, args):
+        super(SampleCommandsLoader, self).load_command_table(args)
+        SampleCommandsLoader.loads.append(args)
+        with self.command_group('sample', operations_tmpl='{}#{{}}'.format(__name__)) as g:
+            g.command('show', 'sample_show')
+            g.command('list', 'sample_show')
+        return self.command_table
+
+    def load_arguments(self, command):
+        super(SampleCommandsLoader, self).load_arguments(command)
+        with self.argument_context('sample') as c:
+            c.argument('name', options_list=['--name', '-n'])
+            c.argument('resource_group_name', options_list=['--resource-group', '-g'])
+        self._update_command_definitions()
+
+
+class WarmCommandInvokerTest(unittest.TestCase):
+    def setUp(self):
+        SampleCommandsLoader.loads = []
+        self.cli = DummyCli(commands_loader_cls=SampleCommandsLoader)
+        self.cli.invocation = self.invocation = WarmCommandInvoker(
+            cli_ctx=self.cli, commands_loader_cls=SampleCommandsLoader, help_cls=self.cli.help_cls)
+        self.table_events = []
+        self.cli.register_event(EVENT_INVOKER_POST_CMD_TBL_CREATE,
+                                lambda _, **kwargs: self.table_events.append(list(kwargs['commands_loader']
+                                                                                  .command_table)))
+
+    def test_loaded_command_is_reused(self):
+        result = self.invocation.execute(['sample', 'show', '-n', 'vm1', '-g', 'rg1'])
+        self.assertEqual(result.result, {'name': 'vm1', 'resourceGroup': 'rg1'})
+        self.assertEqual(set(self.invocation.get_timings()), set(['load', 'parse', 'execute']))
+
+        result = self.invocation.execute(['sample', 'show', '--name', 'vm2'])
+        self.assertEqual(result.result, {'name': 'vm2', 'resourceGroup': None})
+        self.assertEqual(len(SampleCommandsLoader.loads), 1)
+        # the arguments of the command are completed once
+        self.assertEqual(self.table_events, [['sample show']])
+        self.assertEqual(self.invocation.parser.subparser_map['sample show'].specified_arguments, ['name'])
+
+        self.invocation.execute(['sample', 'list', '-n', 'vm3'])
+        self.assertEqual(len(SampleCommandsLoader.loads), 2)
+        self.assertEqual(sorted(self.invocation.loaded), ['sample list', 'sample show'])
+
+    def test_commands_are_not_kept_until_the_shell_is_loaded(self):
+        self.invocation.keep_loaded = lambda: False
+        self.invocation.execute(['sample', 'show', '-n', 'vm1'])
+        self.invocation.execute(['sample', 'show', '-n', 'vm1'])
+        self.assertEqual(len(SampleCommandsLoader.loads), 2)
+        self.assertEqual(self.invocation.loaded, {})
+
+
+@mock.patch.object(GatherCommands, '_gather_from_files', lambda *_: None)
+class WarmShellTest(unittest.TestCase):
+    def setUp(self):
+        from azext_interactive.azclishell.app import AzInteractiveShell
+        SampleCommandsLoader.loads = []
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        for patcher in [mock.patch('azext_interactive.azclishell.app.get_config_dir', return_value=self.config_dir)] + \
+                [mock.patch('azext_interactive.azclishell.app.' + name) for name in ['ACCOUNT', 'CONFIG', 'SESSION']]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        cli = DummyCli(commands_loader_cls=SampleCommandsLoader)
+        cli.config.config_path = os.path.join(self.config_dir, 'config')
+        self.shell = AzInteractiveShell(cli, output_custom=mock.MagicMock())
+        self.shell.config.is_warm_execution = lambda: True
+        cli.invocation = self.shell.warm_invocation = WarmCommandInvoker(
+            cli_ctx=cli, commands_loader_cls=SampleCommandsLoader, help_cls=cli.help_cls)
+
+    def _run(self):
+        self.shell.cli_execute('sample show -n vm1')
+        self.assertEqual(self.shell.last_exit, 0)
+
+    def test_commands_are_loaded_again_when_the_config_changes(self):
+        self._run()
+        self._run()
+        self.assertEqual(len(SampleCommandsLoader.loads), 1)
+
+        # like the defaults set by az config
+        with open(self.shell.cli_ctx.config.config_path, 'w') as f:
+            f.write('[defaults]\ngroup = rg1\n')
+        self._run()
+        self.assertEqual(len(SampleCommandsLoader.loads), 2)
+
+    def test_commands_are_loaded_again_after_a_run_with_local_context(self):
+        self.shell.cli_ctx.local_context.is_on = True
+        self._run()
+        self.assertEqual(self.shell.warm_invocation.loaded, {})
+        self._run()
+        self.assertEqual(len(SampleCommandsLoader.loads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
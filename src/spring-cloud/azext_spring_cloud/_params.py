@@ -12,7 +12,7 @@ from ._validators import (validate_env, validate_cosmos_type, validate_resource_
                           validate_log_limit, validate_log_since, validate_sku, validate_jvm_options,
                           validate_vnet, validate_vnet_required_parameters, validate_node_resource_group,
                           validate_tracing_parameters, validate_app_insights_parameters, validate_java_agent_parameters,
-                          validate_instance_count)
+                          validate_instance_count, validate_upload_options)
 from ._utils import ApiType
 
 from .vendored_sdks.appplatform.v2020_07_01.models import RuntimeVersion, TestKeyType
@@ -115,6 +115,8 @@ def load_arguments(self, _):
             '--deployment', '-d'], help='Name of an existing deployment of the app. Default to the production deployment if not specified.', validator=validate_deployment_name)
         c.argument('format_json', nargs='?', const='{timestamp} {level:>5} [{thread:>15.15}] {logger{39}:<40.40}: {message}\n{stackTrace}',
                    help='Format JSON logs if structured log is enabled')
+        c.argument('all_instances', action='store_true',
+                   help='Show the logs of all the instances of the deployment, merged in timestamp order and prefixed with the instance name.')
 
     with self.argument_context('spring-cloud app logs') as c:
         prepare_logs_argument(c)
@@ -156,6 +158,12 @@ def load_arguments(self, _):
                 'target_module', help='Child module to be deployed, required for multiple jar packages built from source code.')
             c.argument(
                 'version', help='Deployment version, keep unchanged if not set.')
+            c.argument('upload_connections', type=int, validator=validate_upload_options,
+                       help='Number of ranges of the artifact uploaded in parallel, default to 2.')
+            c.argument('upload_range_size', type=int,
+                       help='Size in MiB of the ranges the artifact is uploaded in, from 1 to 4, default to 4.')
+            c.argument('validate_upload', action='store_true',
+                       help='Validate the MD5 hash of every uploaded range.')
 
     with self.argument_context('spring-cloud app deployment create') as c:
         c.argument('skip_clone_settings', help='Create staging deployment will automatically copy settings from production deployment.',
@@ -7,7 +7,6 @@
 
 import time
 import colorama   # pylint: disable=import-error
-from io import BytesIO
 from random import uniform
 from knack.util import CLIError
 from knack.log import get_logger
@@ -19,6 +18,7 @@ from ._utils import get_blob_info
 logger = get_logger(__name__)
 
 DEFAULT_CHUNK_SIZE = 1024 * 4
+MAX_CHUNK_SIZE = 1024 * 1024 * 4
 DEFAULT_LOG_TIMEOUT_IN_SEC = 60 * 30  # 30 minutes
 
 
@@ -75,10 +75,9 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
     if not no_format:
         colorama.init()
 
-    stream = BytesIO()
+    stream = _LogBuffer()
     metadata = {}
     start = 0
-    end = byte_size - 1
     available = 0
     sleep_time = 1
     max_sleep_time = 15
@@ -104,43 +103,29 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
             consecutive_sleep_in_sec = 0
 
             try:
-                old_byte_size = len(stream.getvalue())
+                # Read everything available in as few requests as possible, only the tail of a log which is
+                # still being written is read in small ranges.
+                range_size = min(max(available - start, byte_size), MAX_CHUNK_SIZE)
+                old_byte_size = len(stream)
                 blob_service.get_blob_to_stream(
                     container_name=container_name,
                     blob_name=blob_name,
                     start_range=start,
-                    end_range=end,
-                    stream=stream)
-
-                curr_bytes = stream.getvalue()
-                new_byte_size = len(curr_bytes)
-                amount_read = new_byte_size - old_byte_size
-                start += amount_read
-                end = start + byte_size - 1
-
-                # Only scan what's newly read. If nothing is read, default to 0.
-                min_scan_range = max(new_byte_size - amount_read - 1, 0)
-                for i in range(new_byte_size - 1, min_scan_range, -1):
-                    if curr_bytes[i - 1:i + 1] == b'\r\n':
-                        flush = curr_bytes[:i]  # won't logger.warning \n
-                        stream = BytesIO()
-                        stream.write(curr_bytes[i + 1:])
-                        logger_level_func(flush.decode('utf-8', errors='ignore'))
-                        break
-                    if curr_bytes[i:i + 1] == b'\r':
-                        flush = curr_bytes[:i + 1]  # won't logger.warning \n
-                        stream = BytesIO()
-                        stream.write(curr_bytes[i + 1:])
-                        logger_level_func(flush.decode('utf-8', errors='ignore'))
-                        break
+                    end_range=start + range_size - 1,
+                    stream=stream,
+                    max_connections=1)
+                start += len(stream) - old_byte_size
+
+                flush = stream.pop_lines()
+                if flush is not None:
+                    logger_level_func(flush)
 
             except AzureHttpError as ae:
                 if ae.status_code != 404:
                     raise CLIError(ae)
             except KeyboardInterrupt:
-                curr_bytes = stream.getvalue()
-                if curr_bytes:
-                    logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+                if stream:
+                    logger_level_func(stream.pop_all())
                 return
 
         try:
@@ -152,8 +137,8 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
             if ae.status_code != 404:
                 raise CLIError(ae)
         except KeyboardInterrupt:
-            if curr_bytes:
-                logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+            if stream:
+                logger_level_func(stream.pop_all())
             return
         except Exception as err:
             raise CLIError(err)
@@ -161,9 +146,8 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
         if consecutive_sleep_in_sec > timeout_in_seconds:
             # Flush anything remaining in the buffer - this would be the case
             # if the file has expired and we weren't able to detect any \r\n
-            curr_bytes = stream.getvalue()
-            if curr_bytes:
-                logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+            if stream:
+                logger_level_func(stream.pop_all())
 
             return
 
@@ -183,10 +167,8 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
     # One final check to see if there's anything in the buffer to flush
     # E.g., metadata has been set and start == available, but the log file
     # didn't end in \r\n, so we were unable to flush out the final contents.
-    curr_bytes = stream.getvalue()
-
-    if curr_bytes:
-        logger_level_func(curr_bytes.decode('utf-8', errors='ignore'))
+    if stream:
+        logger_level_func(stream.pop_all())
 
     build_status = _get_run_status(metadata).lower()
     logger_level_func("Log status was: {}".format(build_status))
@@ -200,6 +182,48 @@ def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-stateme
             raise CLIError("Run was canceled")
 
 
+class _LogBuffer(object):
+    """
+    Rolling buffer the ranges of the log blob are downloaded into. Complete lines are decoded straight from the
+    buffer and only the incomplete last line is kept for the next range.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # where to resume looking for a line break, what comes before has already been scanned
+        self._scanned = 0
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def write(self, data):
+        self._buffer += data
+
+    def pop_lines(self):
+        """Remove and return the text up to the last line break, None if there isn't any."""
+        end = self._buffer.rfind(b'\r', self._scanned)
+        if end < 0:
+            self._scanned = len(self._buffer)
+            return None
+        # the text ends with the \r, the \n of a \r\n is dropped
+        skip = end + 2 if self._buffer[end + 1:end + 2] == b'\n' else end + 1
+        text = self._decode(end + 1)
+        del self._buffer[:skip]
+        self._scanned = 0
+        return text
+
+    def pop_all(self):
+        text = self._decode(len(self._buffer))
+        del self._buffer[:]
+        self._scanned = 0
+        return text
+
+    def _decode(self, end):
+        # the views must be released before the buffer can be resized
+        with memoryview(self._buffer) as view, view[:end] as lines:
+            return str(lines, 'utf-8', 'ignore')
+
+
 def _blob_is_not_complete(metadata):
     if not metadata:
         return True
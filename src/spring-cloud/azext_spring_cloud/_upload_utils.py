@@ -0,0 +1,128 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import sys
+import threading
+import time
+from knack.log import get_logger
+from .azure_storage_file import FileService
+
+logger = get_logger(__name__)
+
+DEFAULT_UPLOAD_CONNECTIONS = 2
+# the largest range the file service accepts in a single Put Range request
+MAX_UPLOAD_RANGE_SIZE_MB = 4
+PROGRESS_INTERVAL_IN_SEC = 0.5
+# the connection pool of a requests session keeps 10 connections per host by default
+DEFAULT_POOL_SIZE = 10
+
+
+def upload_artifact(account_name, sas_token, endpoint_suffix, share_name, relative_name, path,
+                    upload_connections=None, upload_range_size=None, validate_content=False,
+                    connection_string=None):
+    """
+    Upload a file to the file share the deployment is created from, the ranges of upload_range_size MiB being written
+    by upload_connections concurrent connections, and report the throughput and the remaining time while it runs.
+    """
+    upload_connections = upload_connections or DEFAULT_UPLOAD_CONNECTIONS
+    file_service = FileService(account_name, sas_token=sas_token, endpoint_suffix=endpoint_suffix,
+                               request_session=_get_request_session(upload_connections),
+                               connection_string=connection_string)
+    if upload_range_size:
+        # create_file_from_stream splits the file in ranges of MAX_RANGE_SIZE
+        file_service.MAX_RANGE_SIZE = upload_range_size * 1024 * 1024
+
+    progress = UploadProgress(os.path.getsize(path))
+    file_service.create_file_from_path(share_name, None, relative_name, path,
+                                       validate_content=validate_content,
+                                       progress_callback=progress,
+                                       max_connections=upload_connections)
+    progress.done()
+    return progress
+
+
+def _get_request_session(upload_connections):
+    if upload_connections <= DEFAULT_POOL_SIZE:
+        return None
+    # keep a connection per worker, the pool would otherwise discard and reopen the connections over the limit
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=upload_connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class UploadProgress(object):
+    """
+    Progress callback of an upload, displaying the amount uploaded, the throughput and the estimated remaining time
+    on a single line of stderr when it is a terminal.
+    """
+
+    def __init__(self, total, stream=None, now=time.time):
+        self.total = total
+        self.current = 0
+        self.stream = stream or sys.stderr
+        self.now = now
+        self.start = now()
+        self._last_display = None
+        self._lock = threading.Lock()
+
+    def __call__(self, current, total):
+        # the ranges are uploaded by several threads, each of them reporting the total uploaded so far
+        with self._lock:
+            if current <= self.current and self._last_display is not None:
+                return
+            self.current = max(current, self.current)
+            if total is not None:
+                self.total = total
+            now = self.now()
+            if self._last_display is not None and now - self._last_display < PROGRESS_INTERVAL_IN_SEC:
+                return
+            self._last_display = now
+            if self._interactive:
+                self.stream.write('\r' + self.format() + '\033[K')
+                self.stream.flush()
+
+    @property
+    def _interactive(self):
+        return hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+    @property
+    def elapsed(self):
+        return max(self.now() - self.start, 0.001)
+
+    @property
+    def throughput(self):
+        """ bytes per second """
+        return self.current / self.elapsed
+
+    @property
+    def eta(self):
+        throughput = self.throughput
+        if not throughput or not self.total:
+            return None
+        return max(self.total - self.current, 0) / throughput
+
+    def format(self):
+        eta = self.eta
+        return 'Uploading: {:.1f}% {}/{} MB, {:.2f} MB/s, ETA {}'.format(
+            100.0 * self.current / self.total if self.total else 100.0,
+            _format_megabytes(self.current),
+            _format_megabytes(self.total),
+            self.throughput / (1024.0 * 1024.0),
+            '{:.0f}s'.format(eta) if eta is not None else '-')
+
+    def done(self):
+        if self._interactive and self._last_display is not None:
+            self.stream.write('\r\033[K')
+            self.stream.flush()
+        logger.warning("Uploaded %s MB in %.1f seconds (%.2f MB/s)",
+                       _format_megabytes(self.current), self.elapsed, self.throughput / (1024.0 * 1024.0))
+
+
+def _format_megabytes(size):
+    return '{:.1f}'.format((size or 0) / (1024.0 * 1024.0))
@@ -6,11 +6,14 @@ import json
 from enum import Enum
 import os
 import codecs
+import gzip
+import hashlib
 import tarfile
 import tempfile
 import uuid
+from collections import deque
 from io import open
-from re import (search, match, compile)
+from re import (search, compile)
 from json import dumps
 from knack.util import CLIError, todict
 from knack.log import get_logger
@@ -20,25 +23,36 @@ from ._client_factory import cf_resource_groups
 
 logger = get_logger(__name__)
 
+ARCHIVE_BLOCK_SIZE = 4 * 1024 * 1024
+SOURCE_DIGEST_CACHE_DIR = os.path.join('spring-cloud', 'source-digests')
 
-def _get_upload_local_file(runtime_version, artifact_path=None):
+
+def _get_upload_local_file(runtime_version, artifact_path=None, target=None):
+    """
+    Return the type and path of the file to upload, and the digests of the packed source files to save once it
+    is deployed to the target, None if an artifact is deployed.
+    """
     file_path = artifact_path
     file_type = "NetCoreZip" if runtime_version == AppPlatformEnums.RuntimeVersion.NET_CORE31 else "Jar"
+    source_digests = None
 
     if file_path is None:
         file_type = "Source"
         file_path = os.path.join(tempfile.gettempdir(
         ), 'build_archive_{}.tar.gz'.format(uuid.uuid4().hex))
-        _pack_source_code(os.getcwd(), file_path)
-    return file_type, file_path
+        source_digests = _pack_source_code(os.getcwd(), file_path, target)
+    return file_type, file_path, source_digests
 
 
-def _pack_source_code(source_location, tar_file_path):
+def _pack_source_code(source_location, tar_file_path, target=None):
     logger.info("Packing source code into tar to upload...")
 
     ignore_list, ignore_list_size = _load_gitignore_file(source_location)
     common_vcs_ignore_list = {'.git', '.gitignore', 'bzrignore', '.hg',
                               '.hgignore', '.svn', '.circleci', 'target', 'docker'}
+    match_ignore_rule = _compile_ignore_rules(ignore_list)
+    # only an exception (!rule) can include the children of an ignored directory again
+    exception_indexes = [index for index, item in enumerate(ignore_list or []) if not item.ignore]
 
     def _ignore_check(tarinfo, parent_ignored, parent_matching_rule_index):
         # ignore common vcs dir or file
@@ -52,29 +66,190 @@ def _pack_source_code(source_location, tar_file_path):
             # eg, it will ignore the files under .git folder.
             return parent_ignored, parent_matching_rule_index
 
-        for index, item in enumerate(ignore_list):
-            # stop checking the remaining rules whose priorities are lower than the parent matching rule
-            # at this point, current item should just inherit from parent
-            if index >= parent_matching_rule_index:
-                break
-            if match(item.pattern, tarinfo.name):
-                logger.debug(".gitignore: rule '%s' matches '%s'.",
-                             item.rule, tarinfo.name)
-                return item.ignore, index
+        # stop checking the remaining rules whose priorities are lower than the parent matching rule
+        # at this point, current item should just inherit from parent
+        index = match_ignore_rule(tarinfo.name, parent_matching_rule_index)
+        if index is not None:
+            item = ignore_list[index]
+            logger.debug(".gitignore: rule '%s' matches '%s'.",
+                         item.rule, tarinfo.name)
+            return item.ignore, index
 
         logger.debug(".gitignore: no rule for '%s'. parent ignore '%s'",
                      tarinfo.name, parent_ignored)
         # inherit from parent
         return parent_ignored, parent_matching_rule_index
 
-    with tarfile.open(tar_file_path, "w:gz") as tar:
+    def _prune_check(ignored, matching_rule_index):
+        # the children only need to be scanned if a rule with a higher priority could include them again
+        return ignored and not any(index < matching_rule_index for index in exception_indexes)
+
+    digest_cache = _SourceDigestCache(source_location, target)
+    with open(tar_file_path, "wb") as f, _ParallelGzipWriter(f) as gz, tarfile.open(fileobj=gz, mode="w|") as tar:
         # need to set arcname to empty string as the archive root path
         _archive_file_recursively(tar,
                                   source_location,
                                   arcname="",
                                   parent_ignored=False,
                                   parent_matching_rule_index=ignore_list_size,
-                                  ignore_check=_ignore_check)
+                                  ignore_check=_ignore_check,
+                                  prune_check=_prune_check,
+                                  digest_cache=digest_cache)
+    digest_cache.report_changes()
+    return digest_cache
+
+
+def _compile_ignore_rules(ignore_list):
+    """
+    Compile the patterns of the ignore rules into a single regular expression and return a function which gives
+    the index of the rule with the highest priority matching a path, or None if no rule before max_index matches.
+    """
+    if not ignore_list:
+        return lambda name, max_index: None
+
+    # the alternatives are tried in order, so the first rule that matches the whole path is the one reported
+    combined = compile('|'.join('(?P<rule{}>{})'.format(index, item.pattern)
+                                for index, item in enumerate(ignore_list)))
+
+    def _match(name, max_index):
+        found = combined.match(name)
+        if not found:
+            return None
+        index = int(found.lastgroup[len('rule'):])
+        return index if index < max_index else None
+
+    return _match
+
+
+class _ParallelGzipWriter(object):
+    """
+    A write-only file object which gzips what is written to it. The data is compressed in blocks on a pool of
+    threads and every block is written as a gzip member of its own, a sequence of members being a valid gzip file.
+    """
+
+    def __init__(self, fileobj, block_size=ARCHIVE_BLOCK_SIZE, max_workers=None, compresslevel=9):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self.compresslevel = compresslevel
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._executor:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._compress(block)
+        return len(data)
+
+    def _compress(self, block):
+        if self.max_workers <= 1:
+            self.fileobj.write(gzip.compress(block, self.compresslevel))
+            return
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # zlib releases the GIL, so the blocks are compressed in parallel
+        self._pending.append(self._executor.submit(gzip.compress, block, self.compresslevel))
+        while len(self._pending) > 2 * self.max_workers:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        if self._buffer:
+            self._compress(bytes(self._buffer))
+            del self._buffer[:]
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class _HashingReader(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.digest.update(data)
+        return data
+
+
+class _SourceDigestCache(object):
+    """
+    The size, modification time and SHA-256 digest of every file packed from a source folder the last time it was
+    deployed to a target. Files whose size and modification time didn't change are not hashed again, and the digests
+    tell which files changed since the last deployment. They are saved by the caller once the upload succeeded.
+    """
+
+    def __init__(self, source_location, target=None):
+        self.source_location = os.path.abspath(source_location)
+        self.target = target
+        self.path = None
+        self.previous = {}
+        self.current = {}
+        try:
+            from azure.cli.core._environment import get_config_dir
+            cache_key = self.source_location if not target else '{}\n{}'.format(self.source_location, target)
+            cache_name = hashlib.sha256(cache_key.encode('utf-8')).hexdigest() + '.json'
+            self.path = os.path.join(get_config_dir(), SOURCE_DIGEST_CACHE_DIR, cache_name)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.previous = json.load(f)
+        except (ImportError, OSError, ValueError):
+            pass
+
+    def track(self, arcname, tarinfo, fileobj):
+        """Return the file object to read the content of a packed file from."""
+        record = self.previous.get(arcname)
+        if record and record[0] == tarinfo.size and record[1] == tarinfo.mtime:
+            self.current[arcname] = record
+            return fileobj
+        reader = _HashingReader(fileobj)
+        self.current[arcname] = [tarinfo.size, tarinfo.mtime, reader.digest]
+        return reader
+
+    def _digest(self, arcname):
+        digest = self.current[arcname][2]
+        return digest if isinstance(digest, str) else digest.hexdigest()
+
+    def report_changes(self):
+        if not self.previous:
+            logger.info("Packed %d files from '%s'", len(self.current), self.source_location)
+            return
+        added = sorted(name for name in self.current if name not in self.previous)
+        removed = sorted(name for name in self.previous if name not in self.current)
+        modified = sorted(name for name in self.current
+                          if name in self.previous and self._digest(name) != self.previous[name][2])
+        logger.warning("Packed %d files, %d added, %d modified and %d removed since the last deployment from '%s'",
+                       len(self.current), len(added), len(modified), len(removed), self.source_location)
+        for title, names in (('Added', added), ('Modified', modified), ('Removed', removed)):
+            for name in names:
+                logger.info("%s: %s", title, name)
+
+    def save(self):
+        if not self.path:
+            return
+        records = {name: [record[0], record[1], self._digest(name)] for name, record in self.current.items()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(records, f)
+        except OSError as e:
+            logger.debug("Failed to save the source digests to '%s': %s", self.path, e)
 
 
 class IgnoreRule(object):  # pylint: disable=too-few-public-methods
@@ -131,7 +306,8 @@ def _load_gitignore_file(source_location):
     return ignore_list, len(ignore_list)
 
 
-def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check):
+def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check,
+                              prune_check=None, digest_cache=None):
     # create a TarInfo object from the file
     tarinfo = tar.gettarinfo(name, arcname)
 
@@ -146,16 +322,20 @@ def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matchin
         # append the tar header and data to the archive
         if tarinfo.isreg():
             with open(name, "rb") as f:
-                tar.addfile(tarinfo, f)
+                tar.addfile(tarinfo, digest_cache.track(arcname, tarinfo, f) if digest_cache else f)
         else:
             tar.addfile(tarinfo)
 
     # even the dir is ignored, its child items can still be included, so continue to scan
     if tarinfo.isdir():
+        if prune_check and prune_check(ignored, matching_rule_index):
+            logger.debug("Skipping the content of ignored directory '%s'", arcname)
+            return
         for f in os.listdir(name):
             _archive_file_recursively(tar, os.path.join(name, f), os.path.join(arcname, f),
                                       parent_ignored=ignored, parent_matching_rule_index=matching_rule_index,
-                                      ignore_check=ignore_check)
+                                      ignore_check=ignore_check, prune_check=prune_check,
+                                      digest_cache=digest_cache)
 
 
 def get_blob_info(blob_sas_url):
@@ -49,6 +49,13 @@ def validate_instance_count(namespace):
             raise CLIError("--instance-count must be greater than 0")
 
 
+def validate_upload_options(namespace):
+    if namespace.upload_connections is not None and namespace.upload_connections < 1:
+        raise CLIError("--upload-connections must be greater than 0")
+    if namespace.upload_range_size is not None and not 1 <= namespace.upload_range_size <= 4:
+        raise CLIError("--upload-range-size must be in the range [1,4]")
+
+
 def validate_name(namespace):
     namespace.name = namespace.name.lower()
     matchObj = match(r'^[a-z][a-z0-9-]{2,30}[a-z0-9]$', namespace.name)
@@ -25,7 +25,7 @@ from .vendored_sdks.appplatform.v2020_11_01_preview import (
     AppPlatformManagementClient as AppPlatformManagementClient_20201101preview
 )
 from knack.log import get_logger
-from .azure_storage_file import FileService
+from ._upload_utils import upload_artifact
 from azure.cli.core.azclierror import InvalidArgumentValueError
 from azure.cli.core.commands.client_factory import get_mgmt_service_client
 from azure.cli.core.util import sdk_no_wait
@@ -40,6 +40,9 @@ from threading import Thread
 from threading import Timer
 import sys
 import json
+import heapq
+import queue
+import time
 from collections import defaultdict
 
 logger = get_logger(__name__)
@@ -471,7 +474,10 @@ def app_deploy(cmd, client, resource_group, service, name,
                jvm_options=None,
                main_entry=None,
                env=None,
-               no_wait=False):
+               no_wait=False,
+               upload_connections=None,
+               upload_range_size=None,
+               validate_upload=False):
     logger.warning(LOG_RUNNING_PROMPT)
     if not deployment:
         deployment = client.apps.get(
@@ -482,7 +488,8 @@ def app_deploy(cmd, client, resource_group, service, name,
 
     client.deployments.get(resource_group, service, name, deployment)
 
-    file_type, file_path = _get_upload_local_file(runtime_version, artifact_path)
+    file_type, file_path, source_digests = _get_upload_local_file(
+        runtime_version, artifact_path, '/'.join((resource_group, service, name, deployment)))
 
     return _app_deploy(client,
                        resource_group,
@@ -501,7 +508,11 @@ def app_deploy(cmd, client, resource_group, service, name,
                        target_module,
                        no_wait,
                        file_type,
-                       True)
+                       True,
+                       upload_connections=upload_connections,
+                       upload_range_size=upload_range_size,
+                       validate_upload=validate_upload,
+                       source_digests=source_digests)
 
 
 def app_scale(cmd, client, resource_group, service, name,
@@ -549,7 +560,11 @@ def app_get_build_log(cmd, client, resource_group, service, name, deployment=Non
 
 
 def app_tail_log(cmd, client, resource_group, service, name,
-                 deployment=None, instance=None, follow=False, lines=50, since=None, limit=2048, format_json=None):
+                 deployment=None, instance=None, follow=False, lines=50, since=None, limit=2048, format_json=None,
+                 all_instances=False):
+    if instance and all_instances:
+        raise InvalidArgumentValueError("'--instance' can't be used together with '--all-instances'.")
+    instances = [instance]
     if not instance:
         if deployment is None:
             deployment = client.apps.get(
@@ -561,14 +576,14 @@ def app_tail_log(cmd, client, resource_group, service, name,
         if not deployment_properties.instances:
             raise CLIError("No instances found for deployment '{0}' in app '{1}'".format(
                 deployment, name))
-        instances = deployment_properties.instances
-        if len(instances) > 1:
+        instances = [temp_instance.name for temp_instance in deployment_properties.instances]
+        if len(instances) > 1 and not all_instances:
             logger.warning("Multiple app instances found:")
             for temp_instance in instances:
-                logger.warning("{}".format(temp_instance.name))
-            logger.warning("Please use '-i/--instance' parameter to specify the instance name")
+                logger.warning("{}".format(temp_instance))
+            logger.warning("Please use '-i/--instance' parameter to specify the instance name, "
+                           "or '--all-instances' to show the logs of all of them")
             return None
-        instance = instances[0].name
 
     test_keys = client.services.list_test_keys(resource_group, service)
     primary_key = test_keys.primary_key
@@ -580,8 +595,6 @@ def app_tail_log(cmd, client, resource_group, service, name,
     base_url = test_url.replace('.test.', '.')
     base_url = re.sub('https://.+?\@', '', base_url)
 
-    streaming_url = "https://{0}/api/logstream/apps/{1}/instances/{2}".format(
-        base_url, name, instance)
     params = {}
     params["tailLines"] = lines
     params["limitBytes"] = limit
@@ -589,11 +602,19 @@ def app_tail_log(cmd, client, resource_group, service, name,
         params["sinceSeconds"] = since
     if follow:
         params["follow"] = True
+    query = "?{}".format(parse.urlencode(params)) if params else ""
+
+    instance_urls = {}
+    for temp_instance in instances:
+        instance_urls[temp_instance] = "https://{0}/api/logstream/apps/{1}/instances/{2}".format(
+            base_url, name, temp_instance) + query
+
+    if all_instances:
+        return _get_app_logs_merged(instance_urls, "primary", primary_key, format_json)
 
     exceptions = []
-    streaming_url += "?{}".format(parse.urlencode(params)) if params else ""
     t = Thread(target=_get_app_log, args=(
-        streaming_url, "primary", primary_key, format_json, exceptions))
+        instance_urls[instances[0]], "primary", primary_key, format_json, exceptions))
     t.daemon = True
     t.start()
 
@@ -722,38 +743,29 @@ def deployment_create(cmd, client, resource_group, service, app, name,
                       memory=None,
                       instance_count=None,
                       env=None,
-                      no_wait=False):
+                      no_wait=False,
+                      upload_connections=None,
+                      upload_range_size=None,
+                      validate_upload=False):
     cpu = validate_cpu(cpu)
     memory = validate_memory(memory)
     logger.warning(LOG_RUNNING_PROMPT)
-    deployments = _get_all_deployments(client, resource_group, service, app)
-    if name in deployments:
+    if name in _get_all_deployments(client, resource_group, service, app):
         raise CLIError("Deployment " + name + " already exists")
 
     resource = client.services.get(resource_group, service)
     _validate_instance_count(resource.sku.tier, instance_count)
 
     if not skip_clone_settings:
-        active_deployment_name = client.apps.get(
-            resource_group, service, app).properties.active_deployment_name
-        if not active_deployment_name:
-            logger.warning("No production deployment found, use --skip-clone-settings to skip copying settings from "
-                           "production deployment.")
-        else:
-            active_deployment = client.deployments.get(
-                resource_group, service, app, active_deployment_name)
-            if active_deployment:
-                cpu = cpu or active_deployment.properties.deployment_settings.resource_requests.cpu
-                memory = memory or active_deployment.properties.deployment_settings.resource_requests.memory
-                instance_count = instance_count or active_deployment.sku.capacity
-                jvm_options = jvm_options or active_deployment.properties.deployment_settings.jvm_options
-                env = env or active_deployment.properties.deployment_settings.environment_variables
+        cpu, memory, instance_count, jvm_options, env = _clone_production_deployment_settings(
+            client, resource_group, service, app, cpu, memory, instance_count, jvm_options, env)
     else:
         cpu = cpu or "1"
         memory = memory or "1Gi"
         instance_count = instance_count or 1
 
-    file_type, file_path = _get_upload_local_file(runtime_version, artifact_path)
+    file_type, file_path, source_digests = _get_upload_local_file(
+        runtime_version, artifact_path, '/'.join((resource_group, service, app, name)))
     return _app_deploy(client, resource_group, service, app, name, version, file_path,
                        runtime_version,
                        jvm_options,
@@ -764,7 +776,30 @@ def deployment_create(cmd, client, resource_group, service, app, name,
                        main_entry,
                        target_module,
                        no_wait,
-                       file_type)
+                       file_type,
+                       upload_connections=upload_connections,
+                       upload_range_size=upload_range_size,
+                       validate_upload=validate_upload,
+                       source_digests=source_digests)
+
+
+def _clone_production_deployment_settings(client, resource_group, service, app,
+                                          cpu, memory, instance_count, jvm_options, env):
+    active_deployment_name = client.apps.get(
+        resource_group, service, app).properties.active_deployment_name
+    if not active_deployment_name:
+        logger.warning("No production deployment found, use --skip-clone-settings to skip copying settings from "
+                       "production deployment.")
+        return cpu, memory, instance_count, jvm_options, env
+    active_deployment = client.deployments.get(
+        resource_group, service, app, active_deployment_name)
+    if active_deployment:
+        cpu = cpu or active_deployment.properties.deployment_settings.resource_requests.cpu
+        memory = memory or active_deployment.properties.deployment_settings.resource_requests.memory
+        instance_count = instance_count or active_deployment.sku.capacity
+        jvm_options = jvm_options or active_deployment.properties.deployment_settings.jvm_options
+        env = env or active_deployment.properties.deployment_settings.environment_variables
+    return cpu, memory, instance_count, jvm_options, env
 
 
 def _validate_instance_count(sku, instance_count=None):
@@ -1274,7 +1309,11 @@ def _app_deploy(client, resource_group, service, app, name, version, path, runti
                 target_module=None,
                 no_wait=False,
                 file_type="Jar",
-                update=False):
+                update=False,
+                upload_connections=None,
+                upload_range_size=None,
+                validate_upload=False,
+                source_digests=None):
     upload_url = None
     relative_path = None
     logger.warning("file_type is {}".format(file_type))
@@ -1314,8 +1353,10 @@ def _app_deploy(client, resource_group, service, app, name, version, path, runti
         raise CLIError("Failed to get a SAS URL to upload context.")
     account_name, endpoint_suffix, share_name, relative_name, sas_token = get_azure_files_info(upload_url)
     logger.warning("[2/3] Uploading package to blob")
-    file_service = FileService(account_name, sas_token=sas_token, endpoint_suffix=endpoint_suffix)
-    file_service.create_file_from_path(share_name, None, relative_name, path)
+    upload_artifact(account_name, sas_token, endpoint_suffix, share_name, relative_name, path,
+                    upload_connections=upload_connections,
+                    upload_range_size=upload_range_size,
+                    validate_content=validate_upload)
 
     if file_type == "Source" and not no_wait:
         def get_log_url():
@@ -1352,116 +1393,131 @@ def _app_deploy(client, resource_group, service, app, name, version, path, runti
         "[3/3] Updating deployment in app '{}' (this operation can take a while to complete)".format(app))
     deployment_resource = models.DeploymentResource(properties=properties, sku=sku)
     if update:
-        return sdk_no_wait(no_wait, client.deployments.begin_update,
-                           resource_group, service, app, name, deployment_resource)
-
-    return sdk_no_wait(no_wait, client.deployments.begin_create_or_update,
-                       resource_group, service, app, name, deployment_resource)
+        poller = sdk_no_wait(no_wait, client.deployments.begin_update,
+                             resource_group, service, app, name, deployment_resource)
+    else:
+        poller = sdk_no_wait(no_wait, client.deployments.begin_create_or_update,
+                             resource_group, service, app, name, deployment_resource)
+    # the source is only compared with what was uploaded and accepted for the deployment
+    if source_digests:
+        source_digests.save()
+    return poller
 
 
-# pylint: disable=bare-except, too-many-statements
-def _get_app_log(url, user_name, password, format_json, exceptions):
-    logger_seg_regex = re.compile(r'([^\.])[^\.]+\.')
-
-    def build_log_shortener(length):
-        if length <= 0:
-            raise InvalidArgumentValueError('Logger length in `logger{length}` should be positive')
-
-        def shortener(record):
-            '''
-            Try shorten the logger property to the specified length before feeding it to the formatter.
-            '''
-            logger_name = record.get('logger', None)
-            if logger_name is None:
-                return record
-
-            # first, try to shorten the package name to one letter, e.g.,
-            #     org.springframework.cloud.netflix.eureka.config.DiscoveryClientOptionalArgsConfiguration
-            # to: o.s.c.n.e.c.DiscoveryClientOptionalArgsConfiguration
-            while len(logger_name) > length:
-                logger_name, count = logger_seg_regex.subn(r'\1.', logger_name, 1)
-                if count < 1:
-                    break
+LOG_REORDER_WINDOW_SECONDS = 2
+LOG_REORDER_MAX_LINES = 10000
+LOG_TIMESTAMP_REGEX = re.compile(r'(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)')
+LOG_SEGMENT_REGEX = re.compile(r'([^\.])[^\.]+\.')
 
-            # then, cut off the leading packages if necessary
-            logger_name = logger_name[-length:]
-            record['logger'] = logger_name
-            return record
 
-        return shortener
+def _build_log_shortener(length):
+    if length <= 0:
+        raise InvalidArgumentValueError('Logger length in `logger{length}` should be positive')
 
-    def build_formatter():
+    def shortener(record):
         '''
-        Build the log line formatter based on the format_json argument.
+        Try shorten the logger property to the specified length before feeding it to the formatter.
         '''
-        nonlocal format_json
+        logger_name = record.get('logger', None)
+        if logger_name is None:
+            return record
 
-        def identity(o):
-            return o
+        # first, try to shorten the package name to one letter, e.g.,
+        #     org.springframework.cloud.netflix.eureka.config.DiscoveryClientOptionalArgsConfiguration
+        # to: o.s.c.n.e.c.DiscoveryClientOptionalArgsConfiguration
+        while len(logger_name) > length:
+            logger_name, count = LOG_SEGMENT_REGEX.subn(r'\1.', logger_name, 1)
+            if count < 1:
+                break
 
-        if format_json is None or len(format_json) == 0:
-            return identity
+        # then, cut off the leading packages if necessary
+        logger_name = logger_name[-length:]
+        record['logger'] = logger_name
+        return record
 
-        logger_regex = re.compile(r'\blogger\{(\d+)\}')
-        match = logger_regex.search(format_json)
-        pre_processor = identity
-        if match:
-            length = int(match[1])
-            pre_processor = build_log_shortener(length)
-            format_json = logger_regex.sub('logger', format_json, 1)
+    return shortener
 
-        first_exception = True
 
-        def format_line(line):
-            nonlocal first_exception
-            try:
-                log_record = json.loads(line)
-                # Add n=\n so that in Windows CMD it's easy to specify customized format with line ending
-                # e.g., "{timestamp} {message}{n}"
-                # (Windows CMD does not escape \n in string literal.)
-                return format_json.format_map(pre_processor(defaultdict(str, n="\n", **log_record)))
-            except:
-                if first_exception:
-                    # enable this format error logging only with --verbose
-                    logger.info("Failed to format log line '{}'".format(line), exc_info=sys.exc_info())
-                    first_exception = False
-                return line
-
-        return format_line
-
-    def iter_lines(response, limit=2**20):
-        '''
-        Returns a line iterator from the response content. If no line ending was found and the buffered content size is
-        larger than the limit, the buffer will be yielded directly.
-        '''
-        buffer = []
-        total = 0
-        for content in response.iter_content(chunk_size=None):
-            if not content:
-                if len(buffer) > 0:
-                    yield b''.join(buffer)
-                break
+# pylint: disable=bare-except
+def _build_log_formatter(format_json):
+    '''
+    Build the log line formatter based on the format_json argument.
+    '''
+    def identity(o):
+        return o
 
-            start = 0
-            while start < len(content):
-                line_end = content.find(b'\n', start)
-                should_print = False
-                if line_end < 0:
-                    next = (content if start == 0 else content[start:])
-                    buffer.append(next)
-                    total += len(next)
-                    start = len(content)
-                    should_print = total >= limit
-                else:
-                    buffer.append(content[start:line_end + 1])
-                    start = line_end + 1
-                    should_print = True
+    if format_json is None or len(format_json) == 0:
+        return identity
+
+    logger_regex = re.compile(r'\blogger\{(\d+)\}')
+    match = logger_regex.search(format_json)
+    pre_processor = identity
+    if match:
+        length = int(match[1])
+        pre_processor = _build_log_shortener(length)
+        format_json = logger_regex.sub('logger', format_json, 1)
+
+    first_exception = True
+
+    def format_line(line):
+        nonlocal first_exception
+        try:
+            log_record = json.loads(line)
+            # Add n=\n so that in Windows CMD it's easy to specify customized format with line ending
+            # e.g., "{timestamp} {message}{n}"
+            # (Windows CMD does not escape \n in string literal.)
+            return format_json.format_map(pre_processor(defaultdict(str, n="\n", **log_record)))
+        except:
+            if first_exception:
+                # enable this format error logging only with --verbose
+                logger.info("Failed to format log line '{}'".format(line), exc_info=sys.exc_info())
+                first_exception = False
+            return line
+
+    return format_line
+
+
+def _iter_log_lines(response, limit=2**20):
+    '''
+    Returns a line iterator from the response content. If no line ending was found and the buffered content size is
+    larger than the limit, the buffer will be yielded directly.
+    '''
+    buffer = []
+    total = 0
+    for content in response.iter_content(chunk_size=None):
+        if not content:
+            if len(buffer) > 0:
+                yield b''.join(buffer)
+            break
+
+        start = 0
+        while start < len(content):
+            line_end = content.find(b'\n', start)
+            should_print = False
+            if line_end < 0:
+                next = (content if start == 0 else content[start:])
+                buffer.append(next)
+                total += len(next)
+                start = len(content)
+                should_print = total >= limit
+            else:
+                buffer.append(content[start:line_end + 1])
+                start = line_end + 1
+                should_print = True
+
+            if should_print:
+                yield b''.join(buffer)
+                buffer.clear()
+                total = 0
+
+
+def _decode_log_line(line, std_encoding):
+    return (line.decode(encoding='utf-8', errors='replace')
+            .encode(std_encoding, errors='replace')
+            .decode(std_encoding, errors='replace'))
 
-                if should_print:
-                    yield b''.join(buffer)
-                    buffer.clear()
-                    total = 0
 
+def _get_app_log(url, user_name, password, format_json, exceptions):
     with requests.get(url, stream=True, auth=HTTPBasicAuth(user_name, password)) as response:
         try:
             if response.status_code != 200:
@@ -1469,18 +1525,127 @@ def _get_app_log(url, user_name, password, format_json, exceptions):
                     response.status_code, response.reason))
             std_encoding = sys.stdout.encoding
 
-            formatter = build_formatter()
+            formatter = _build_log_formatter(format_json)
 
-            for line in iter_lines(response):
-                decoded = (line.decode(encoding='utf-8', errors='replace')
-                           .encode(std_encoding, errors='replace')
-                           .decode(std_encoding, errors='replace'))
-                print(formatter(decoded), end='')
+            for line in _iter_log_lines(response):
+                print(formatter(_decode_log_line(line, std_encoding)), end='')
 
         except CLIError as e:
             exceptions.append(e)
 
 
+def _get_log_timestamp(line):
+    '''
+    Returns the timestamp a log line starts with, plain or as the first property of a JSON record, in a form which
+    sorts chronologically, or None.
+    '''
+    match = LOG_TIMESTAMP_REGEX.search(line, 0, 64)
+    if not match:
+        return None
+    return '{} {}'.format(match.group(1), match.group(2).replace(',', '.'))
+
+
+def _read_instance_log(instance, url, user_name, password, lines_queue, exceptions):
+    '''
+    Reads the log lines of an instance into lines_queue as (timestamp, instance, line) tuples, followed by a None line
+    when the stream ends. Lines without a timestamp, e.g. stack traces, take the one of the line before them.
+    '''
+    timestamp = ''
+    try:
+        with requests.get(url, stream=True, auth=HTTPBasicAuth(user_name, password)) as response:
+            if response.status_code != 200:
+                raise CLIError("Failed to connect to the server for instance '{}' with status code '{}' and reason "
+                               "'{}'".format(instance, response.status_code, response.reason))
+            std_encoding = sys.stdout.encoding
+            for line in _iter_log_lines(response):
+                decoded = _decode_log_line(line, std_encoding)
+                timestamp = _get_log_timestamp(decoded) or timestamp
+                lines_queue.put((timestamp, instance, decoded))
+    except CLIError as e:
+        exceptions.append(e)
+    except requests.exceptions.RequestException as e:
+        exceptions.append(CLIError("Failed to stream the logs of instance '{}': {}".format(instance, e)))
+    finally:
+        lines_queue.put((None, instance, None))
+
+
+class _LogReorderBuffer:
+    '''
+    Holds the lines of several log streams for a short window and releases them ordered by timestamp, so that the
+    lines that instances wrote at about the same time come out in order whichever stream delivered them first.
+    '''
+
+    def __init__(self, window=LOG_REORDER_WINDOW_SECONDS, max_lines=LOG_REORDER_MAX_LINES):
+        self.window = window
+        self.max_lines = max_lines
+        self._heap = []
+        self._count = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, timestamp, instance, line, now=None):
+        # the count keeps the lines of a stream in order when their timestamps are equal
+        heapq.heappush(self._heap, (timestamp, self._count, now or time.time(), instance, line))
+        self._count += 1
+
+    def pop_ready(self, now=None):
+        '''Yields the (instance, line) that have waited for the whole window or don't fit in the buffer anymore.'''
+        now = now or time.time()
+        while self._heap and (len(self._heap) > self.max_lines or now - self._heap[0][2] >= self.window):
+            _, _, _, instance, line = heapq.heappop(self._heap)
+            yield instance, line
+
+    def pop_all(self):
+        while self._heap:
+            _, _, _, instance, line = heapq.heappop(self._heap)
+            yield instance, line
+
+
+def _get_app_logs_merged(instance_urls, user_name, password, format_json):
+    '''
+    Streams the logs of several instances at once, printing their lines in timestamp order with the name of their
+    instance in front of them.
+    '''
+    # the formatter is shared by all the streams, it only runs on this thread
+    formatter = _build_log_formatter(format_json)
+    width = max(len(instance) for instance in instance_urls)
+    lines_queue = queue.Queue()
+    exceptions = []
+
+    for instance, url in instance_urls.items():
+        t = Thread(target=_read_instance_log, args=(
+            instance, url, user_name, password, lines_queue, exceptions))
+        t.daemon = True
+        t.start()
+
+    def print_line(instance, line):
+        prefix = '[{}] '.format(instance.ljust(width))
+        print(''.join(prefix + part for part in formatter(line).splitlines(True)), end='')
+
+    reorder_buffer = _LogReorderBuffer()
+    running = len(instance_urls)
+    while running:
+        try:
+            timestamp, instance, line = lines_queue.get(timeout=0.5)
+            if line is None:
+                running -= 1
+            else:
+                reorder_buffer.add(timestamp, instance, line)
+        except queue.Empty:
+            pass
+        for instance, line in reorder_buffer.pop_ready():
+            print_line(instance, line)
+
+    for instance, line in reorder_buffer.pop_all():
+        print_line(instance, line)
+
+    if len(exceptions) == len(instance_urls):
+        raise exceptions[0]
+    for e in exceptions:
+        logger.warning(e)
+
+
 def certificate_add(cmd, client, resource_group, service, name, vault_uri, vault_certificate_name):
     properties = models.CertificateProperties(
         vault_uri=vault_uri,
@@ -0,0 +1,118 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Uploads a file through the vendored azure_storage_file/_upload_chunking.py path to a local HTTP stand-in of the
+file service, which simulates the latency of a request and the bandwidth of a connection, and reports the time
+taken by every combination of upload connections and range size.
+
+    python -m azext_spring_cloud.tests.latest.benchmark_upload [--size 300] [--latency 50] [--bandwidth 10]
+        [--connections 1 2 4 8 16] [--range-sizes 1 4] [--validate]
+"""
+
+import argparse
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from azext_spring_cloud._upload_utils import upload_artifact
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FileServiceStandIn(object):
+    """ accepts the Create File and Put Range requests of an upload and keeps the size of the content received """
+
+    def __init__(self, latency, bandwidth):
+        stand_in = self
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.received = 0
+        self.invalid_ranges = 0
+        self.lock = threading.Lock()
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_PUT(self):  # pylint: disable=invalid-name
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                time.sleep(stand_in.latency + len(body) / stand_in.bandwidth)
+                md5 = self.headers.get('Content-MD5')
+                with stand_in.lock:
+                    stand_in.received += len(body)
+                    if md5 and base64.b64encode(hashlib.md5(body).digest()).decode() != md5:
+                        stand_in.invalid_ranges += 1
+                self.send_response(201)
+                self.send_header('ETag', '"0x8D0000000000000"')
+                self.send_header('Last-Modified', 'Thu, 01 Jan 2015 00:00:00 GMT')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def connection_string(self):
+        return 'FileEndpoint=http://127.0.0.1:{}/account1;SharedAccessSignature=sv=2019-02-02&sig=benchmark'.format(
+            self.server.server_address[1])
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def benchmark(path, stand_in, connections, range_size, validate):
+    stand_in.received = 0
+    start = time.time()
+    upload_artifact(None, None, None, 'share1', 'artifact.jar', path,
+                    upload_connections=connections, upload_range_size=range_size, validate_content=validate,
+                    connection_string=stand_in.connection_string)
+    elapsed = time.time() - start
+    if stand_in.received != os.path.getsize(path):
+        raise AssertionError('{} bytes received out of {}'.format(stand_in.received, os.path.getsize(path)))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=300, help='size of the uploaded file in MB')
+    parser.add_argument('--latency', type=float, default=50, help='latency of a request in milliseconds')
+    parser.add_argument('--bandwidth', type=float, default=10, help='bandwidth of a connection in MB/s')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--range-sizes', type=int, nargs='+', default=[1, 4], help='sizes of the ranges in MiB')
+    parser.add_argument('--validate', action='store_true', help='send the MD5 hash of every range')
+    args = parser.parse_args()
+
+    stand_in = FileServiceStandIn(args.latency / 1000.0, args.bandwidth * 1024 * 1024)
+    with tempfile.NamedTemporaryFile(suffix='.jar', delete=False) as artifact:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(args.size):
+            artifact.write(chunk)
+    try:
+        print('{:>12} {:>11} {:>10} {:>10}'.format('connections', 'range (MiB)', 'seconds', 'MB/s'))
+        for range_size in args.range_sizes:
+            for connections in args.connections:
+                elapsed = benchmark(artifact.name, stand_in, connections, range_size, args.validate)
+                print('{:>12} {:>11} {:>10.2f} {:>10.2f}'.format(connections, range_size, elapsed,
+                                                                  args.size / elapsed))
+        if stand_in.invalid_ranges:
+            print('{} ranges failed the MD5 validation'.format(stand_in.invalid_ranges))
+    finally:
+        os.remove(artifact.name)
+        stand_in.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from knack.util import CLIError
+from ...custom import _LogReorderBuffer, _get_app_logs_merged, _get_log_timestamp
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    from unittest import mock
+
+
+class _Response(object):
+    def __init__(self, chunks, status_code=200):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.reason = 'OK' if status_code == 200 else 'Not Found'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def iter_content(self, chunk_size=None):  # pylint: disable=unused-argument
+        for chunk in self.chunks:
+            yield chunk
+        yield b''
+
+
+def _merged_output(responses, format_json=None):
+    def _get(url, **kwargs):  # pylint: disable=unused-argument
+        return responses[url]
+
+    output = io.BytesIO()
+    stdout = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    with mock.patch('requests.get', _get), redirect_stdout(stdout):
+        _get_app_logs_merged({url.split('/')[-1]: url for url in responses}, 'primary', 'key', format_json)
+    stdout.flush()
+    return output.getvalue().decode('utf-8')
+
+
+class TestAppLogs(unittest.TestCase):
+    def test_get_log_timestamp(self):
+        self.assertEqual(_get_log_timestamp('2021-08-10 12:00:01.123  INFO 1 --- [main] Started'),
+                         '2021-08-10 12:00:01.123')
+        self.assertEqual(_get_log_timestamp('{"timestamp":"2021-08-10T12:00:01,5Z","message":"Started"}'),
+                         '2021-08-10 12:00:01.5')
+        self.assertIsNone(_get_log_timestamp('\tat java.lang.Thread.run(Thread.java:748)'))
+
+    def test_reorder_buffer(self):
+        buffer = _LogReorderBuffer(window=2, max_lines=3)
+        buffer.add('2021-08-10 12:00:02', 'b', 'b1', now=100)
+        buffer.add('2021-08-10 12:00:01', 'a', 'a1', now=101)
+        buffer.add('2021-08-10 12:00:01', 'a', 'a2', now=101)
+        self.assertEqual(list(buffer.pop_ready(now=101)), [])
+        self.assertEqual(list(buffer.pop_ready(now=103)), [('a', 'a1'), ('a', 'a2'), ('b', 'b1')])
+
+        # the oldest lines are released when the buffer is full
+        for i in range(5):
+            buffer.add('2021-08-10 12:00:0{}'.format(i), 'a', str(i), now=200)
+        self.assertEqual(list(buffer.pop_ready(now=200)), [('a', '0'), ('a', '1')])
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual([line for _, line in buffer.pop_all()], ['2', '3', '4'])
+
+    def test_merged_logs(self):
+        output = _merged_output({
+            'https://logs/app-1': _Response([b'2021-08-10 12:00:01.000 started\n2021-08-10 12:00:03.000 ready\n']),
+            'https://logs/app-22': _Response([b'2021-08-10 12:00:02.000 failed\n\tat Main.java:1\n',
+                                              b'2021-08-10 12:00:04.000 retried\n'])
+        })
+        self.assertEqual(output.splitlines(), [
+            '[app-1 ] 2021-08-10 12:00:01.000 started',
+            '[app-22] 2021-08-10 12:00:02.000 failed',
+            '[app-22] \tat Main.java:1',
+            '[app-1 ] 2021-08-10 12:00:03.000 ready',
+            '[app-22] 2021-08-10 12:00:04.000 retried'])
+
+    def test_merged_logs_format_json(self):
+        output = _merged_output({
+            'https://logs/app-1': _Response([b'{"timestamp":"2021-08-10T12:00:01Z","logger":"org.example.Main",'
+                                             b'"message":"started"}\n']),
+            'https://logs/app-2': _Response([], status_code=404)
+        }, format_json='{timestamp} {logger{8}}: {message}{n}second line{n}')
+        self.assertEqual(output.splitlines(), ['[app-1] 2021-08-10T12:00:01Z o.e.Main: started',
+                                               '[app-1] second line'])
+
+    def test_merged_logs_failure(self):
+        with self.assertRaisesRegex(CLIError, "instance 'app-1' with status code '404'"):
+            _merged_output({'https://logs/app-1': _Response([], status_code=404)})
+
+
+if __name__ == '__main__':
+    unittest.main()
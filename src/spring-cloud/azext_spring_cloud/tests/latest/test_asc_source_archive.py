@@ -0,0 +1,127 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from ..._utils import _pack_source_code, _ParallelGzipWriter
+from ...custom import _app_deploy
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    from unittest import mock
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestPackSourceCode(unittest.TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.config_dir = tempfile.mkdtemp()
+        self.archive = os.path.join(tempfile.mkdtemp(), 'source.tar.gz')
+        patcher = mock.patch('azure.cli.core._environment.get_config_dir', return_value=self.config_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for path in (self.source, self.config_dir, os.path.dirname(self.archive)):
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _pack(self, target='rg/service/app/default', deployed=True):
+        source_digests = _pack_source_code(self.source, self.archive, target)
+        if deployed:
+            source_digests.save()
+        with tarfile.open(self.archive, 'r:gz') as tar:
+            return sorted(member.name for member in tar.getmembers() if member.isfile())
+
+    def test_ignore_rules(self):
+        _write(os.path.join(self.source, '.gitignore'), 'build\n*.log\nlogs\n!logs/keep.log\n')
+        _write(os.path.join(self.source, 'src', 'main.py'), 'print(1)')
+        _write(os.path.join(self.source, 'app.log'), 'ignored')
+        _write(os.path.join(self.source, 'build', 'out.bin'), 'ignored')
+        _write(os.path.join(self.source, 'logs', 'keep.log'), 'included again')
+        _write(os.path.join(self.source, 'logs', 'other.log'), 'ignored')
+        _write(os.path.join(self.source, '.git', 'HEAD'), 'ignored')
+
+        self.assertEqual(self._pack(), ['logs/keep.log', 'src/main.py'])
+
+    def test_ignored_directory_is_pruned(self):
+        _write(os.path.join(self.source, '.gitignore'), 'node_modules\n')
+        _write(os.path.join(self.source, 'node_modules', 'pkg', 'index.js'), 'ignored')
+        _write(os.path.join(self.source, 'index.js'), 'included')
+
+        with mock.patch('os.listdir', side_effect=os.listdir) as listdir:
+            self.assertEqual(self._pack(), ['index.js'])
+        scanned = [os.path.relpath(call[0][0], self.source) for call in listdir.call_args_list]
+        self.assertNotIn('node_modules', scanned)
+
+    def test_changes_since_last_deployment(self):
+        _write(os.path.join(self.source, 'a.txt'), 'a')
+        _write(os.path.join(self.source, 'b.txt'), 'b')
+        self._pack()
+
+        _write(os.path.join(self.source, 'a.txt'), 'changed')
+        os.remove(os.path.join(self.source, 'b.txt'))
+        _write(os.path.join(self.source, 'c.txt'), 'c')
+        with mock.patch('azext_spring_cloud._utils.logger') as logger:
+            self._pack()
+        summary = logger.warning.call_args[0]
+        self.assertEqual(summary[1:5], (2, 1, 1, 1))
+        self.assertIn(mock.call('%s: %s', 'Modified', 'a.txt'), logger.info.call_args_list)
+
+    def test_changes_are_compared_with_the_last_deployment_of_the_target(self):
+        _write(os.path.join(self.source, 'a.txt'), 'a')
+        self._pack()
+        _write(os.path.join(self.source, 'a.txt'), 'changed')
+        self._pack(deployed=False)
+
+        with mock.patch('azext_spring_cloud._utils.logger') as logger:
+            self._pack()
+        self.assertEqual(logger.warning.call_args[0][1:5], (1, 0, 1, 0))
+        # another deployment has no previous digests
+        with mock.patch('azext_spring_cloud._utils.logger') as logger:
+            self._pack(target='rg/service/app/staging')
+        logger.warning.assert_not_called()
+
+    def test_digests_are_not_saved_when_the_upload_fails(self):
+        source_digests = mock.MagicMock()
+        client = mock.MagicMock()
+        client.apps.get_resource_upload_url.return_value.upload_url = \
+            'https://account.file.core.windows.net/share/resources/a.tar.gz?sv=sas'
+        with mock.patch('azext_spring_cloud.custom.upload_artifact', side_effect=IOError('upload failed')):
+            with self.assertRaises(IOError):
+                _app_deploy(client, 'rg', 'service', 'app', 'default', None, self.archive, None, None, None, None,
+                            None, None, no_wait=True, file_type='Source', source_digests=source_digests)
+        source_digests.save.assert_not_called()
+
+        with mock.patch('azext_spring_cloud.custom.upload_artifact'):
+            _app_deploy(client, 'rg', 'service', 'app', 'default', None, self.archive, None, None, None, None,
+                        None, None, no_wait=True, file_type='Source', source_digests=source_digests)
+        source_digests.save.assert_called_once_with()
+
+
+class TestParallelGzipWriter(unittest.TestCase):
+    def test_blocks_are_gzip_members(self):
+        data = os.urandom(1000) * 50
+        out = io.BytesIO()
+        with _ParallelGzipWriter(out, block_size=4096, max_workers=4) as gz:
+            for offset in range(0, len(data), 3000):
+                gz.write(data[offset:offset + 3000])
+        self.assertEqual(gzip.decompress(out.getvalue()), data)
+        # the default tar reader accepts an archive made of several members
+        self.assertGreater(out.getvalue().count(b'\x1f\x8b\x08'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
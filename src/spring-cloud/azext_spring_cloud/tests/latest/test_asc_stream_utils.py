@@ -0,0 +1,101 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+import unittest
+
+from knack.util import CLIError
+from ..._stream_utils import _stream_logs, _LogBuffer
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    from unittest import mock
+
+
+class _Properties(object):
+    def __init__(self, content_length):
+        self.content_length = content_length
+
+
+class _BlobProperties(object):
+    def __init__(self, content_length, metadata):
+        self.properties = _Properties(content_length)
+        self.metadata = metadata
+
+
+class FakeAppendBlobService(object):
+    """Serves a log blob which grows by one part each time its properties are read."""
+
+    def __init__(self, parts, status='succeeded'):
+        self.parts = list(parts)
+        self.content = b''
+        self.status = status
+        self.ranges = []
+
+    def get_blob_properties(self, container_name, blob_name):  # pylint: disable=unused-argument
+        if self.parts:
+            self.content += self.parts.pop(0)
+        metadata = {} if self.parts else {'__complete_status': self.status}
+        return _BlobProperties(len(self.content), metadata)
+
+    def get_blob_to_stream(self, container_name, blob_name, start_range, end_range, stream,
+                           max_connections=2):  # pylint: disable=unused-argument
+        self.ranges.append((start_range, end_range))
+        stream.write(self.content[start_range:end_range + 1])
+
+
+def _stream(blob_service, byte_size=4, raise_error_on_failure=True):
+    logged = []
+    with mock.patch('time.sleep'):
+        _stream_logs(True, byte_size, 60, blob_service, 'logs', 'build.log', raise_error_on_failure,
+                     logged.append)
+    return logged
+
+
+class TestStreamLogs(unittest.TestCase):
+    def test_log_buffer(self):
+        buffer = _LogBuffer()
+        buffer.write(b'first\r\nsec')
+        self.assertEqual(buffer.pop_lines(), 'first\r')
+        self.assertEqual(len(buffer), 3)
+        self.assertIsNone(buffer.pop_lines())
+        buffer.write(b'ond\rthi')
+        self.assertEqual(buffer.pop_lines(), 'second\r')
+        buffer.write(b'rd \xe2\x9c\x93')
+        self.assertEqual(buffer.pop_all(), 'third ✓')
+        self.assertEqual(len(buffer), 0)
+
+    def test_stream_complete_log_in_one_range(self):
+        log = b''.join(b'[INFO] line %d\r\n' % i for i in range(1000)) + b'BUILD SUCCESS'
+        blob_service = FakeAppendBlobService([log])
+        logged = _stream(blob_service)
+        self.assertEqual(blob_service.ranges, [(0, len(log) - 1)])
+        # everything up to the last line break is logged at once, the rest when the log is complete
+        self.assertEqual(len(logged), 3)
+        self.assertEqual((logged[0] + '\n' + logged[1]).encode(), log)
+        self.assertEqual(logged[2], 'Log status was: succeeded')
+
+    def test_stream_growing_log(self):
+        parts = [b'compil', b'ing\r\n', b'testing\r\nte', b'sts passed\r\n']
+        blob_service = FakeAppendBlobService(parts, status='failed')
+        with self.assertRaisesRegex(CLIError, 'Run failed'):
+            _stream(blob_service)
+        logged = _stream(FakeAppendBlobService(parts, status='failed'), raise_error_on_failure=False)
+        self.assertEqual(logged, ['compiling\r', 'testing\r', 'tests passed\r', 'Log status was: failed'])
+        # the tail is requested in ranges of at least byte_size
+        self.assertEqual(blob_service.ranges[0], (0, 5))
+        self.assertEqual(blob_service.ranges[1], (6, 10))
+
+    def test_stream_large_log_in_bounded_ranges(self):
+        log = b'x' * 100 + b'\r\n'
+        blob_service = FakeAppendBlobService([log])
+        with mock.patch('azext_spring_cloud._stream_utils.MAX_CHUNK_SIZE', 16):
+            logged = _stream(blob_service)
+        self.assertEqual(len(blob_service.ranges), 7)
+        self.assertTrue(all(end - start < 16 for start, end in blob_service.ranges))
+        self.assertEqual(logged[0], 'x' * 100 + '\r')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+import io
+import os
+import tempfile
+import unittest
+
+from knack.util import CLIError
+from ..._upload_utils import upload_artifact, UploadProgress
+from ..._validators import validate_upload_options
+from .benchmark_upload import FileServiceStandIn
+
+
+class _Namespace(object):
+    def __init__(self, upload_connections=None, upload_range_size=None):
+        self.upload_connections = upload_connections
+        self.upload_range_size = upload_range_size
+
+
+class _Clock(object):
+    def __init__(self):
+        self.time = 100.0
+
+    def __call__(self):
+        return self.time
+
+
+class _Terminal(io.StringIO):
+    def isatty(self):  # pylint: disable=no-self-use
+        return True
+
+
+class TestUploadProgress(unittest.TestCase):
+    def test_throughput_and_eta(self):
+        clock = _Clock()
+        stream = _Terminal()
+        progress = UploadProgress(100 * 1024 * 1024, stream=stream, now=clock)
+        progress(0, 100 * 1024 * 1024)
+        clock.time += 2
+        progress(20 * 1024 * 1024, 100 * 1024 * 1024)
+        self.assertEqual(progress.format(), 'Uploading: 20.0% 20.0/100.0 MB, 10.00 MB/s, ETA 8s')
+        self.assertIn('Uploading: 20.0%', stream.getvalue())
+
+        # a thread reporting late doesn't move the progress back
+        progress(10 * 1024 * 1024, 100 * 1024 * 1024)
+        self.assertEqual(progress.current, 20 * 1024 * 1024)
+
+    def test_display_is_throttled(self):
+        clock = _Clock()
+        stream = _Terminal()
+        progress = UploadProgress(100, stream=stream, now=clock)
+        progress(10, 100)
+        progress(20, 100)
+        self.assertEqual(stream.getvalue().count('Uploading'), 1)
+        clock.time += 1
+        progress(30, 100)
+        self.assertEqual(stream.getvalue().count('Uploading'), 2)
+
+    def test_nothing_is_displayed_without_terminal(self):
+        stream = io.StringIO()
+        progress = UploadProgress(100, stream=stream)
+        progress(50, 100)
+        progress.done()
+        self.assertEqual(stream.getvalue(), '')
+
+
+class TestUploadArtifact(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = FileServiceStandIn(latency=0, bandwidth=float('inf'))
+        with tempfile.NamedTemporaryFile(suffix='.jar', delete=False) as artifact:
+            artifact.write(os.urandom(3 * 1024 * 1024 + 10))
+        self.path = artifact.name
+
+    def tearDown(self):
+        self.stand_in.close()
+        os.remove(self.path)
+
+    def test_upload_in_parallel_ranges(self):
+        progress = upload_artifact(None, None, None, 'share1', 'artifact.jar', self.path,
+                                   upload_connections=4, upload_range_size=1, validate_content=True,
+                                   connection_string=self.stand_in.connection_string)
+        self.assertEqual(self.stand_in.received, os.path.getsize(self.path))
+        self.assertEqual(self.stand_in.invalid_ranges, 0)
+        self.assertEqual(progress.current, os.path.getsize(self.path))
+
+
+class TestUploadValidator(unittest.TestCase):
+    def test_upload_options(self):
+        validate_upload_options(_Namespace(8, 4))
+        with self.assertRaises(CLIError):
+            validate_upload_options(_Namespace(0))
+        with self.assertRaises(CLIError):
+            validate_upload_options(_Namespace(upload_range_size=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,13 @@ helps['ssh config'] = """
           text: |
             az ssh config --ip 1.2.3.4 --file ./sshconfig
             ssh -F ./sshconfig 1.2.3.4
+        - name: Write the config of all the VMs of a resource group, replacing their previous entries in the file
+          text: |
+            az ssh config --resource-group myResourceGroup --file ./sshconfig
+        - name: Write the config of all the VMs with a tag, or matching an Azure Resource Graph condition
+          text: |
+            az ssh config --tag env=prod --file ./sshconfig
+            az ssh config --vm-filter "location =~ 'westus2'" --file ./sshconfig
         - name: Create a generic config for use with any host
           text: |
             #Bash
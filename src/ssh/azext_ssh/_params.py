@@ -24,6 +24,11 @@ def load_arguments(self, _):
                    help='Will use a private IP if available. By default only public IPs are used.')
         c.argument('overwrite', action='store_true', options_list=['--overwrite'],
                    help='Overwrites the config file if this flag is set')
+        c.argument('tag', options_list=['--tag'],
+                   help='Write the config of all the VMs with a tag, given as key[=value]')
+        c.argument('vm_filter', options_list=['--vm-filter'],
+                   help='Write the config of all the VMs matching an Azure Resource Graph condition, '
+                        'e.g. "location =~ \'westus2\'"')
 
     with self.argument_context('ssh cert') as c:
         c.argument('cert_path', options_list=['--file', '-f'],
@@ -3,18 +3,28 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import datetime
 import functools
 import os
 import hashlib
 import json
+import subprocess
 import tempfile
 
+from knack import log
 from knack import util
 
 from . import ip_utils
 from . import rsa_parser
 from . import ssh_utils
 
+logger = log.get_logger(__name__)
+
+# A certificate written by a previous call is reused if it stays valid for at least this long
+CERT_REUSE_MIN_VALIDITY = datetime.timedelta(minutes=5)
+# The account a reusable certificate was issued to is written to a file named after the certificate
+CERT_ACCOUNT_FILE_SUFFIX = ".account"
+
 
 def ssh_vm(cmd, resource_group_name=None, vm_name=None, ssh_ip=None, public_key_file=None,
            private_key_file=None, use_private_ip=False):
@@ -23,7 +33,12 @@ def ssh_vm(cmd, resource_group_name=None, vm_name=None, ssh_ip=None, public_key_
 
 
 def ssh_config(cmd, config_path, resource_group_name=None, vm_name=None, ssh_ip=None,
-               public_key_file=None, private_key_file=None, overwrite=False, use_private_ip=False):
+               public_key_file=None, private_key_file=None, overwrite=False, use_private_ip=False,
+               tag=None, vm_filter=None):
+    if tag or vm_filter or (resource_group_name and not vm_name and not ssh_ip):
+        _do_ssh_config_fleet(cmd, config_path, resource_group_name, vm_name, ssh_ip, tag, vm_filter,
+                             public_key_file, private_key_file, overwrite, use_private_ip)
+        return
     op_call = functools.partial(ssh_utils.write_ssh_config, config_path, resource_group_name, vm_name, overwrite)
     _do_ssh_op(cmd, resource_group_name, vm_name, ssh_ip, public_key_file, private_key_file, use_private_ip, op_call)
 
@@ -45,10 +60,107 @@ def _do_ssh_op(cmd, resource_group, vm_name, ssh_ip, public_key_file, private_ke
 
         raise util.CLIError(f"VM '{vm_name}' does not have a public or private IP address to SSH to")
 
-    cert_file, username = _get_and_write_certificate(cmd, public_key_file, None)
+    cert_file, username = _get_or_reuse_certificate(cmd, public_key_file)
     op_call(ssh_ip, username, cert_file, private_key_file)
 
 
+def _do_ssh_config_fleet(cmd, config_path, resource_group, vm_name, ssh_ip, tag, vm_filter,
+                         public_key_file, private_key_file, overwrite, use_private_ip):
+    if vm_name or ssh_ip:
+        raise util.CLIError("--vm-name/--name and --ip cannot be used with --tag or --vm-filter")
+    public_key_file, private_key_file = _check_or_create_public_private_files(public_key_file, private_key_file)
+
+    # the IPs of all the VMs come from one query and all the hosts share one certificate
+    vm_ips = ip_utils.query_vm_ips(cmd, _build_vm_filter(resource_group, tag, vm_filter))
+    hosts = []
+    for ip_configs in vm_ips.values():
+        vm_resource_group, vm_name = ip_configs[0]["resourceGroup"], ip_configs[0]["vmName"]
+        ip = ip_utils.select_ssh_ip(ip_configs, use_private_ip)
+        if not ip:
+            logger.warning("VM '%s' in resource group '%s' does not have an IP address to SSH to, skipping it",
+                           vm_name, vm_resource_group)
+            continue
+        hosts.append((vm_resource_group + "-" + vm_name, ip))
+
+    if not hosts:
+        raise util.CLIError("No VM with an IP address to SSH to was found")
+
+    cert_file, username = _get_or_reuse_certificate(cmd, public_key_file)
+    ssh_utils.write_ssh_config_hosts(config_path, sorted(hosts), username, cert_file, private_key_file, overwrite)
+    logger.warning("Wrote the SSH config of %d VMs to %s", len(hosts), config_path)
+
+
+def _build_vm_filter(resource_group, tag, vm_filter):
+    conditions = []
+    if resource_group:
+        conditions.append("resourceGroup =~ '{}'".format(ip_utils.escape(resource_group)))
+    if tag:
+        tag_name, _, tag_value = tag.partition("=")
+        if tag_value:
+            conditions.append("tags['{}'] =~ '{}'".format(ip_utils.escape(tag_name), ip_utils.escape(tag_value)))
+        else:
+            conditions.append("isnotnull(tags['{}'])".format(ip_utils.escape(tag_name)))
+    if vm_filter:
+        conditions.append("(" + vm_filter + ")")
+    return " and ".join(conditions)
+
+
+def _get_or_reuse_certificate(cmd, public_key_file):
+    cert_file = public_key_file + "-aadcert.pub"
+    from azure.cli.core._profile import Profile
+    account = Profile(cli_ctx=cmd.cli_ctx).get_current_account_user()
+    username = _get_reusable_certificate_username(public_key_file, cert_file, account)
+    if username:
+        logger.debug("Reusing the certificate %s", cert_file)
+        return cert_file, username
+    cert_file, username = _get_and_write_certificate(cmd, public_key_file, None)
+    _write_cert_account(cert_file, account)
+    return cert_file, username
+
+
+def _get_reusable_certificate_username(public_key_file, cert_file, account):
+    # the certificate must sign the same key, be issued to the current account and be valid for a while
+    if not os.path.isfile(cert_file):
+        return None
+    # the principals of the certificate may differ from the account user, e.g. for guest accounts, so the account
+    # the certificate was issued to is recorded next to it
+    issuing_account = _read_cert_account(cert_file)
+    if not issuing_account or issuing_account.lower() != account.lower():
+        return None
+    try:
+        cert_info = ssh_utils.get_ssh_cert_info(cert_file)
+        valid_from, valid_to = ssh_utils.get_ssh_cert_validity(cert_info)
+        key_fingerprint = ssh_utils.get_ssh_cert_key_fingerprint(cert_info)
+        principals = ssh_utils.get_ssh_cert_principals(cert_file, cert_info)
+        same_key = key_fingerprint == ssh_utils.get_public_key_fingerprint(public_key_file)
+    except (subprocess.CalledProcessError, OSError, ValueError, IndexError, util.CLIError) as e:
+        logger.debug("Unable to read the certificate %s: %s", cert_file, str(e))
+        return None
+
+    now = datetime.datetime.now()
+    not_yet_valid = valid_from and valid_from > now
+    expires_soon = valid_to and valid_to < now + CERT_REUSE_MIN_VALIDITY
+    if not same_key or not principals or not_yet_valid or expires_soon:
+        return None
+    return principals[0].lower()
+
+
+def _read_cert_account(cert_file):
+    try:
+        with open(cert_file + CERT_ACCOUNT_FILE_SUFFIX, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write_cert_account(cert_file, account):
+    try:
+        with open(cert_file + CERT_ACCOUNT_FILE_SUFFIX, 'w') as f:
+            f.write(account)
+    except OSError as e:
+        logger.debug("Unable to record the account of the certificate %s: %s", cert_file, str(e))
+
+
 def _get_and_write_certificate(cmd, public_key_file, cert_file):
     scopes = ["https://pas.windows.net/CheckMyAccess/Linux/.default"]
     data = _prepare_jwk_data(public_key_file)
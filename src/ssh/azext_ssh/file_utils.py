@@ -5,6 +5,7 @@
 
 import errno
 import os
+import tempfile
 
 
 def make_dirs_for_file(file_path):
@@ -20,3 +21,16 @@ def mkdir_p(path):
             pass
         else:
             raise
+
+
+def write_file_atomically(file_path, contents):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(contents)
+        if os.path.isfile(file_path):
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -3,12 +3,98 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import json
+
 from azure.cli.core.commands import client_factory
 from azure.cli.core import profiles
+from knack import log
 from msrestazure import tools
 
+logger = log.get_logger(__name__)
+
+RESOURCE_GRAPH_API_VERSION = '2021-03-01'
+
+# The IP configurations of the VMs matching a filter, with the public IP they reference, in a single query
+VM_IPS_QUERY = """
+Resources
+| where type =~ 'microsoft.compute/virtualmachines'{vm_filter}
+| project vmId = tolower(id), vmName = name, resourceGroup, nics = properties.networkProfile.networkInterfaces
+| mv-expand with_itemindex = nicIndex nic = nics
+| project vmId, vmName, resourceGroup, nicIndex, nicId = tolower(tostring(nic.id))
+| join kind = leftouter (
+    Resources
+    | where type =~ 'microsoft.network/networkinterfaces'
+    | mv-expand with_itemindex = ipIndex ipConfig = properties.ipConfigurations
+    | project nicId = tolower(id), ipIndex, privateIp = tostring(ipConfig.properties.privateIPAddress),
+        publicIpId = tolower(tostring(ipConfig.properties.publicIPAddress.id))
+) on nicId
+| join kind = leftouter (
+    Resources
+    | where type =~ 'microsoft.network/publicipaddresses'
+    | project publicIpId = tolower(id), publicIp = tostring(properties.ipAddress)
+) on publicIpId
+| project vmId, vmName, resourceGroup, nicIndex, ipIndex, privateIp, publicIp
+"""
+
 
 def get_ssh_ip(cmd, resource_group, vm_name, use_private_ip):
+    try:
+        vm_ips = query_vm_ips(cmd, "resourceGroup =~ '{}' and name =~ '{}'".format(
+            escape(resource_group), escape(vm_name)))
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("Unable to query Azure Resource Graph for the IP of the VM: %s", str(e))
+        vm_ips = {}
+
+    # Resource Graph may not have indexed a VM or an IP address that was just created
+    ip = next((select_ssh_ip(ip_configs, use_private_ip) for ip_configs in vm_ips.values()), None)
+    if ip:
+        return ip
+
+    logger.debug("IP of the VM not found with Azure Resource Graph, getting it from the VM and its NICs")
+    return _get_ssh_ip_from_vm(cmd, resource_group, vm_name, use_private_ip)
+
+
+def query_vm_ips(cmd, vm_filter=None):
+    """
+    Get the IP configurations of every VM matching vm_filter, a Resource Graph condition on the VM, with one query.
+    Returns the ordered list of the IP configurations (dicts with the privateIp and publicIp) of every VM by VM ID.
+    """
+    from azure.cli.core.util import send_raw_request
+
+    query = VM_IPS_QUERY.format(vm_filter="\n| where " + vm_filter if vm_filter else "")
+    body = {
+        "subscriptions": [client_factory.get_subscription_id(cmd.cli_ctx)],
+        "query": query,
+        "options": {"resultFormat": "objectArray", "$top": 1000}
+    }
+    url = "/providers/Microsoft.ResourceGraph/resources?api-version=" + RESOURCE_GRAPH_API_VERSION
+
+    rows = []
+    while True:
+        response = send_raw_request(cmd.cli_ctx, "POST", url, body=json.dumps(body)).json()
+        rows.extend(response.get("data", []))
+        skip_token = response.get("$skipToken")
+        if not skip_token:
+            break
+        body["options"]["$skipToken"] = skip_token
+
+    vm_ips = {}
+    for row in sorted(rows, key=lambda r: (r.get("nicIndex") or 0, r.get("ipIndex") or 0)):
+        vm_ips.setdefault(row["vmId"], []).append(row)
+    return vm_ips
+
+
+def select_ssh_ip(ip_configs, use_private_ip):
+    """ Pick the IP to SSH to from the ordered IP configurations of a VM, like _get_ssh_ip_from_vm does """
+    for ip_config in ip_configs:
+        if use_private_ip and ip_config.get("privateIp"):
+            return ip_config["privateIp"]
+        if ip_config.get("publicIp"):
+            return ip_config["publicIp"]
+    return None
+
+
+def _get_ssh_ip_from_vm(cmd, resource_group, vm_name, use_private_ip):
     compute_client = client_factory.get_mgmt_service_client(cmd.cli_ctx, profiles.ResourceType.MGMT_COMPUTE)
     network_client = client_factory.get_mgmt_service_client(cmd.cli_ctx, profiles.ResourceType.MGMT_NETWORK)
     vm_client = compute_client.virtual_machines
@@ -24,9 +110,15 @@ def get_ssh_ip(cmd, resource_group, vm_name, use_private_ip):
             if use_private_ip and ip_config.private_ip_address:
                 return ip_config.private_ip_address
             public_ip_ref = ip_config.public_ip_address
+            if public_ip_ref is None:
+                continue
             parsed_ip_id = tools.parse_resource_id(public_ip_ref.id)
             public_ip = ip_client.get(parsed_ip_id['resource_group'], parsed_ip_id['name'])
             if public_ip.ip_address:
                 return public_ip.ip_address
 
     return None
+
+
+def escape(value):
+    return value.replace("'", "\\'")
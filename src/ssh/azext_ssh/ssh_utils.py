@@ -2,6 +2,9 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
+import base64
+import datetime
+import hashlib
 import os
 import platform
 import subprocess
@@ -13,6 +16,10 @@ from . import file_utils
 
 logger = log.get_logger(__name__)
 
+CERT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# the comment before every Host block written by write_ssh_config_hosts, the only blocks it replaces
+GENERATED_HOST_MARKER = "# Generated by az ssh config"
+
 
 def start_ssh_connection(ip, username, cert_file, private_key_file):
     command = [_get_ssh_path(), _get_host(username, ip)]
@@ -33,8 +40,8 @@ def get_ssh_cert_info(cert_file):
     return subprocess.check_output(command, shell=platform.system() == 'Windows').decode().splitlines()
 
 
-def get_ssh_cert_principals(cert_file):
-    info = get_ssh_cert_info(cert_file)
+def get_ssh_cert_principals(cert_file, cert_info=None):
+    info = cert_info or get_ssh_cert_info(cert_file)
     principals = []
     in_principal = False
     for line in info:
@@ -49,6 +56,34 @@ def get_ssh_cert_principals(cert_file):
     return principals
 
 
+def get_ssh_cert_validity(cert_info):
+    """ Get the start and the end of the validity of a certificate, None when it is not bounded """
+    for line in cert_info:
+        words = line.split()
+        if words and words[0] == "Valid:":
+            # Valid: forever, from <time> to <time>, after <time> or before <time>
+            times = {words[i]: datetime.datetime.strptime(words[i + 1], CERT_TIME_FORMAT)
+                     for i in range(1, len(words) - 1) if words[i] in ("from", "to", "after", "before")}
+            return times.get("from") or times.get("after"), times.get("to") or times.get("before")
+    raise util.CLIError("Could not find the validity of the certificate")
+
+
+def get_ssh_cert_key_fingerprint(cert_info):
+    """ Get the fingerprint of the public key signed by a certificate """
+    for line in cert_info:
+        line = line.strip()
+        if line.startswith("Public key:"):
+            return line.split()[-1]
+    raise util.CLIError("Could not find the public key of the certificate")
+
+
+def get_public_key_fingerprint(public_key_file):
+    """ Get the SHA256 fingerprint of a public key, as printed by ssh-keygen """
+    with open(public_key_file, 'r') as f:
+        key_blob = base64.b64decode(f.read().split()[1])
+    return "SHA256:" + base64.b64encode(hashlib.sha256(key_blob).digest()).decode().rstrip("=")
+
+
 def write_ssh_config(config_path, resource_group, vm_name, overwrite,
                      ip, username, cert_file, private_key_file):
     file_utils.make_dirs_for_file(config_path)
@@ -82,6 +117,56 @@ def write_ssh_config(config_path, resource_group, vm_name, overwrite,
         f.write('\n'.join(lines))
 
 
+def write_ssh_config_hosts(config_path, hosts, username, cert_file, private_key_file, overwrite):
+    """
+    Write a host block for every (name, ip) of hosts, replacing the blocks it wrote before in the config file for
+    the same names or IPs. The whole file is rewritten at once so a reader never sees a partially written config.
+    """
+    file_utils.make_dirs_for_file(config_path)
+
+    lines = []
+    if not overwrite and os.path.isfile(config_path):
+        with open(config_path, 'r') as f:
+            lines = f.read().splitlines()
+        host_names = {name for host in hosts for name in host}
+        lines = _remove_host_blocks(lines, host_names)
+
+    for name, ip in hosts:
+        lines.append(GENERATED_HOST_MARKER)
+        lines.append("Host " + name + " " + ip)
+        lines.append("\tUser " + username)
+        lines.append("\tHostName " + ip)
+        lines.append("\tCertificateFile " + cert_file)
+        if private_key_file:
+            lines.append("\tIdentityFile " + private_key_file)
+
+    file_utils.write_file_atomically(config_path, '\n'.join(lines) + '\n')
+
+
+def _remove_host_blocks(lines, host_names):
+    """
+    Remove the Host blocks for any of host_names marked as generated, with their marker. The other blocks for
+    the same hosts are kept, ssh using the first block matching a host.
+    """
+    kept_lines = []
+    removing = False
+    for line in lines:
+        words = line.split()
+        if line.strip() == GENERATED_HOST_MARKER:
+            removing = False
+        elif words and words[0].lower() in ("host", "match"):
+            matching = words[0].lower() == "host" and any(word in host_names for word in words[1:])
+            removing = matching and bool(kept_lines) and kept_lines[-1].strip() == GENERATED_HOST_MARKER
+            if removing:
+                kept_lines.pop()
+            elif matching:
+                logger.warning("The existing block 'Host %s' of the config file wasn't written by this command "
+                               "and is kept, its settings take precedence over the new block.", ' '.join(words[1:]))
+        if not removing:
+            kept_lines.append(line)
+    return kept_lines
+
+
 def _get_ssh_path(ssh_command="ssh"):
     ssh_path = ssh_command
 
@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import datetime
 import io
 from knack import util
 from unittest import mock
@@ -37,6 +38,37 @@ class SshCustomCommandTest(unittest.TestCase):
         mock_do_op.assert_called_once_with(
             cmd, "rg", "vm", "ip", "public", "private", False, mock.ANY)
 
+    @mock.patch('azext_ssh.ssh_utils.write_ssh_config_hosts')
+    @mock.patch('azext_ssh.custom._get_or_reuse_certificate')
+    @mock.patch('azext_ssh.ip_utils.query_vm_ips')
+    @mock.patch('azext_ssh.custom._check_or_create_public_private_files')
+    def test_ssh_config_fleet(self, mock_check_files, mock_query, mock_get_cert, mock_write):
+        cmd = mock.Mock()
+        mock_check_files.return_value = "public", "private"
+        mock_query.return_value = {
+            "vm2id": [{"vmName": "vm2", "resourceGroup": "rg", "privateIp": "10.0.0.5", "publicIp": "1.2.3.5"}],
+            "vm1id": [{"vmName": "vm1", "resourceGroup": "rg", "privateIp": "10.0.0.4", "publicIp": "1.2.3.4"}],
+            "vm3id": [{"vmName": "vm3", "resourceGroup": "rg", "privateIp": "10.0.0.6", "publicIp": ""}]
+        }
+        mock_get_cert.return_value = "public-aadcert.pub", "username"
+
+        custom.ssh_config(cmd, "path/to/file", "rg", tag="env=prod")
+
+        mock_query.assert_called_once_with(cmd, "resourceGroup =~ 'rg' and tags['env'] =~ 'prod'")
+        mock_get_cert.assert_called_once_with(cmd, "public")
+        mock_write.assert_called_once_with("path/to/file", [("rg-vm1", "1.2.3.4"), ("rg-vm2", "1.2.3.5")],
+                                           "username", "public-aadcert.pub", "private", False)
+
+    def test_ssh_config_fleet_with_vm(self):
+        self.assertRaises(util.CLIError, custom.ssh_config, mock.Mock(), "path/to/file", "rg", "vm", tag="env")
+
+    def test_build_vm_filter(self):
+        self.assertEqual("isnotnull(tags['env']) and (location =~ 'westus2')",
+                         custom._build_vm_filter(None, "env", "location =~ 'westus2'"))
+        self.assertEqual("resourceGroup =~ 'my\\'rg'", custom._build_vm_filter("my'rg", None, None))
+
+    @mock.patch('azext_ssh.custom._write_cert_account')
+    @mock.patch('azure.cli.core._profile.Profile.get_current_account_user')
     @mock.patch('azext_ssh.ssh_utils.get_ssh_cert_principals')
     @mock.patch('os.path.join')
     @mock.patch('azext_ssh.custom._assert_args')
@@ -46,9 +78,10 @@ class SshCustomCommandTest(unittest.TestCase):
     @mock.patch('azure.cli.core._profile.Profile.get_msal_token')
     @mock.patch('azext_ssh.custom._write_cert_file')
     def test_do_ssh_op(self, mock_write_cert, mock_ssh_creds, mock_get_mod_exp, mock_ip,
-                       mock_check_files, mock_assert, mock_join, mock_principal):
+                       mock_check_files, mock_assert, mock_join, mock_principal, mock_user, mock_write_account):
         cmd = mock.Mock()
         mock_op = mock.Mock()
+        mock_user.return_value = "user@contoso.com"
         mock_check_files.return_value = "public", "private"
         mock_principal.return_value = ["username"]
         mock_get_mod_exp.return_value = "modulus", "exponent"
@@ -62,6 +95,7 @@ class SshCustomCommandTest(unittest.TestCase):
         mock_ip.assert_not_called()
         mock_get_mod_exp.assert_called_once_with("public")
         mock_write_cert.assert_called_once_with("certificate", "public-aadcert.pub")
+        mock_write_account.assert_called_once_with("public-aadcert.pub", "user@contoso.com")
         mock_op.assert_called_once_with(
             "1.2.3.4", "username", "public-aadcert.pub", "private")
 
@@ -84,6 +118,130 @@ class SshCustomCommandTest(unittest.TestCase):
         mock_check_files.assert_called_once_with("publicfile", "privatefile")
         mock_ip.assert_called_once_with(cmd, "rg", "vm", False)
 
+    @mock.patch('azext_ssh.custom._write_cert_account')
+    @mock.patch('azext_ssh.custom._read_cert_account')
+    @mock.patch('azext_ssh.custom._get_and_write_certificate')
+    @mock.patch('azure.cli.core._profile.Profile.get_current_account_user')
+    @mock.patch('azext_ssh.ssh_utils.get_public_key_fingerprint')
+    @mock.patch('azext_ssh.ssh_utils.get_ssh_cert_info')
+    @mock.patch('os.path.isfile')
+    def test_get_or_reuse_certificate_valid(self, mock_isfile, mock_info, mock_fingerprint, mock_user, mock_get_cert,
+                                            mock_read_account, mock_write_account):
+        mock_isfile.return_value = True
+        mock_info.return_value = self._get_cert_info(datetime.timedelta(hours=1))
+        mock_fingerprint.return_value = "SHA256:key"
+        mock_user.return_value = "User@contoso.com"
+        mock_read_account.return_value = "user@contoso.com"
+
+        cert_file, username = custom._get_or_reuse_certificate(mock.Mock(), "public")
+
+        self.assertEqual(("public-aadcert.pub", "user@contoso.com"), (cert_file, username))
+        mock_fingerprint.assert_called_once_with("public")
+        mock_read_account.assert_called_once_with("public-aadcert.pub")
+        mock_get_cert.assert_not_called()
+        mock_write_account.assert_not_called()
+
+    @mock.patch('azext_ssh.custom._write_cert_account')
+    @mock.patch('azext_ssh.custom._read_cert_account')
+    @mock.patch('azext_ssh.custom._get_and_write_certificate')
+    @mock.patch('azure.cli.core._profile.Profile.get_current_account_user')
+    @mock.patch('azext_ssh.ssh_utils.get_public_key_fingerprint')
+    @mock.patch('azext_ssh.ssh_utils.get_ssh_cert_info')
+    @mock.patch('os.path.isfile')
+    def test_get_or_reuse_certificate_guest_account(self, mock_isfile, mock_info, mock_fingerprint, mock_user,
+                                                    mock_get_cert, mock_read_account, mock_write_account):
+        # the principal of the certificate of a guest account isn't the account user
+        guest = "user_contoso.com#EXT#@fabrikam.onmicrosoft.com"
+        mock_isfile.return_value = True
+        mock_info.return_value = self._get_cert_info(datetime.timedelta(hours=1))
+        mock_fingerprint.return_value = "SHA256:key"
+        mock_user.return_value = guest
+        mock_read_account.return_value = guest
+
+        cert_file, username = custom._get_or_reuse_certificate(mock.Mock(), "public")
+
+        self.assertEqual(("public-aadcert.pub", "user@contoso.com"), (cert_file, username))
+        mock_get_cert.assert_not_called()
+
+    @mock.patch('azext_ssh.custom._write_cert_account')
+    @mock.patch('azext_ssh.custom._read_cert_account')
+    @mock.patch('azext_ssh.custom._get_and_write_certificate')
+    @mock.patch('azure.cli.core._profile.Profile.get_current_account_user')
+    @mock.patch('azext_ssh.ssh_utils.get_public_key_fingerprint')
+    @mock.patch('azext_ssh.ssh_utils.get_ssh_cert_info')
+    @mock.patch('os.path.isfile')
+    def test_get_or_reuse_certificate_expiring(self, mock_isfile, mock_info, mock_fingerprint, mock_user,
+                                               mock_get_cert, mock_read_account, mock_write_account):
+        cmd = mock.Mock()
+        mock_isfile.return_value = True
+        mock_info.return_value = self._get_cert_info(datetime.timedelta(minutes=1))
+        mock_fingerprint.return_value = "SHA256:key"
+        mock_user.return_value = "user@contoso.com"
+        mock_read_account.return_value = "user@contoso.com"
+        mock_get_cert.return_value = "public-aadcert.pub", "user@contoso.com"
+
+        custom._get_or_reuse_certificate(cmd, "public")
+
+        mock_get_cert.assert_called_once_with(cmd, "public", None)
+        mock_write_account.assert_called_once_with("public-aadcert.pub", "user@contoso.com")
+
+    @mock.patch('azext_ssh.custom._write_cert_account')
+    @mock.patch('azext_ssh.custom._read_cert_account')
+    @mock.patch('azext_ssh.custom._get_and_write_certificate')
+    @mock.patch('azure.cli.core._profile.Profile.get_current_account_user')
+    @mock.patch('azext_ssh.ssh_utils.get_public_key_fingerprint')
+    @mock.patch('azext_ssh.ssh_utils.get_ssh_cert_info')
+    @mock.patch('os.path.isfile')
+    def test_get_or_reuse_certificate_other_key_or_account(self, mock_isfile, mock_info, mock_fingerprint,
+                                                           mock_user, mock_get_cert, mock_read_account,
+                                                           mock_write_account):
+        cmd = mock.Mock()
+        mock_isfile.return_value = True
+        mock_info.return_value = self._get_cert_info(datetime.timedelta(hours=1))
+        mock_get_cert.return_value = "public-aadcert.pub", "user@contoso.com"
+        mock_user.return_value = "user@contoso.com"
+
+        mock_fingerprint.return_value = "SHA256:otherkey"
+        mock_read_account.return_value = "user@contoso.com"
+        custom._get_or_reuse_certificate(cmd, "public")
+
+        mock_fingerprint.return_value = "SHA256:key"
+        mock_read_account.return_value = "otheruser@contoso.com"
+        custom._get_or_reuse_certificate(cmd, "public")
+
+        # a certificate written without the record of its account
+        mock_read_account.return_value = None
+        custom._get_or_reuse_certificate(cmd, "public")
+
+        self.assertEqual(3, mock_get_cert.call_count)
+        self.assertEqual(3, mock_write_account.call_count)
+
+    def test_cert_account_record(self):
+        import os
+        import shutil
+        import tempfile
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        cert_file = os.path.join(temp_dir, "id_rsa.pub-aadcert.pub")
+
+        self.assertIsNone(custom._read_cert_account(cert_file))
+        custom._write_cert_account(cert_file, "user@contoso.com")
+        self.assertEqual("user@contoso.com", custom._read_cert_account(cert_file))
+
+    @staticmethod
+    def _get_cert_info(validity):
+        now = datetime.datetime.now()
+        return [
+            "public-aadcert.pub:",
+            "        Type: ssh-rsa-cert-v01@openssh.com user certificate",
+            "        Public key: RSA-CERT SHA256:key",
+            "        Valid: from {} to {}".format((now - datetime.timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%S"),
+                                                  (now + validity).strftime("%Y-%m-%dT%H:%M:%S")),
+            "        Principals: ",
+            "                user@contoso.com",
+            "        Critical Options: (none)"
+        ]
+
     def test_assert_args_no_ip_or_vm(self):
         self.assertRaises(util.CLIError, custom._assert_args, None, None, None)
 
@@ -0,0 +1,70 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from unittest import mock
+import unittest
+
+from azext_ssh import ip_utils
+
+
+class IpUtilsTests(unittest.TestCase):
+    @mock.patch('azext_ssh.ip_utils._get_ssh_ip_from_vm')
+    @mock.patch('azext_ssh.ip_utils.query_vm_ips')
+    def test_get_ssh_ip_from_resource_graph(self, mock_query, mock_get_from_vm):
+        cmd = mock.Mock()
+        mock_query.return_value = {
+            "/subscriptions/sub/resourcegroups/rg/providers/microsoft.compute/virtualmachines/vm": [
+                {"privateIp": "10.0.0.4", "publicIp": ""},
+                {"privateIp": "10.0.0.5", "publicIp": "1.2.3.4"}
+            ]
+        }
+
+        self.assertEqual("1.2.3.4", ip_utils.get_ssh_ip(cmd, "rg", "vm", False))
+        self.assertEqual("10.0.0.4", ip_utils.get_ssh_ip(cmd, "rg", "vm", True))
+
+        mock_query.assert_called_with(cmd, "resourceGroup =~ 'rg' and name =~ 'vm'")
+        mock_get_from_vm.assert_not_called()
+
+    @mock.patch('azext_ssh.ip_utils._get_ssh_ip_from_vm')
+    @mock.patch('azext_ssh.ip_utils.query_vm_ips')
+    def test_get_ssh_ip_falls_back_to_vm(self, mock_query, mock_get_from_vm):
+        cmd = mock.Mock()
+        mock_get_from_vm.return_value = "1.2.3.4"
+
+        mock_query.return_value = {}
+        self.assertEqual("1.2.3.4", ip_utils.get_ssh_ip(cmd, "rg", "vm", False))
+
+        mock_query.side_effect = Exception("Resource Graph unavailable")
+        self.assertEqual("1.2.3.4", ip_utils.get_ssh_ip(cmd, "rg", "vm", False))
+
+        mock_get_from_vm.assert_called_with(cmd, "rg", "vm", False)
+        self.assertEqual(2, mock_get_from_vm.call_count)
+
+    @mock.patch('azext_ssh.ip_utils.client_factory.get_subscription_id')
+    @mock.patch('azure.cli.core.util.send_raw_request')
+    def test_query_vm_ips_pages_and_orders(self, mock_send, mock_subscription):
+        cmd = mock.Mock()
+        mock_subscription.return_value = "sub"
+        vm_id = "/subscriptions/sub/resourcegroups/rg/providers/microsoft.compute/virtualmachines/vm"
+        first_page = mock.Mock()
+        first_page.json.return_value = {
+            "data": [{"vmId": vm_id, "nicIndex": 1, "ipIndex": 0, "privateIp": "10.0.1.4", "publicIp": ""}],
+            "$skipToken": "token"
+        }
+        second_page = mock.Mock()
+        second_page.json.return_value = {
+            "data": [{"vmId": vm_id, "nicIndex": 0, "ipIndex": 0, "privateIp": "10.0.0.4", "publicIp": ""}]
+        }
+        mock_send.side_effect = [first_page, second_page]
+
+        vm_ips = ip_utils.query_vm_ips(cmd, "resourceGroup =~ 'rg'")
+
+        self.assertEqual(["10.0.0.4", "10.0.1.4"], [ip_config["privateIp"] for ip_config in vm_ips[vm_id]])
+        self.assertEqual(2, mock_send.call_count)
+        self.assertIn('"$skipToken": "token"', mock_send.call_args[1]["body"])
+
+
+if __name__ == '__main__':
+    unittest.main()
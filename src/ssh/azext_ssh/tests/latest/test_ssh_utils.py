@@ -3,6 +3,11 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import datetime
+import io
+import os
+import shutil
+import tempfile
 from knack import util
 from unittest import mock
 import unittest
@@ -102,6 +107,58 @@ class SSHUtilsTests(unittest.TestCase):
         mock_open.assert_called_once_with("path/to/file", "w")
         mock_file.write.assert_called_once_with('\n'.join(expected_lines))
 
+    @mock.patch('azext_ssh.ssh_utils.logger')
+    def test_write_ssh_config_hosts_replaces_host_blocks(self, mock_logger):
+        config_dir = tempfile.mkdtemp()
+        config_path = os.path.join(config_dir, "config")
+        with open(config_path, 'w') as f:
+            f.write('\n'.join([
+                "# Generated by az ssh config",
+                "Host rg-vm1 1.1.1.1",
+                "\tUser olduser",
+                "\tHostName 1.1.1.1",
+                "# Generated by az ssh config",
+                "Host rg-vm3 1.2.3.6",
+                "\tHostName 1.2.3.6",
+                "Host other",
+                "\tHostName 5.6.7.8",
+                "Host 1.2.3.5",
+                "\tUser olduser"
+            ]))
+
+        try:
+            ssh_utils.write_ssh_config_hosts(config_path, [("rg-vm1", "1.2.3.4"), ("rg-vm2", "1.2.3.5")],
+                                             "username", "cert", "privatekey", False)
+            with open(config_path, 'r') as f:
+                lines = f.read().splitlines()
+        finally:
+            shutil.rmtree(config_dir)
+
+        # the block written by hand for an IP of the new hosts is kept
+        self.assertEqual([
+            "# Generated by az ssh config",
+            "Host rg-vm3 1.2.3.6",
+            "\tHostName 1.2.3.6",
+            "Host other",
+            "\tHostName 5.6.7.8",
+            "Host 1.2.3.5",
+            "\tUser olduser",
+            "# Generated by az ssh config",
+            "Host rg-vm1 1.2.3.4",
+            "\tUser username",
+            "\tHostName 1.2.3.4",
+            "\tCertificateFile cert",
+            "\tIdentityFile privatekey",
+            "# Generated by az ssh config",
+            "Host rg-vm2 1.2.3.5",
+            "\tUser username",
+            "\tHostName 1.2.3.5",
+            "\tCertificateFile cert",
+            "\tIdentityFile privatekey"
+        ], lines)
+        mock_logger.warning.assert_called_once()
+        self.assertEqual(mock_logger.warning.call_args[0][1], "1.2.3.5")
+
     @mock.patch('platform.system')
     def test_get_ssh_path_non_windows(self, mock_system):
         mock_system.return_value = "Mac"
@@ -128,6 +185,27 @@ class SSHUtilsTests(unittest.TestCase):
 
         self.assertRaises(util.CLIError, ssh_utils._get_ssh_path)
 
+    def test_get_ssh_cert_validity(self):
+        cert_info = [
+            "        Public key: RSA-CERT SHA256:Qyx3jXDKOXC0sVV9I0QrvjjIefNyOwPT7GaAdGJKjbM",
+            "        Valid: from 2021-03-15T10:06:00 to 2021-03-15T11:11:00",
+        ]
+
+        valid_from, valid_to = ssh_utils.get_ssh_cert_validity(cert_info)
+
+        self.assertEqual(datetime.datetime(2021, 3, 15, 10, 6), valid_from)
+        self.assertEqual(datetime.datetime(2021, 3, 15, 11, 11), valid_to)
+        self.assertEqual((None, None), ssh_utils.get_ssh_cert_validity(["        Valid: forever"]))
+        self.assertEqual("SHA256:Qyx3jXDKOXC0sVV9I0QrvjjIefNyOwPT7GaAdGJKjbM",
+                         ssh_utils.get_ssh_cert_key_fingerprint(cert_info))
+
+    def test_get_public_key_fingerprint(self):
+        with mock.patch('builtins.open') as mock_open:
+            mock_open.return_value = io.StringIO('ssh-rsa AAAAB3NzaC1yc2E= user@host')
+            fingerprint = ssh_utils.get_public_key_fingerprint("public")
+
+        self.assertEqual("SHA256:zBURJC4mpQ6j/DLIDJakTQANmGP4cn9OftElBH5WBrg", fingerprint)
+
     def test_get_host(self):
         actual_host = ssh_utils._get_host("username", "10.0.0.1")
         self.assertEqual("username@10.0.0.1", actual_host)
@@ -199,6 +199,8 @@ If you want to change the default action to apply when no rule matches, please u
                     """
                     ex.args = (message,)
                 elif ex.error_code == 'AuthenticationFailed':
+                    from .account_cache import invalidate_accounts_served_from_cache
+                    invalidate_accounts_served_from_cache()
                     message = """
 Authentication failure. This may be caused by either invalid account key, connection string or sas token value provided for your storage account.
                     """
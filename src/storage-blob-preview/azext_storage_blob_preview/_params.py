@@ -178,6 +178,16 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.extra('tier', tier_type)
         c.extra('tags', tags_type)
 
+    with self.argument_context('storage blob copy start-batch') as c:
+        c.argument('max_concurrent_copies', type=int, is_preview=True,
+                   help='The number of copy operations to start in parallel.')
+        c.argument('skip_unchanged', action='store_true', is_preview=True,
+                   help='Skip the source blobs whose destination blob already has the same ETag or Content-MD5, or '
+                   'was copied from the same source blob after it was last modified. Only supported when copying '
+                   'from a blob container.')
+        c.argument('wait', action='store_true', is_preview=True,
+                   help='Wait until all the copy operations have finished, polling their states together.')
+
     with self.argument_context('storage blob copy start-batch', arg_group='Copy Source') as c:
         from ._validators import get_source_file_or_blob_service_client
 
@@ -206,6 +216,11 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.argument('source', options_list=('--source', '-s'))
         c.argument('delete_snapshots', delete_snapshots_type)
         c.argument('lease_id', help='The active lease id for the blob.')
+        c.argument('batch_size', type=int, is_preview=True,
+                   help='Delete the blobs with Blob Batch requests containing up to this many blobs each, from 1 to '
+                   '256. The Blob Batch API is not supported by accounts with hierarchical namespace enabled.')
+        c.argument('max_concurrent_batches', type=int, is_preview=True,
+                   help='The number of Blob Batch requests to send in parallel when --batch-size is specified.')
 
     with self.argument_context('storage blob download') as c:
         c.register_blob_arguments()
@@ -244,6 +259,9 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.extra('max_concurrency', options_list='--max-connections', type=int, default=2,
                 help='The number of parallel connections with which to download.')
         c.extra('no_progress', progress_type)
+        c.argument('max_concurrent_files', type=int, is_preview=True,
+                   help='The number of blobs to download in parallel. When greater than 1, blobs are downloaded while '
+                   'the container is still being listed.')
 
     with self.argument_context('storage blob exists') as c:
         c.register_blob_arguments()
@@ -471,6 +489,12 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.extra('no_progress', progress_type)
         c.extra('tier', tier_type, is_preview=True)
         c.extra('overwrite', overwrite_type, is_preview=True)
+        c.argument('max_concurrent_files', type=int, is_preview=True,
+                   help='The number of files to upload in parallel. All the files share one connection pool.')
+        c.argument('journal_file', is_preview=True,
+                   help='Path of a local journal file recording the uploaded files. If the file exists, the files '
+                   'already recorded in it and not modified since are skipped, so that an interrupted batch can be '
+                   'resumed by running the same command again.')
 
     with self.argument_context('storage container') as c:
         c.argument('container_name', container_name_type, options_list=('--name', '-n'))
@@ -32,7 +32,27 @@ logger = get_logger(__name__)
 # pylint: disable=inconsistent-return-statements,too-many-lines
 def _query_account_key(cli_ctx, account_name):
     """Query the storage account key. This is used when the customer doesn't offer account key but name."""
-    rg, scf = _query_account_rg(cli_ctx, account_name)
+    from .account_cache import StorageAccountCache
+    cache = StorageAccountCache(cli_ctx)
+    key = cache.get_key(account_name)
+    if key:
+        return key
+
+    rg, scf = _query_account_rg(cli_ctx, account_name, cache=cache)
+    try:
+        key = _list_account_key(cli_ctx, scf, rg, account_name)
+    except Exception:  # pylint: disable=broad-except
+        # the cached resource group may be stale if the account has been moved or re-created
+        if not cache.get_account(account_name):
+            raise
+        cache.invalidate(account_name)
+        rg, scf = _query_account_rg(cli_ctx, account_name, cache=cache)
+        key = _list_account_key(cli_ctx, scf, rg, account_name)
+    cache.set_key(account_name, key)
+    return key
+
+
+def _list_account_key(cli_ctx, scf, rg, account_name):
     t_storage_account_keys = get_sdk(
         cli_ctx, ResourceType.MGMT_STORAGE, 'models.storage_account_keys#StorageAccountKeys')
 
@@ -43,12 +63,18 @@ def _query_account_key(cli_ctx, account_name):
     return scf.storage_accounts.list_keys(rg, account_name, logging_enable=False).keys[0].value  # pylint: disable=no-member
 
 
-def _query_account_rg(cli_ctx, account_name):
+def _query_account_rg(cli_ctx, account_name, cache=None):
     """Query the storage account's resource group, which the mgmt sdk requires."""
+    from msrestazure.tools import parse_resource_id
+    from .account_cache import StorageAccountCache
     scf = storage_client_factory(cli_ctx)
+    cache = cache or StorageAccountCache(cli_ctx)
+    account = cache.get_account(account_name)
+    if account:
+        return parse_resource_id(account['id'])['resource_group'], scf
     acc = next((x for x in scf.storage_accounts.list() if x.name == account_name), None)
     if acc:
-        from msrestazure.tools import parse_resource_id
+        cache.set_account(account_name, acc)
         return parse_resource_id(acc.id)['resource_group'], scf
     raise ValueError("Storage account '{}' not found.".format(account_name))
 
@@ -1101,6 +1127,8 @@ def process_blob_download_batch_parameters(cmd, namespace):
     # 1. quick check
     if not os.path.exists(namespace.destination) or not os.path.isdir(namespace.destination):
         raise InvalidArgumentValueError('incorrect usage: destination must be an existing directory')
+    if namespace.max_concurrent_files is not None and namespace.max_concurrent_files < 1:
+        raise InvalidArgumentValueError('incorrect usage: --max-concurrent-files must be a positive integer')
 
     # 2. try to extract account name and container name from source string
     _process_blob_batch_container_parameters(cmd, namespace)
@@ -1114,6 +1142,8 @@ def process_blob_upload_batch_parameters(cmd, namespace):
     # 1. quick check
     if not os.path.exists(namespace.source) or not os.path.isdir(namespace.source):
         raise ValueError('incorrect usage: source must be an existing directory')
+    if namespace.max_concurrent_files is not None and namespace.max_concurrent_files < 1:
+        raise ValueError('incorrect usage: --max-concurrent-files must be a positive integer')
 
     # 2. try to extract account name and container name from destination string
     _process_blob_batch_container_parameters(cmd, namespace, source=False)
@@ -1147,6 +1177,10 @@ def process_blob_upload_batch_parameters(cmd, namespace):
 
 
 def process_blob_delete_batch_parameters(cmd, namespace):
+    if namespace.batch_size is not None and not 1 <= namespace.batch_size <= 256:
+        raise ValueError('incorrect usage: --batch-size must be between 1 and 256')
+    if namespace.max_concurrent_batches is not None and namespace.max_concurrent_batches < 1:
+        raise ValueError('incorrect usage: --max-concurrent-batches must be a positive integer')
     _process_blob_batch_container_parameters(cmd, namespace)
 
 
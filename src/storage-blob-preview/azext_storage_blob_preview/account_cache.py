@@ -0,0 +1,190 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Persistent cache of the storage accounts resolved from an account name, shared by the storage extensions.
+
+The account cache maps a subscription and account name to the account's resource id, so that commands only given
+--account-name don't have to list every storage account of the subscription to find its resource group.
+Account keys can optionally be cached as well, encrypted and for a short time only. The entries served to a command
+are dropped when it fails to find or to authenticate to the account.
+
+storage-preview and storage-blob-preview are installed independently, so each ships this module. The two copies are
+kept identical, which the tests of storage-preview check.
+
+Both caches are configured in the [storage] section of the CLI configuration:
+    account_cache_ttl      seconds an account entry stays valid, 0 disables the cache (default: 86400)
+    account_key_cache_ttl  seconds an encrypted account key stays valid, 0 disables the cache (default: 0)
+"""
+
+import os
+import time
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+ACCOUNT_CACHE_FILE_NAME = 'storageAccountCache.json'
+KEY_CACHE_FILE_NAME = 'storageAccountKeyCache.json'
+KEY_CACHE_SECRET_FILE_NAME = 'storageAccountKeyCache.secret'
+DEFAULT_ACCOUNT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_KEY_CACHE_TTL = 0
+
+# the error codes of a command using an account which was moved, re-created or whose key was renewed
+STALE_ACCOUNT_ERROR_CODES = ['ResourceNotFound', 'ResourceGroupNotFound', 'AuthenticationFailed']
+
+# accounts whose resource group or key was served from the caches in this process
+_served_from_cache = {}
+
+
+def _get_ttl(cli_ctx, option, default):
+    try:
+        return max(int(cli_ctx.config.get('storage', option, default)), 0)
+    except ValueError:
+        logger.warning('Ignore invalid storage.%s configuration, it should be a number of seconds', option)
+        return default
+
+
+def _get_cache_key(cli_ctx, account_name):
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    return '{}/{}'.format(get_subscription_id(cli_ctx), account_name.lower())
+
+
+def _write_private_file(path, data):
+    # create the file readable by the current user only, the same way the CLI protects its token cache
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+
+
+class StorageAccountCache(object):
+    def __init__(self, cli_ctx):
+        self.cli_ctx = cli_ctx
+        self.account_ttl = _get_ttl(cli_ctx, 'account_cache_ttl', DEFAULT_ACCOUNT_CACHE_TTL)
+        self.key_ttl = _get_ttl(cli_ctx, 'account_key_cache_ttl', DEFAULT_KEY_CACHE_TTL)
+        self._accounts = None
+        self._keys = None
+        self._fernet = None
+
+    @property
+    def accounts(self):
+        if self._accounts is None:
+            from azure.cli.core._session import Session
+            self._accounts = Session()
+            self._accounts.load(os.path.join(self.cli_ctx.config.config_dir, ACCOUNT_CACHE_FILE_NAME))
+        return self._accounts
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            from azure.cli.core._session import Session
+            self._keys = Session()
+            self._keys.load(os.path.join(self.cli_ctx.config.config_dir, KEY_CACHE_FILE_NAME))
+        return self._keys
+
+    def get_account(self, account_name):
+        """Return the cached {'id': ...} of the account or None."""
+        if not self.account_ttl:
+            return None
+        cache_key = _get_cache_key(self.cli_ctx, account_name)
+        entry = self.accounts.get(cache_key)
+        if not entry or entry.get('expires', 0) < time.time():
+            return None
+        _serve_from_cache(self, account_name)
+        logger.debug('Resolved storage account %s from cache', account_name)
+        return entry
+
+    def set_account(self, account_name, account):
+        """Cache the resource id of an account returned by the management SDK."""
+        entry = {
+            'id': account.id,
+            'expires': time.time() + self.account_ttl
+        }
+        if self.account_ttl:
+            self.accounts[_get_cache_key(self.cli_ctx, account_name)] = entry
+        return entry
+
+    def _get_fernet(self):
+        if self._fernet is None:
+            try:
+                from cryptography.fernet import Fernet
+            except ImportError:
+                logger.debug('cryptography is not available, storage account keys will not be cached')
+                self.key_ttl = 0
+                return None
+            secret_path = os.path.join(self.cli_ctx.config.config_dir, KEY_CACHE_SECRET_FILE_NAME)
+            if os.path.isfile(secret_path):
+                with open(secret_path, 'rb') as f:
+                    secret = f.read()
+            else:
+                secret = Fernet.generate_key()
+                _write_private_file(secret_path, secret)
+            self._fernet = Fernet(secret)
+        return self._fernet
+
+    def get_key(self, account_name):
+        if not self.key_ttl:
+            return None
+        token = self.keys.get(_get_cache_key(self.cli_ctx, account_name))
+        fernet = self._get_fernet() if token else None
+        if not fernet:
+            return None
+        from cryptography.fernet import InvalidToken
+        try:
+            key = fernet.decrypt(token.encode('utf-8'), ttl=self.key_ttl).decode('utf-8')
+        except InvalidToken:
+            # either expired or encrypted with a secret which no longer exists
+            return None
+        _serve_from_cache(self, account_name)
+        logger.debug('Resolved storage account key of %s from cache', account_name)
+        return key
+
+    def set_key(self, account_name, key):
+        fernet = self._get_fernet() if self.key_ttl else None
+        if fernet:
+            self.keys[_get_cache_key(self.cli_ctx, account_name)] = fernet.encrypt(key.encode('utf-8')).decode('utf-8')
+
+    def invalidate(self, account_name):
+        cache_key = _get_cache_key(self.cli_ctx, account_name)
+        for cache in (self.accounts, self.keys):
+            if cache_key in cache:
+                del cache[cache_key]
+        _served_from_cache.pop(account_name, None)
+
+
+def _serve_from_cache(cache, account_name):
+    _served_from_cache[account_name] = cache
+    _invalidate_on_stale_account_error(cache.cli_ctx)
+
+
+def _invalidate_on_stale_account_error(cli_ctx):
+    """Make the exception handler of the CLI drop the entries served to a command failing on a stale account."""
+    exception_handler = getattr(cli_ctx, 'exception_handler', None)
+    if not exception_handler or getattr(exception_handler, 'invalidates_account_cache', False):
+        return
+
+    def _exception_handler(ex):
+        if is_stale_account_error(ex):
+            invalidate_accounts_served_from_cache()
+        return exception_handler(ex)
+
+    _exception_handler.invalidates_account_cache = True
+    cli_ctx.exception_handler = _exception_handler
+
+
+def is_stale_account_error(ex):
+    error_code = getattr(ex, 'error_code', None)
+    if error_code is None:
+        # msrestazure CloudError and azure-core HttpResponseError keep the code in their error
+        error = getattr(ex, 'error', None)
+        error_code = getattr(error, 'code', None) or getattr(error, 'error', None)
+    return error_code in STALE_ACCOUNT_ERROR_CODES
+
+
+def invalidate_accounts_served_from_cache():
+    """Drop the cached entries of the accounts whose resource group or key was served from the caches."""
+    for account_name, cache in list(_served_from_cache.items()):
+        logger.debug('Invalidate cached storage account %s', account_name)
+        cache.invalidate(account_name)
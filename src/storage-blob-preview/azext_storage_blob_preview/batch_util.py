@@ -0,0 +1,241 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import os
+import threading
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+
+def run_concurrently(func, items, max_workers):
+    """
+    Call func on every item with a pool of max_workers threads and yield (item, result) pairs in completion order.
+    At most 2 * max_workers items are in flight, so items may be a lazily evaluated generator of any length.
+    The first exception raised by func cancels the pending work and is re-raised to the caller.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    if max_workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    items = iter(items)
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        try:
+            for item in items:
+                pending[executor.submit(func, item)] = item
+                if len(pending) < window:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def prefetch(items, max_size):
+    """
+    Iterate items on a background thread and yield them through a queue holding at most max_size items, so that a
+    slow producer such as a paged listing keeps running while the consumer is busy with the previous items.
+    """
+    import queue
+
+    buffer = queue.Queue(maxsize=max_size)
+    stopped = threading.Event()
+    end = object()
+    failure = []
+
+    def _put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+        except Exception as ex:  # pylint: disable=broad-except
+            failure.append(ex)
+        _put(end)
+
+    producer = threading.Thread(target=_produce, name='batch-prefetch')
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is end:
+                break
+            yield item
+        if failure:
+            raise failure[0]
+    finally:
+        stopped.set()
+
+
+def enlarge_connection_pool(client, pool_size):
+    """
+    Make sure the requests session shared by the service client and all the blob clients created through
+    get_blob_client() keeps enough connections alive for pool_size concurrent requests.
+    """
+    # pylint: disable=protected-access
+    try:
+        from requests.adapters import HTTPAdapter
+        transport = client._pipeline._transport
+        transport.open()
+        session = transport.session
+    except (AttributeError, ImportError):
+        logger.debug('Unable to resize the connection pool of %s', type(client).__name__)
+        return
+    # requests keeps 10 connections per host by default
+    if pool_size <= 10:
+        return
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+class BatchJournal(object):
+    """
+    Append-only record of the transfers a batch command has already completed. Every line of the journal file is a
+    JSON object with the name of the transferred item and a fingerprint of its content, so a re-run of the same batch
+    can skip the items whose fingerprint has not changed since they were recorded.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+        self._stream = open(self.path, 'a')
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        self._drop_incomplete_line()
+        with open(self.path, 'r') as stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                    self._entries[entry['name']] = entry.get('fingerprint')
+                except (ValueError, KeyError, TypeError):
+                    # the last line may be incomplete when the previous run was interrupted
+                    logger.debug('Ignore malformed journal line in %s: %s', self.path, line)
+
+    def _drop_incomplete_line(self):
+        # the first record appended after a line cut short by an interrupted run would be lost with it
+        with open(self.path, 'rb+') as stream:
+            content = stream.read()
+            if content and not content.endswith(b'\n'):
+                logger.debug('Drop the incomplete last line of the journal %s', self.path)
+                stream.truncate(content.rfind(b'\n') + 1)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_done(self, name, fingerprint=None):
+        return name in self._entries and self._entries[name] == fingerprint
+
+    def record(self, name, fingerprint=None):
+        line = json.dumps({'name': name, 'fingerprint': fingerprint}) + '\n'
+        with self._lock:
+            self._entries[name] = fingerprint
+            self._stream.write(line)
+            self._stream.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._stream.closed:
+                self._stream.close()
+
+
+def get_file_fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class _TransferCount(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, count=0, size=0):
+        self.count = count
+        self.size = size
+
+    def add(self, count, size):
+        self.count += count
+        self.size += size
+
+
+class BatchProgress(object):
+    """
+    Aggregate the per-request progress of concurrent transfers into the progress controller of the command's
+    progress_callback, reporting the number of finished items and the bytes transferred by the whole batch.
+    """
+
+    def __init__(self, progress_callback, total_count, total_bytes, stream_current='upload_stream_current'):
+        self._hook = progress_callback.hook if progress_callback else None
+        self._stream_current = stream_current
+        self._total = _TransferCount(total_count, total_bytes)
+        self._done = _TransferCount()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def add_total(self, count, size):
+        """Account for items discovered while the batch is already running."""
+        with self._lock:
+            self._total.add(count, size)
+
+    def callback_for(self, name):
+        """Return a raw_response_hook which tracks the progress of a single item."""
+        if not self._hook:
+            return None
+
+        def _update_progress(response):
+            if response.http_response.status_code not in [200, 201, 206]:
+                return
+            current = response.context.get(self._stream_current)
+            if current is None:
+                return
+            with self._lock:
+                self._in_flight[name] = current
+                self._report()
+
+        return _update_progress
+
+    def item_done(self, name, size=0):
+        with self._lock:
+            self._in_flight.pop(name, None)
+            self._done.add(1, size)
+            if self._hook:
+                self._report()
+
+    def _report(self):
+        value = self._done.size + sum(self._in_flight.values())
+        message = '{}/{} files'.format(self._done.count, self._total.count)
+        self._hook.add(message=message, value=min(value, self._total.size), total_val=max(self._total.size, 1))
+
+    def end(self):
+        if self._hook:
+            self._hook.end()
@@ -0,0 +1,81 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+
+def is_blob_copy_up_to_date(destination_client, source_service, source_container, source_blob_name, source_blob):
+    """
+    Check whether the destination blob already holds the content of the source blob. ETags are assigned by each
+    account, so the destination is considered up to date when it has the same size and Content-MD5 as the source, or
+    when its last successful copy came from the same source blob after the source was last modified.
+    """
+    from azure.core.exceptions import ResourceNotFoundError
+    try:
+        destination_blob = destination_client.get_blob_properties()
+    except ResourceNotFoundError:
+        return False
+
+    if destination_blob.size != source_blob.size:
+        return False
+    if destination_blob.etag == source_blob.etag:
+        return True
+
+    source_md5 = source_blob.content_settings.content_md5
+    if source_md5 and destination_blob.content_settings.content_md5 == source_md5:
+        return True
+
+    copy = destination_blob.copy
+    if not copy or copy.status != 'success' or not copy.source or not copy.completion_time:
+        return False
+    from urllib.parse import urlparse, unquote
+    copy_source = urlparse(copy.source)
+    return copy_source.netloc == urlparse(source_service.url).netloc and \
+        unquote(copy_source.path).lstrip('/') == '{}/{}'.format(source_container, source_blob_name) and \
+        copy.completion_time >= source_blob.last_modified
+
+
+def schedule_copy_batch(client, action_copy, sources, max_concurrent_copies, wait):
+    """
+    Start the copies returned by action_copy with max_concurrent_copies workers. With wait, the states of all the
+    pending copies are then polled together in a single loop until every copy has finished.
+    """
+    from .batch_util import enlarge_connection_pool, run_concurrently
+
+    enlarge_connection_pool(client, max_concurrent_copies)
+    blob_clients = [blob_client for _, blob_client in run_concurrently(action_copy, sources, max_concurrent_copies)
+                    if blob_client is not None]
+    if wait:
+        wait_for_blob_copies(blob_clients, max_concurrent_copies)
+    return [blob_client.url for blob_client in blob_clients]
+
+
+def wait_for_blob_copies(blob_clients, max_workers, poll_interval=2, max_poll_interval=30):
+    import time
+    from .batch_util import run_concurrently
+
+    pending = list(blob_clients)
+    failures = []
+    while pending:
+        still_pending = []
+        polled = run_concurrently(lambda blob_client: blob_client.get_blob_properties(), pending, max_workers)
+        for blob_client, blob in polled:
+            if blob.copy.status == 'pending':
+                still_pending.append(blob_client)
+            elif blob.copy.status != 'success':
+                failures.append('{}: {} {}'.format(blob_client.url, blob.copy.status,
+                                                   blob.copy.status_description or ''))
+        logger.warning('%s of %s copies finished', len(blob_clients) - len(still_pending), len(blob_clients))
+        pending = still_pending
+        if pending:
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+    if failures:
+        raise CLIError('{} of {} copies did not succeed:\n{}'.format(len(failures), len(blob_clients),
+                                                                     '\n'.join(failures)))
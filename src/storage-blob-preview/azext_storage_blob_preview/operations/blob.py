@@ -18,6 +18,7 @@ from ..util import (create_file_share_from_storage_client,
                     filter_none, collect_blobs, collect_blob_objects, collect_files,
                     mkdir_p, guess_content_type, normalize_blob_file_path,
                     check_precondition_success)
+from ..copy_util import is_blob_copy_up_to_date, schedule_copy_batch
 from ..profiles import CUSTOM_DATA_STORAGE_BLOB
 
 logger = get_logger(__name__)
@@ -99,8 +100,9 @@ def set_service_properties(client, delete_retention=None, delete_retention_perio
 def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
                             destination_path=None, source_container=None, source_share=None,
                             source_sas=None, pattern=None, dryrun=False, source_account_name=None,
-                            source_account_key=None):
+                            source_account_key=None, max_concurrent_copies=1, skip_unchanged=False, wait=False):
     """Copy a group of blob or files to a blob container."""
+    scheduled = not dryrun and (max_concurrent_copies > 1 or skip_unchanged or wait)
     if dryrun:
         logger.warning('copy files or blobs to blob container')
         logger.warning('    account %s', client.account_name)
@@ -126,6 +128,22 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
             if dryrun:
                 logger.warning('  - copy blob %s', blob_name)
             else:
+                return _copy_blob_to_blob_container(cmd, blob_service=client, source_blob_service=source_client,
+                                                    destination_container=container_name,
+                                                    destination_path=destination_path,
+                                                    source_container=source_container,
+                                                    source_blob_name=blob_name,
+                                                    source_sas=source_sas).url
+
+        if scheduled:
+            def action_blob_copy_if_changed(blob_info):
+                blob_name, blob = blob_info
+                if skip_unchanged:
+                    destination_client = client.get_blob_client(
+                        container=container_name, blob=normalize_blob_file_path(destination_path, blob_name))
+                    if is_blob_copy_up_to_date(destination_client, source_client, source_container, blob_name, blob):
+                        logger.info('Skip unchanged blob %s', blob_name)
+                        return None
                 return _copy_blob_to_blob_container(cmd, blob_service=client, source_blob_service=source_client,
                                                     destination_container=container_name,
                                                     destination_path=destination_path,
@@ -133,6 +151,10 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
                                                     source_blob_name=blob_name,
                                                     source_sas=source_sas)
 
+            return schedule_copy_batch(client, action_blob_copy_if_changed,
+                                       collect_blob_objects(source_client, source_container, pattern),
+                                       max_concurrent_copies, wait)
+
         return list(filter_none(action_blob_copy(blob) for blob in collect_blobs(source_client,
                                                                                  source_container,
                                                                                  pattern)))
@@ -155,9 +177,22 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
             if dryrun:
                 logger.warning('  - copy file %s', os.path.join(dir_name, file_name))
             else:
+                return _copy_file_to_blob_container(client, source_client, container_name, destination_path,
+                                                    source_share, source_sas, dir_name, file_name).url
+
+        if scheduled:
+            if skip_unchanged:
+                logger.warning('--skip-unchanged is only supported when copying from a blob container')
+
+            def action_file_copy_scheduled(file_info):
+                dir_name, file_name = file_info
                 return _copy_file_to_blob_container(client, source_client, container_name, destination_path,
                                                     source_share, source_sas, dir_name, file_name)
 
+            return schedule_copy_batch(client, action_file_copy_scheduled,
+                                       collect_files(cmd, source_client, source_share, pattern),
+                                       max_concurrent_copies, wait)
+
         return list(filter_none(action_file_copy(file) for file in collect_files(cmd,
                                                                                  source_client,
                                                                                  source_share,
@@ -167,7 +202,11 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
 
 # pylint: disable=unused-argument, too-many-locals
 def storage_blob_download_batch(client, source, destination, container_name, pattern=None, dryrun=False,
-                                progress_callback=None, socket_timeout=None, **kwargs):
+                                progress_callback=None, socket_timeout=None, max_concurrent_files=1, **kwargs):
+    if max_concurrent_files > 1 and not dryrun:
+        return _download_batch_pipelined(client, destination, container_name, pattern, progress_callback,
+                                         max_concurrent_files, **kwargs)
+
     source_blobs = collect_blobs(client, container_name, pattern)
     blobs_to_download = {}
     for blob_name in source_blobs:
@@ -232,13 +271,105 @@ def storage_blob_download_batch(client, source, destination, container_name, pat
     return results
 
 
+def _download_batch_pipelined(client, destination, container_name, pattern, progress_callback,
+                              max_concurrent_files, **kwargs):
+    """
+    Download the blobs while the container is still being listed. Listing pages are streamed into a bounded queue
+    which is drained by max_concurrent_files workers, so the downloads start before the listing ends.
+    """
+    from ..batch_util import BatchProgress, enlarge_connection_pool, prefetch, run_concurrently
+
+    progress = BatchProgress(progress_callback, 0, 0, stream_current='download_stream_current')
+    download = _create_blob_downloader(client, destination, container_name, progress, **kwargs)
+    blobs = _list_blobs_to_download(client, container_name, pattern, progress)
+
+    enlarge_connection_pool(client, max_concurrent_files * kwargs.get('max_concurrency', 1))
+    results = []
+    num_blobs = 0
+    try:
+        for _, (include, result) in run_concurrently(download, prefetch(blobs, max_concurrent_files * 4),
+                                                     max_concurrent_files):
+            num_blobs += 1
+            if include:
+                results.append(result)
+    finally:
+        progress.end()
+
+    num_failures = num_blobs - len(results)
+    if num_failures:
+        logger.warning('%s of %s files not downloaded due to "Failed Precondition"', num_failures, num_blobs)
+    return results
+
+
+def _list_blobs_to_download(client, container_name, pattern, progress):
+    """
+    Yield the name, the download path and the size of the blobs to download, failing as soon as a listed blob has
+    the download path of a blob listed before it.
+    """
+    download_paths = set()
+    for blob_name, blob in collect_blob_objects(client, container_name, pattern):
+        # remove starting path seperator and normalize
+        blob_normed = normalize_blob_file_path(None, blob_name)
+        if blob_normed in download_paths:
+            raise CLIError('Multiple blobs with download path: `{}`. As a solution, use the `--pattern` parameter '
+                           'to select for a subset of blobs to download OR utilize the `storage blob download` '
+                           'command instead to download individual blobs.'.format(blob_normed))
+        download_paths.add(blob_normed)
+        progress.add_total(1, blob.size or 0)
+        yield blob_name, blob_normed, blob.size or 0
+
+
+def _create_blob_downloader(client, destination, container_name, progress, **kwargs):
+    """ Return a function downloading a blob listed by _list_blobs_to_download, which is safe to call concurrently. """
+    import threading
+    from azure.cli.core.azclierror import FileOperationError
+
+    created_folders = set()
+    lock = threading.Lock()
+
+    def _ensure_folder(destination_folder):
+        if destination_folder in created_folders:
+            return
+        mkdir_p(destination_folder)
+        with lock:
+            created_folders.add(destination_folder)
+
+    @check_precondition_success
+    def _download_blob(blob_client, file_path, **kwargs):
+        download_stream = blob_client.download_blob(**kwargs)
+        with open(file_path, 'wb') as stream:
+            download_stream.readinto(stream)
+        return blob_client.blob_name
+
+    def _download(item):
+        blob_name, blob_normed, size = item
+        blob_client = client.get_blob_client(container=container_name, blob=blob_name)
+        destination_path = os.path.join(destination, os.path.normpath(blob_normed))
+        destination_folder = os.path.dirname(destination_path)
+        # Failed when there is same name for file and folder
+        if os.path.isfile(destination_folder):
+            raise FileOperationError("{} already exists as a file. Please rename existing file or choose another "
+                                     "destination folder.".format(destination_folder))
+        _ensure_folder(destination_folder)
+        download_kwargs = dict(kwargs)
+        hook = progress.callback_for(blob_name)
+        if hook:
+            download_kwargs['raw_response_hook'] = hook
+        include, result = _download_blob(blob_client, destination_path, **download_kwargs)
+        progress.item_done(blob_name, size)
+        return include, result
+
+    return _download
+
+
 def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  # pylint: disable=too-many-locals
                               source_files=None, destination_path=None,
                               container_name=None, blob_type=None,
                               content_settings=None, metadata=None, validate_content=False,
                               maxsize_condition=None, max_connections=2, lease_id=None, progress_callback=None,
                               if_modified_since=None, if_unmodified_since=None, if_match=None,
-                              if_none_match=None, timeout=None, dryrun=False, socket_timeout=None, **kwargs):
+                              if_none_match=None, timeout=None, dryrun=False, socket_timeout=None,
+                              max_concurrent_files=1, journal_file=None, **kwargs):
     def _create_return_result(blob_content_settings, upload_result=None):
         return {
             'Blob': client.url,
@@ -260,6 +391,17 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
         for src, dst in source_files:
             results.append(_create_return_result(blob_content_settings=guess_content_type(src, content_settings,
                                                                                           t_content_settings)))
+    elif max_concurrent_files > 1 or journal_file:
+        upload_args = {'blob_type': blob_type, 'metadata': metadata, 'validate_content': validate_content,
+                       'maxsize_condition': maxsize_condition, 'max_connections': max_connections,
+                       'lease_id': lease_id, 'if_modified_since': if_modified_since,
+                       'if_unmodified_since': if_unmodified_since, 'if_match': if_match,
+                       'if_none_match': if_none_match, 'timeout': timeout}
+        upload_args.update(kwargs)
+        results = _upload_batch_concurrently(cmd, client, source_files, container_name, destination_path,
+                                             content_settings, t_content_settings, progress_callback,
+                                             max_concurrent_files, journal_file, upload_args,
+                                             _create_return_result)
     else:
         @check_precondition_success
         def _upload_blob(*args, **kwargs):
@@ -300,6 +442,64 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
     return results
 
 
+# pylint: disable=too-many-locals
+def _upload_batch_concurrently(cmd, client, source_files, container_name, destination_path, content_settings,
+                               t_content_settings, progress_callback, max_concurrent_files, journal_file,
+                               upload_args, create_return_result):
+    """
+    Upload the source files with a pool of max_concurrent_files workers sharing the connection pool of the service
+    client. When a journal file is given, the files recorded in it are skipped and every uploaded file is appended
+    to it, so that an interrupted batch can be resumed by running the same command again.
+    """
+    from ..batch_util import (BatchJournal, BatchProgress, enlarge_connection_pool, get_file_fingerprint,
+                              run_concurrently)
+
+    journal = BatchJournal(journal_file) if journal_file else None
+    pending_files = []
+    for src, dst in source_files:
+        blob_name = normalize_blob_file_path(destination_path, dst)
+        fingerprint = get_file_fingerprint(src)
+        if journal and journal.is_done(blob_name, fingerprint):
+            continue
+        pending_files.append((src, blob_name, fingerprint))
+    if journal and len(pending_files) < len(source_files):
+        logger.warning('Skip %s of %s files already uploaded according to journal %s',
+                       len(source_files) - len(pending_files), len(source_files), journal.path)
+
+    enlarge_connection_pool(client, max_concurrent_files * upload_args.get('max_connections', 1))
+    progress = BatchProgress(progress_callback, len(pending_files), sum(f[2][0] for f in pending_files))
+
+    @check_precondition_success
+    def _upload_blob(*args, **kwargs):
+        return upload_blob(*args, **kwargs)
+
+    def _upload_file(source_file):
+        src, blob_name, fingerprint = source_file
+        guessed_content_settings = guess_content_type(src, content_settings, t_content_settings)
+        blob_client = client.get_blob_client(container=container_name, blob=blob_name)
+        include, result = _upload_blob(cmd, blob_client, file_path=src, content_settings=guessed_content_settings,
+                                       progress_callback=progress.callback_for(blob_name), **upload_args)
+        progress.item_done(blob_name, fingerprint[0])
+        if not include:
+            return None
+        if journal:
+            journal.record(blob_name, fingerprint)
+        return create_return_result(blob_content_settings=guessed_content_settings, upload_result=result)
+
+    try:
+        results = [result for _, result in run_concurrently(_upload_file, pending_files, max_concurrent_files)
+                   if result is not None]
+    finally:
+        progress.end()
+        if journal:
+            journal.close()
+
+    num_failures = len(pending_files) - len(results)
+    if num_failures:
+        logger.warning('%s of %s files not uploaded due to "Failed Precondition"', num_failures, len(pending_files))
+    return results
+
+
 def transform_blob_type(cmd, blob_type):
     """
     get_blob_types() will get ['block', 'page', 'append']
@@ -348,7 +548,8 @@ def _blob_precondition_check(source_blobs, if_modified_since=None, if_unmodified
 
 def storage_blob_delete_batch(client, source, container_name, pattern=None, lease_id=None,
                               delete_snapshots=None, if_modified_since=None, if_unmodified_since=None, if_match=None,
-                              if_none_match=None, timeout=None, dryrun=False, **kwargs):
+                              if_none_match=None, timeout=None, dryrun=False, batch_size=None,
+                              max_concurrent_batches=4, **kwargs):
     @check_precondition_success
     def _delete_blob(blob_name):
         blob_client = client.get_blob_client(container=container_name, blob=blob_name)
@@ -363,6 +564,13 @@ def storage_blob_delete_batch(client, source, container_name, pattern=None, leas
         }
         return blob_client.delete_blob(**delete_blob_args)
 
+    if batch_size and not dryrun:
+        return _delete_batch_server_side(client, container_name, pattern, lease_id=lease_id,
+                                         delete_snapshots=delete_snapshots, if_modified_since=if_modified_since,
+                                         if_unmodified_since=if_unmodified_since, if_match=if_match,
+                                         if_none_match=if_none_match, timeout=timeout, batch_size=batch_size,
+                                         max_concurrent_batches=max_concurrent_batches)
+
     source_blobs = list(collect_blob_objects(client, container_name, pattern))
 
     if dryrun:
@@ -383,6 +591,76 @@ def storage_blob_delete_batch(client, source, container_name, pattern=None, leas
         logger.warning('%s of %s blobs not deleted due to "Failed Precondition"', num_failures, len(source_blobs))
 
 
+def _delete_batch_server_side(client, container_name, pattern, lease_id=None, delete_snapshots=None,
+                              if_modified_since=None, if_unmodified_since=None, if_match=None, if_none_match=None,
+                              timeout=None, batch_size=256, max_concurrent_batches=4):
+    """
+    Delete the blobs with Blob Batch requests of up to batch_size sub-requests each, sending max_concurrent_batches
+    batch requests at once. Sub-requests failing with "Failed Precondition" are counted like in the per-blob mode.
+    """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import HttpResponseError
+    from ..batch_util import enlarge_connection_pool, prefetch, run_concurrently
+
+    blob_options = {'timeout': timeout}
+    if lease_id:
+        blob_options['lease_id'] = lease_id
+    if if_modified_since:
+        blob_options['if_modified_since'] = if_modified_since
+    if if_unmodified_since:
+        blob_options['if_unmodified_since'] = if_unmodified_since
+    # The sub-requests drop a match condition without an etag, so '*' is sent as the etag instead of with
+    # MatchConditions.IfPresent or MatchConditions.IfMissing, which results in the same If-Match/If-None-Match header
+    if if_match:
+        blob_options.update(etag=if_match, match_condition=MatchConditions.IfNotModified)
+    if if_none_match:
+        blob_options.update(etag=if_none_match, match_condition=MatchConditions.IfModified)
+
+    def _iter_batches():
+        batch = []
+        for blob_name, _ in collect_blob_objects(client, container_name, pattern):
+            batch.append(dict(blob_options, name=blob_name))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    container_client = client.get_container_client(container=container_name)
+
+    def _delete_blobs(batch):
+        responses = container_client.delete_blobs(*batch, delete_snapshots=delete_snapshots,
+                                                  raise_on_any_failure=False, timeout=timeout)
+        num_deleted, errors = 0, []
+        for blob, response in zip(batch, responses):
+            # Precondition failed error: 412, Not modified error: 304
+            if response.status_code in [304, 412]:
+                continue
+            if response.status_code >= 300:
+                errors.append('{}: {} {}'.format(blob['name'], response.status_code, response.reason))
+                continue
+            num_deleted += 1
+        return num_deleted, errors
+
+    enlarge_connection_pool(client, max_concurrent_batches)
+    num_blobs, num_deleted = 0, 0
+    try:
+        batches = prefetch(_iter_batches(), max_concurrent_batches)
+        for batch, (deleted, errors) in run_concurrently(_delete_blobs, batches, max_concurrent_batches):
+            if errors:
+                raise CLIError('Failed to delete {} of {} blobs in a batch request:\n{}'.format(
+                    len(errors), len(batch), '\n'.join(errors)))
+            num_blobs += len(batch)
+            num_deleted += deleted
+    except HttpResponseError as ex:
+        raise CLIError('Failed to delete blobs with Blob Batch request. Remove --batch-size to delete the blobs '
+                       'one by one. {}'.format(ex))
+
+    num_failures = num_blobs - num_deleted
+    if num_failures:
+        logger.warning('%s of %s blobs not deleted due to "Failed Precondition"', num_failures, num_blobs)
+
+
 def generate_container_shared_access_signature(client, container_name, permission=None,
                                                expiry=None, start=None, id=None, ip=None,  # pylint: disable=redefined-builtin
                                                protocol=None, cache_control=None, content_disposition=None,
@@ -417,7 +695,7 @@ def _copy_blob_to_blob_container(cmd, blob_service, source_blob_service, destina
     try:
         blob_client = blob_service.get_blob_client(container=destination_container, blob=destination_blob_name)
         blob_client.start_copy_from_url(source_url=source_blob_url, incremental_copy=False)
-        return blob_client.url
+        return blob_client
     except HttpResponseError as ex:
         error_template = 'Failed to copy blob {} to container {}. {}'
         raise CLIError(error_template.format(source_blob_name, destination_container, ex))
@@ -436,7 +714,7 @@ def _copy_file_to_blob_container(blob_service, source_file_service, destination_
     try:
         blob_client = blob_service.get_blob_client(container=destination_container, blob=destination_blob_name)
         blob_client.start_copy_from_url(source_url=file_url, incremental_copy=False)
-        return blob_client.url
+        return blob_client
     except HttpResponseError as ex:
         error_template = 'Failed to copy file {} to container {}. {}'
         raise CLIError(error_template.format(source_file_name, destination_container, ex))
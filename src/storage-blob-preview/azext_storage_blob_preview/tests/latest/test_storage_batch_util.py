@@ -0,0 +1,152 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from ...batch_util import BatchJournal, BatchProgress, get_file_fingerprint, prefetch, run_concurrently
+
+
+class _ProgressHook(object):
+    def __init__(self):
+        self.values = []
+        self.ended = False
+
+    def add(self, message, value, total_val):
+        self.values.append((message, value, total_val))
+
+    def end(self):
+        self.ended = True
+
+
+class _ProgressCallback(object):
+    def __init__(self):
+        self.hook = _ProgressHook()
+
+
+class TestBatchUtil(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_run_concurrently(self):
+        seen_threads = set()
+        lock = threading.Lock()
+
+        def _square(x):
+            with lock:
+                seen_threads.add(threading.current_thread().name)
+            return x * x
+
+        results = dict(run_concurrently(_square, (i for i in range(100)), 4))
+        self.assertEqual(results, {i: i * i for i in range(100)})
+        self.assertLessEqual(len(seen_threads), 4)
+
+        # a single worker runs inline
+        self.assertEqual(list(run_concurrently(_square, [1, 2, 3], 1)), [(1, 1), (2, 4), (3, 9)])
+
+    def test_run_concurrently_raises(self):
+        def _fail(x):
+            if x == 7:
+                raise ValueError('failed on 7')
+            return x
+
+        with self.assertRaisesRegex(ValueError, 'failed on 7'):
+            list(run_concurrently(_fail, range(50), 3))
+
+    def test_prefetch(self):
+        produced = []
+
+        def _produce():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        self.assertEqual(list(prefetch(_produce(), 3)), list(range(20)))
+
+        # the producer never runs further ahead than the queue allows
+        items = prefetch(_produce(), 2)
+        del produced[:]
+        self.assertEqual(next(items), 0)
+        time.sleep(0.2)
+        self.assertLessEqual(len(produced), 4)
+        items.close()
+
+    def test_prefetch_raises(self):
+        def _produce():
+            yield 1
+            raise ValueError('listing failed')
+
+        items = prefetch(_produce(), 2)
+        self.assertEqual(next(items), 1)
+        with self.assertRaisesRegex(ValueError, 'listing failed'):
+            next(items)
+
+    def test_batch_journal_resume(self):
+        path = os.path.join(self.test_dir, 'upload.journal')
+        with BatchJournal(path) as journal:
+            self.assertEqual(len(journal), 0)
+            journal.record('a/b.txt', [10, 1000])
+            journal.record('c.txt', [20, 2000])
+
+        # simulate an interrupted write
+        with open(path, 'a') as stream:
+            stream.write('{"name": "d.tx')
+
+        with BatchJournal(path) as journal:
+            self.assertEqual(len(journal), 2)
+            self.assertTrue(journal.is_done('a/b.txt', [10, 1000]))
+            self.assertFalse(journal.is_done('a/b.txt', [11, 1000]))
+            self.assertFalse(journal.is_done('d.txt', [1, 1]))
+            journal.record('e.txt', [30, 3000])
+
+        # the record appended after the interrupted write is kept
+        with BatchJournal(path) as journal:
+            self.assertEqual(len(journal), 3)
+            self.assertTrue(journal.is_done('e.txt', [30, 3000]))
+
+    def test_file_fingerprint(self):
+        path = os.path.join(self.test_dir, 'file.txt')
+        with open(path, 'w') as stream:
+            stream.write('a')
+        fingerprint = get_file_fingerprint(path)
+        # an edit of the same size within the same second changes the fingerprint
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertNotEqual(get_file_fingerprint(path), fingerprint)
+
+    def test_batch_progress(self):
+        class _Response(object):
+            def __init__(self, current):
+                self.http_response = type('HttpResponse', (object,), {'status_code': 201})()
+                self.context = {'upload_stream_current': current}
+
+        callback = _ProgressCallback()
+        progress = BatchProgress(callback, total_count=2, total_bytes=30)
+        progress.callback_for('a')(_Response(5))
+        progress.callback_for('b')(_Response(10))
+        self.assertEqual(callback.hook.values[-1], ('0/2 files', 15, 30))
+        progress.item_done('a', 10)
+        self.assertEqual(callback.hook.values[-1], ('1/2 files', 20, 30))
+        progress.item_done('b', 20)
+        progress.end()
+        self.assertEqual(callback.hook.values[-1], ('2/2 files', 30, 30))
+        self.assertTrue(callback.hook.ended)
+
+        # no progress reporting when the progress callback is disabled
+        progress = BatchProgress(None, total_count=1, total_bytes=1)
+        self.assertIsNone(progress.callback_for('a'))
+        progress.item_done('a', 1)
+        progress.end()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+from unittest import mock
+
+from knack.util import CLIError
+
+from ...batch_util import BatchProgress
+from ...operations.blob import _list_blobs_to_download, storage_blob_delete_batch
+
+
+def _blob(name, size=1, **kwargs):
+    blob = mock.MagicMock(size=size, **kwargs)
+    blob.name = name
+    return blob
+
+
+def _blob_service(*blobs):
+    service = mock.MagicMock()
+    service.get_container_client.return_value.list_blobs.return_value = list(blobs)
+    return service
+
+
+class TestDownloadBatch(unittest.TestCase):
+    def test_list_blobs_to_download(self):
+        service = _blob_service(_blob('a.txt', 2), _blob('/dir/b.txt', 3))
+        progress = BatchProgress(None, 0, 0)
+
+        self.assertEqual(list(_list_blobs_to_download(service, 'container', None, progress)),
+                         [('a.txt', 'a.txt', 2), ('/dir/b.txt', 'dir/b.txt', 3)])
+        service.get_blob_client.assert_not_called()
+
+    def test_list_blobs_to_download_path_collision(self):
+        service = _blob_service(_blob('/dir/b.txt'), _blob('dir/b.txt'))
+        with self.assertRaisesRegex(CLIError, 'Multiple blobs with download path: `dir/b.txt`'):
+            list(_list_blobs_to_download(service, 'container', None, BatchProgress(None, 0, 0)))
+
+        # a blob outside of the pattern doesn't collide
+        service = _blob_service(_blob('/dir/b.txt'), _blob('dir/b.txt'))
+        self.assertEqual(list(_list_blobs_to_download(service, 'container', '/dir/*', BatchProgress(None, 0, 0))),
+                         [('/dir/b.txt', 'dir/b.txt', 1)])
+        service.get_blob_client.assert_not_called()
+
+
+class _Response(object):
+    def __init__(self, status_code, reason='OK'):
+        self.status_code = status_code
+        self.reason = reason
+
+
+class TestDeleteBatch(unittest.TestCase):
+    def _delete_batch(self, service, **kwargs):
+        return storage_blob_delete_batch(service, 'https://account.blob.core.windows.net/container', 'container',
+                                         pattern='*', **kwargs)
+
+    def _delete_blobs_responding(self, service, status_code=lambda blob: 202):
+        delete_blobs = service.get_container_client.return_value.delete_blobs
+        delete_blobs.side_effect = lambda *blobs, **kwargs: [_Response(status_code(blob)) for blob in blobs]
+        return delete_blobs
+
+    def test_delete_batch_sub_requests(self):
+        service = _blob_service(*[_blob('blob{}'.format(i)) for i in range(5)])
+        delete_blobs = self._delete_blobs_responding(service)
+
+        self._delete_batch(service, batch_size=2, max_concurrent_batches=1, delete_snapshots='include')
+
+        self.assertEqual([[blob['name'] for blob in call[0]] for call in delete_blobs.call_args_list],
+                         [['blob0', 'blob1'], ['blob2', 'blob3'], ['blob4']])
+        self.assertEqual(delete_blobs.call_args[1]['delete_snapshots'], 'include')
+        self.assertFalse(delete_blobs.call_args[1]['raise_on_any_failure'])
+        service.get_blob_client.assert_not_called()
+
+    def test_delete_batch_failed_preconditions(self):
+        service = _blob_service(*[_blob('blob{}'.format(i)) for i in range(4)])
+        self._delete_blobs_responding(service, lambda blob: {'blob1': 412, 'blob2': 304}.get(blob['name'], 202))
+
+        with mock.patch('azext_storage_blob_preview.operations.blob.logger') as logger:
+            self._delete_batch(service, batch_size=3)
+        logger.warning.assert_called_once_with('%s of %s blobs not deleted due to "Failed Precondition"', 2, 4)
+
+        self._delete_blobs_responding(service, lambda blob: 404 if blob['name'] == 'blob3' else 202)
+        with self.assertRaisesRegex(CLIError, 'Failed to delete 1 of 1 blobs in a batch request:\nblob3: 404'):
+            self._delete_batch(service, batch_size=3)
+
+    def test_delete_batch_match_conditions(self):
+        from azure.core import MatchConditions
+        from ...vendored_sdks.azure_storage_blob.v2020_06_12 import ContainerClient
+
+        container_client = ContainerClient.from_container_url('https://account.blob.core.windows.net/container',
+                                                              credential='c2lnbmF0dXJl')
+        for conditions, header in [({'if_match': '*'}, ('If-Match', '*')),
+                                   ({'if_none_match': '*'}, ('If-None-Match', '*')),
+                                   ({'if_match': '"0x1"'}, ('If-Match', '"0x1"'))]:
+            service = _blob_service(_blob('blob0'))
+            delete_blobs = self._delete_blobs_responding(service)
+            self._delete_batch(service, batch_size=2, **conditions)
+
+            blobs = delete_blobs.call_args[0]
+            self.assertIn(blobs[0]['match_condition'], [MatchConditions.IfNotModified, MatchConditions.IfModified])
+            # The condition reaches the sub-request sent for the blob
+            # pylint: disable=protected-access
+            requests, _ = container_client._generate_delete_blobs_options(*blobs)
+            self.assertEqual(requests[0].headers.get(header[0]), header[1])
+
+    def test_delete_batch_dryrun(self):
+        service = _blob_service(_blob('blob0'), _blob('blob1'))
+        delete_blobs = self._delete_blobs_responding(service)
+
+        self.assertEqual(self._delete_batch(service, batch_size=2, dryrun=True), [])
+        delete_blobs.assert_not_called()
+        service.get_blob_client.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
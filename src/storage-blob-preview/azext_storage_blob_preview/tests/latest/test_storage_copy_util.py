@@ -0,0 +1,122 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from azure.core.exceptions import ResourceNotFoundError
+from knack.util import CLIError
+
+from ...copy_util import is_blob_copy_up_to_date, schedule_copy_batch, wait_for_blob_copies
+
+SOURCE_URL = 'https://source.blob.core.windows.net/'
+MODIFIED = datetime(2021, 1, 1)
+
+
+def _properties(size=10, etag='"0x1"', content_md5=None, copy=None, last_modified=MODIFIED):
+    return mock.MagicMock(size=size, etag=etag, content_settings=mock.MagicMock(content_md5=content_md5),
+                          copy=copy, last_modified=last_modified)
+
+
+def _copy(status='success', source=SOURCE_URL + 'container/blob', completion_time=MODIFIED, status_description=None):
+    return mock.MagicMock(status=status, source=source, completion_time=completion_time,
+                          status_description=status_description)
+
+
+def _destination(properties):
+    destination_client = mock.MagicMock()
+    if properties is None:
+        destination_client.get_blob_properties.side_effect = ResourceNotFoundError('The blob does not exist')
+    else:
+        destination_client.get_blob_properties.return_value = properties
+    return destination_client
+
+
+class _PolledBlobClient(object):
+    def __init__(self, url, statuses):
+        self.url = url
+        self._statuses = list(statuses)
+        self.polls = 0
+
+    def get_blob_properties(self):
+        self.polls += 1
+        status = self._statuses.pop(0) if len(self._statuses) > 1 else self._statuses[0]
+        return _properties(copy=_copy(status=status, status_description='aborted by user'))
+
+
+class TestCopyUtil(unittest.TestCase):
+    def _is_up_to_date(self, destination_properties, source_properties):
+        source_service = mock.MagicMock(url=SOURCE_URL)
+        return is_blob_copy_up_to_date(_destination(destination_properties), source_service, 'container', 'blob',
+                                       source_properties)
+
+    def test_is_blob_copy_up_to_date(self):
+        source = _properties(content_md5=bytearray(b'md5'))
+        self.assertFalse(self._is_up_to_date(None, source))
+        self.assertFalse(self._is_up_to_date(_properties(size=11, etag='"0x1"'), source))
+        self.assertTrue(self._is_up_to_date(_properties(etag='"0x1"'), source))
+        self.assertTrue(self._is_up_to_date(_properties(etag='"0x2"', content_md5=bytearray(b'md5')), source))
+        self.assertFalse(self._is_up_to_date(_properties(etag='"0x2"', content_md5=bytearray(b'other')), source))
+
+    def test_is_blob_copy_up_to_date_copied_from_source(self):
+        source = _properties()
+        self.assertTrue(self._is_up_to_date(_properties(etag='"0x2"', copy=_copy()), source))
+        # the source changed after the copy
+        self.assertFalse(self._is_up_to_date(
+            _properties(etag='"0x2"', copy=_copy(completion_time=MODIFIED - timedelta(hours=1))), source))
+        self.assertFalse(self._is_up_to_date(_properties(etag='"0x2"', copy=_copy(status='failed')), source))
+        self.assertFalse(self._is_up_to_date(
+            _properties(etag='"0x2"', copy=_copy(source='https://other.blob.core.windows.net/container/blob')),
+            source))
+        self.assertFalse(self._is_up_to_date(
+            _properties(etag='"0x2"', copy=_copy(source=SOURCE_URL + 'container/other')), source))
+
+    def test_schedule_copy_batch(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def _copy_blob(blob_name):
+            with lock:
+                running.append(blob_name)
+                max_running.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(blob_name)
+            # the unchanged blobs aren't copied
+            return None if blob_name.startswith('unchanged') else mock.MagicMock(url='https://dest/' + blob_name)
+
+        sources = ['blob{}'.format(i) for i in range(10)] + ['unchanged0']
+        with mock.patch('azext_storage_blob_preview.copy_util.wait_for_blob_copies') as wait:
+            urls = schedule_copy_batch(mock.MagicMock(), _copy_blob, iter(sources), 3, wait=False)
+            wait.assert_not_called()
+        self.assertEqual(sorted(urls), sorted('https://dest/blob{}'.format(i) for i in range(10)))
+        self.assertLessEqual(max(max_running), 3)
+
+        with mock.patch('azext_storage_blob_preview.copy_util.wait_for_blob_copies') as wait:
+            schedule_copy_batch(mock.MagicMock(), _copy_blob, iter(sources), 3, wait=True)
+            self.assertEqual(len(wait.call_args[0][0]), 10)
+
+    def test_wait_for_blob_copies(self):
+        blob_clients = [_PolledBlobClient('https://dest/a', ['success']),
+                        _PolledBlobClient('https://dest/b', ['pending', 'pending', 'success'])]
+        with mock.patch('time.sleep') as sleep:
+            wait_for_blob_copies(blob_clients, 2, poll_interval=2, max_poll_interval=3)
+        self.assertEqual([blob_client.polls for blob_client in blob_clients], [1, 3])
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [2, 3])
+
+    def test_wait_for_blob_copies_failed(self):
+        blob_clients = [_PolledBlobClient('https://dest/a', ['pending', 'aborted']),
+                        _PolledBlobClient('https://dest/b', ['success'])]
+        with mock.patch('time.sleep'):
+            with self.assertRaisesRegex(CLIError, '1 of 2 copies did not succeed:\nhttps://dest/a: aborted'):
+                wait_for_blob_copies(blob_clients, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -179,6 +179,8 @@ class StorageCommandGroup(AzCommandGroup):
                               CUSTOM_DATA_STORAGE,
                               'common._error#AzureHttpError')
             if isinstance(ex, t_error) and ex.status_code == 403:
+                from .account_cache import invalidate_accounts_served_from_cache
+                invalidate_accounts_served_from_cache()
                 message = """
 You do not have the required permissions needed to perform this operation.
 Depending on your operation, you may need to be assigned one of the following roles:
@@ -377,6 +377,9 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.register_content_settings_argument(t_file_content_settings, update=False, arg_group='Content Settings',
                                              process_md5=True)
         c.extra('no_progress', progress_type)
+        c.argument('max_concurrent_files', arg_group='Upload Control', type=int,
+                   help='The number of files to upload in parallel. The directories are created before the files '
+                   'are uploaded.')
 
     with self.argument_context('storage fs service-properties update', resource_type=CUSTOM_DATA_STORAGE_FILEDATALAKE,
                                min_api='2020-06-12') as c:
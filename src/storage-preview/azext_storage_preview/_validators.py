@@ -28,7 +28,27 @@ storage_account_key_options = {'primary': 'key1', 'secondary': 'key2'}
 # pylint: disable=inconsistent-return-statements, too-many-lines
 def _query_account_key(cli_ctx, account_name):
     """Query the storage account key. This is used when the customer doesn't offer account key but name."""
-    rg, scf = _query_account_rg(cli_ctx, account_name)
+    from .account_cache import StorageAccountCache
+    cache = StorageAccountCache(cli_ctx)
+    key = cache.get_key(account_name)
+    if key:
+        return key
+
+    rg, scf = _query_account_rg(cli_ctx, account_name, cache=cache)
+    try:
+        key = _list_account_key(cli_ctx, scf, rg, account_name)
+    except Exception:  # pylint: disable=broad-except
+        # the cached resource group may be stale if the account has been moved or re-created
+        if not cache.get_account(account_name):
+            raise
+        cache.invalidate(account_name)
+        rg, scf = _query_account_rg(cli_ctx, account_name, cache=cache)
+        key = _list_account_key(cli_ctx, scf, rg, account_name)
+    cache.set_key(account_name, key)
+    return key
+
+
+def _list_account_key(cli_ctx, scf, rg, account_name):
     t_storage_account_keys = get_sdk(
         cli_ctx, CUSTOM_MGMT_PREVIEW_STORAGE, 'models.storage_account_keys#StorageAccountKeys')
 
@@ -38,12 +58,18 @@ def _query_account_key(cli_ctx, account_name):
     return scf.storage_accounts.list_keys(rg, account_name).keys[0].value  # pylint: disable=no-member
 
 
-def _query_account_rg(cli_ctx, account_name):
+def _query_account_rg(cli_ctx, account_name, cache=None):
     """Query the storage account's resource group, which the mgmt sdk requires."""
+    from msrestazure.tools import parse_resource_id
+    from .account_cache import StorageAccountCache
     scf = get_mgmt_service_client(cli_ctx, CUSTOM_MGMT_PREVIEW_STORAGE)
+    cache = cache or StorageAccountCache(cli_ctx)
+    account = cache.get_account(account_name)
+    if account:
+        return parse_resource_id(account['id'])['resource_group'], scf
     acc = next((x for x in scf.storage_accounts.list() if x.name == account_name), None)
     if acc:
-        from msrestazure.tools import parse_resource_id
+        cache.set_account(account_name, acc)
         return parse_resource_id(acc.id)['resource_group'], scf
     raise ValueError("Storage account '{}' not found.".format(account_name))
 
@@ -0,0 +1,108 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+import time
+
+
+def run_concurrently(func, items, max_workers):
+    """
+    Call func on every item with a pool of max_workers threads and yield (item, result) pairs in completion order.
+    At most 2 * max_workers items are in flight, so items may be a lazily evaluated generator of any length.
+    The first exception raised by func cancels the pending work and is re-raised to the caller.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    if max_workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    items = iter(items)
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        try:
+            for item in items:
+                pending[executor.submit(func, item)] = item
+                if len(pending) < window:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class TransferStats(object):
+    """Measure the number of files and bytes transferred by a batch command and summarize its throughput."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.count = 0
+        self.size = 0
+
+    def add(self, size):
+        self.count += 1
+        self.size += size
+
+    def summary(self):
+        elapsed = max(time.time() - self.start, 0.001)
+        megabytes = self.size / (1024.0 * 1024.0)
+        return '{} files ({:.2f} MB) in {:.2f} seconds: {:.1f} files/s, {:.2f} MB/s'.format(
+            self.count, megabytes, elapsed, self.count / elapsed, megabytes / elapsed)
+
+
+class BatchProgress(object):
+    """
+    Aggregate the per-request progress of concurrent uploads into the progress controller of the command's
+    progress_callback, reporting the number of finished files and the bytes uploaded by the whole batch.
+    """
+
+    def __init__(self, progress_callback, total_count, total_bytes):
+        self._hook = progress_callback.hook if progress_callback else None
+        self._total_count = total_count
+        self._total_bytes = total_bytes
+        self._done = TransferStats()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def callback_for(self, name):
+        """Return a raw_response_hook which tracks the progress of a single file."""
+        if not self._hook:
+            return None
+
+        def _update_progress(response):
+            if response.http_response.status_code not in [200, 201]:
+                return
+            current = response.context.get('upload_stream_current')
+            if current is None:
+                return
+            with self._lock:
+                self._in_flight[name] = current
+                self._report()
+
+        return _update_progress
+
+    def item_done(self, name, size=0):
+        with self._lock:
+            self._in_flight.pop(name, None)
+            self._done.add(size)
+            if self._hook:
+                self._report()
+
+    def _report(self):
+        value = self._done.size + sum(self._in_flight.values())
+        message = '{}/{} files'.format(self._done.count, self._total_count)
+        self._hook.add(message=message, value=min(value, self._total_bytes), total_val=max(self._total_bytes, 1))
+
+    def end(self):
+        if self._hook:
+            self._hook.end()
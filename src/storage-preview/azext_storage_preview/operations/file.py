@@ -31,7 +31,7 @@ def storage_file_upload(client, local_file_path, content_settings=None,
 
 def storage_file_upload_batch(cmd, client, destination, source, destination_path=None, pattern=None, dryrun=False,
                               validate_content=False, content_settings=None, max_connections=1, metadata=None,
-                              progress_callback=None):
+                              progress_callback=None, max_concurrent_files=1):
     """ Upload local files to Azure Storage File Share in batch """
 
     from ..util import glob_files_locally, normalize_blob_file_path, guess_content_type
@@ -50,14 +50,19 @@ def storage_file_upload_batch(cmd, client, destination, source, destination_path
                  'Type': guess_content_type(src, content_settings, settings_class).content_type} for src, dst in
                 source_files]
 
-    # TODO: Performance improvement
-    # 1. Upload files in parallel
+    if max_concurrent_files > 1:
+        return _upload_files_concurrently(client, source_files, destination_path, content_settings, metadata,
+                                          validate_content, max_connections, max_concurrent_files,
+                                          progress_callback=progress_callback)
+
+    existing_dirs = set()
+
     def _upload_action(src, dst):
         dst = normalize_blob_file_path(destination_path, dst)
         dir_name = os.path.dirname(dst)
         file_name = os.path.basename(dst)
 
-        _make_directory_in_files_share(client, dir_name)
+        _make_directory_in_files_share(client, dir_name, existing_dirs)
 
         logger.warning('uploading %s', src)
 
@@ -69,6 +74,73 @@ def storage_file_upload_batch(cmd, client, destination, source, destination_path
     return list(_upload_action(src, dst) for src, dst in source_files)
 
 
+def _upload_files_concurrently(client, source_files, destination_path, content_settings, metadata, validate_content,
+                               max_connections, max_concurrent_files, progress_callback=None):
+    """
+    Create the whole directory tree first, then upload the files with a pool of max_concurrent_files workers and
+    report the progress and the throughput of the batch.
+    """
+    from ..batch_util import BatchProgress, TransferStats, run_concurrently
+    from ..util import normalize_blob_file_path
+    from ..track2_util import make_file_url
+    logger = get_logger(__name__)
+
+    stats = TransferStats()
+    files = [(src, normalize_blob_file_path(destination_path, dst), os.path.getsize(src)) for src, dst in source_files]
+    progress = BatchProgress(progress_callback, len(files), sum(size for _, _, size in files))
+    _make_directory_tree_in_files_share(client, set(os.path.dirname(dst) for _, dst, _ in files), max_concurrent_files)
+
+    def _upload_action(file_info):
+        src, dst, size = file_info
+        logger.info('uploading %s', src)
+        storage_file_upload(client.get_file_client(dst), src, content_settings, metadata, validate_content,
+                            progress.callback_for(dst), max_connections=max_connections)
+        progress.item_done(dst, size)
+        return make_file_url(client, os.path.dirname(dst), os.path.basename(dst))
+
+    results = []
+    try:
+        for (_, _, size), url in run_concurrently(_upload_action, files, max_concurrent_files):
+            stats.add(size)
+            results.append(url)
+    finally:
+        progress.end()
+    logger.warning('Uploaded %s', stats.summary())
+    return results
+
+
+def _make_directory_tree_in_files_share(share_client, directory_paths, max_workers=1):
+    """
+    Create the given directories and all their parents. Each directory is created once, level by level, and the
+    directories of the same level are created in parallel.
+    """
+    from ..batch_util import run_concurrently
+
+    levels = {}
+    for directory_path in directory_paths:
+        while directory_path:
+            levels.setdefault(directory_path.count('/'), set()).add(directory_path)
+            directory_path = os.path.dirname(directory_path)
+
+    for level in sorted(levels):
+        for _ in run_concurrently(lambda dir_name: _create_directory_in_files_share(share_client, dir_name),
+                                  sorted(levels[level]), max_workers):
+            pass
+
+
+def _create_directory_in_files_share(share_client, dir_name):
+    from azure.common import AzureHttpError
+    from azure.core.exceptions import ResourceExistsError
+
+    try:
+        share_client.get_directory_client(directory_path=dir_name).create_directory()
+    except ResourceExistsError:
+        pass
+    except AzureHttpError:
+        from knack.util import CLIError
+        raise CLIError('Failed to create directory {}'.format(dir_name))
+
+
 def _make_directory_in_files_share(share_client, directory_path, existing_dirs=None):
     """
     Create directories recursively.
@@ -76,9 +148,6 @@ def _make_directory_in_files_share(share_client, directory_path, existing_dirs=N
     parameter is given, the method will search the set first to avoid repeatedly create directory
     which already exists.
     """
-    from azure.common import AzureHttpError
-    from azure.core.exceptions import ResourceExistsError
-
     if not directory_path:
         return
 
@@ -89,16 +158,10 @@ def _make_directory_in_files_share(share_client, directory_path, existing_dirs=N
         p = os.path.dirname(p)
 
     for dir_name in reversed(parents):
-        if existing_dirs and (dir_name in existing_dirs):
+        if existing_dirs is not None and (dir_name in existing_dirs):
             continue
 
-        try:
-            share_client.get_directory_client(directory_path=dir_name).create_directory()
-        except ResourceExistsError:
-            pass
-        except AzureHttpError:
-            from knack.util import CLIError
-            raise CLIError('Failed to create directory {}'.format(dir_name))
+        _create_directory_in_files_share(share_client, dir_name)
 
-        if existing_dirs:
-            existing_dirs.add(directory_path)
+        if existing_dirs is not None:
+            existing_dirs.add(dir_name)
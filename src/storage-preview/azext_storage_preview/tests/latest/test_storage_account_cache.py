@@ -0,0 +1,140 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from knack.util import CLIError
+
+from ... import account_cache
+from ...account_cache import StorageAccountCache, invalidate_accounts_served_from_cache
+
+try:
+    import cryptography  # pylint: disable=unused-import
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+ACCOUNT_ID = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg1/providers/' \
+             'Microsoft.Storage/storageAccounts/account1'
+
+
+class MockConfig(object):
+    def __init__(self, config_dir, **values):
+        self.config_dir = config_dir
+        self.values = values
+
+    def get(self, section, option, fallback=None):
+        return self.values.get(option, fallback)
+
+
+class MockCLIContext(object):
+    def __init__(self, config_dir, **values):
+        self.config = MockConfig(config_dir, **values)
+        self.handled = []
+
+    def exception_handler(self, ex):
+        self.handled.append(ex)
+        return 1
+
+
+class MockAccount(object):
+    def __init__(self):
+        self.id = ACCOUNT_ID
+
+
+class MockResourceNotFoundError(CLIError):
+    def __init__(self):
+        super(MockResourceNotFoundError, self).__init__('Resource was not found.')
+        self.status_code = 404
+        self.error_code = 'ResourceNotFound'
+
+
+@mock.patch('azure.cli.core.commands.client_factory.get_subscription_id', lambda _: 'sub1')
+class TestStorageAccountCache(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        account_cache._served_from_cache.clear()  # pylint: disable=protected-access
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def test_account_cache(self):
+        cli_ctx = MockCLIContext(self.config_dir)
+        cache = StorageAccountCache(cli_ctx)
+        self.assertIsNone(cache.get_account('account1'))
+        cache.set_account('account1', MockAccount())
+
+        # a new invocation reads the entry from disk
+        entry = StorageAccountCache(cli_ctx).get_account('Account1')
+        self.assertEqual(entry['id'], ACCOUNT_ID)
+
+        StorageAccountCache(cli_ctx).invalidate('account1')
+        self.assertIsNone(StorageAccountCache(cli_ctx).get_account('account1'))
+
+    def test_account_cache_expiry(self):
+        cache = StorageAccountCache(MockCLIContext(self.config_dir, account_cache_ttl='60'))
+        cache.set_account('account1', MockAccount())
+        self.assertIsNotNone(cache.get_account('account1'))
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(cache.get_account('account1'))
+
+        cache = StorageAccountCache(MockCLIContext(self.config_dir, account_cache_ttl='0'))
+        cache.set_account('account2', MockAccount())
+        self.assertIsNone(cache.get_account('account2'))
+
+    @unittest.skipUnless(HAS_CRYPTOGRAPHY, 'cryptography is required to cache account keys')
+    def test_key_cache(self):
+        # keys are not cached by default
+        cache = StorageAccountCache(MockCLIContext(self.config_dir))
+        cache.set_key('account1', 'secret-key')
+        self.assertIsNone(cache.get_key('account1'))
+
+        cli_ctx = MockCLIContext(self.config_dir, account_key_cache_ttl='300')
+        StorageAccountCache(cli_ctx).set_key('account1', 'secret-key')
+        with open(cache.keys.filename) as f:
+            self.assertNotIn('secret-key', f.read())
+        self.assertEqual(StorageAccountCache(cli_ctx).get_key('account1'), 'secret-key')
+
+        # an authentication failure drops the keys served from the cache
+        invalidate_accounts_served_from_cache()
+        self.assertIsNone(StorageAccountCache(cli_ctx).get_key('account1'))
+
+    def test_account_cache_invalidated_on_stale_account(self):
+        # the key cache is off, the resource group of the account is served from the account cache
+        cli_ctx = MockCLIContext(self.config_dir)
+        StorageAccountCache(cli_ctx).set_account('account1', MockAccount())
+        StorageAccountCache(cli_ctx).set_account('account2', MockAccount())
+        self.assertIsNotNone(StorageAccountCache(cli_ctx).get_account('account1'))
+
+        # failures which don't come from a stale account keep the cache
+        self.assertEqual(cli_ctx.exception_handler(CLIError('The specified blob does not exist.')), 1)
+        self.assertIsNotNone(StorageAccountCache(cli_ctx).get_account('account1'))
+
+        # the command using the account fails to find it in the cached resource group
+        error = MockResourceNotFoundError()
+        self.assertEqual(cli_ctx.exception_handler(error), 1)
+        self.assertIs(cli_ctx.handled[-1], error)
+        self.assertIsNone(StorageAccountCache(cli_ctx).get_account('account1'))
+        # the accounts not used by the command are kept
+        self.assertIsNotNone(StorageAccountCache(MockCLIContext(self.config_dir)).get_account('account2'))
+
+    def test_account_cache_copies_are_identical(self):
+        # storage-blob-preview ships a copy of the module, which is only found in a checkout of the repository
+        here = os.path.dirname(os.path.abspath(__file__))
+        copy_path = os.path.join(here, '..', '..', '..', '..', 'storage-blob-preview', 'azext_storage_blob_preview',
+                                 'account_cache.py')
+        if not os.path.isfile(copy_path):
+            self.skipTest('storage-blob-preview is not next to storage-preview')
+        with open(os.path.join(here, '..', '..', 'account_cache.py')) as f, open(copy_path) as copy:
+            self.assertEqual(f.read(), copy.read(), 'Apply the changes of account_cache.py to both extensions')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from ...batch_util import run_concurrently
+from ...operations.file import _make_directory_tree_in_files_share, storage_file_upload_batch
+from ...util import glob_files_remotely
+
+
+class MockDirectoryClient(object):
+    def __init__(self, share_client, directory_path):
+        self.share_client = share_client
+        self.directory_path = directory_path
+
+    def create_directory(self):
+        with self.share_client.lock:
+            parent = self.directory_path.rpartition('/')[0]
+            if parent and parent not in self.share_client.created:
+                raise AssertionError('parent of {} does not exist'.format(self.directory_path))
+            self.share_client.created.append(self.directory_path)
+
+
+class MockShareClient(object):
+    def __init__(self):
+        self.created = []
+        self.lock = threading.Lock()
+
+    def get_directory_client(self, directory_path):
+        return MockDirectoryClient(self, directory_path)
+
+
+class MockDirectory(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class MockFile(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class MockCmd(object):
+    def get_models(self, *_, **__):
+        return MockDirectory, MockFile
+
+
+class MockFileService(object):
+    def __init__(self, tree):
+        self.tree = tree
+
+    def list_directories_and_files(self, share_name, directory_name):
+        for name, child in sorted(self.tree[directory_name].items()):
+            yield MockDirectory(name) if child else MockFile(name)
+
+
+def _upload_file_responding(length, raw_response_hook=None, **_):
+    # report the progress of the file in two chunks like the chunked upload of the SDK
+    for current in [length // 2, length]:
+        response = mock.MagicMock(context={'upload_stream_current': current})
+        response.http_response.status_code = 201
+        raw_response_hook(response)
+
+
+class TestStorageBatchUtil(unittest.TestCase):
+    def test_run_concurrently(self):
+        results = dict(run_concurrently(lambda x: x * 2, iter(range(50)), 4))
+        self.assertEqual(results, {i: i * 2 for i in range(50)})
+
+    def test_make_directory_tree_in_files_share(self):
+        share_client = MockShareClient()
+        _make_directory_tree_in_files_share(share_client, {'a/b/c', 'a/b/d', 'a/e', 'f', ''}, max_workers=4)
+        # every directory is created once, after its parent
+        self.assertEqual(sorted(share_client.created), ['a', 'a/b', 'a/b/c', 'a/b/d', 'a/e', 'f'])
+
+    def test_glob_files_remotely(self):
+        client = MockFileService({
+            '': {'a': True, 'b': True, 'readme.md': False},
+            'a': {'c': True, 'file_0.txt': False, 'file_1.md': False},
+            'a/c': {'file_2.txt': False},
+            'b': {'file_3.txt': False},
+        })
+        files = set(glob_files_remotely(MockCmd(), client, 'share', None, max_workers=3))
+        self.assertEqual(files, {('', 'readme.md'), ('a', 'file_0.txt'), ('a', 'file_1.md'), ('a/c', 'file_2.txt'),
+                                 ('b', 'file_3.txt')})
+
+        files = set(glob_files_remotely(MockCmd(), client, 'share', 'a/*.txt', max_workers=3))
+        self.assertEqual(files, {('a', 'file_0.txt'), ('a/c', 'file_2.txt')})
+
+    def test_upload_batch_concurrent_progress(self):
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        for name, size in [('a.txt', 10), ('dir/b.txt', 20), ('dir/c.txt', 30)]:
+            os.makedirs(os.path.join(source, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(source, name), 'wb') as stream:
+                stream.write(b'x' * size)
+        client = mock.MagicMock()
+        client.get_file_client.return_value.upload_file.side_effect = _upload_file_responding
+        progress_callback = mock.MagicMock()
+
+        storage_file_upload_batch(MockCmd(), client, 'share', source, progress_callback=progress_callback,
+                                  max_concurrent_files=3)
+
+        updates = [call[1] for call in progress_callback.hook.add.call_args_list]
+        self.assertEqual(len(updates), 9)
+        self.assertTrue(all(update['total_val'] == 60 for update in updates))
+        self.assertEqual([update['value'] for update in updates], sorted(update['value'] for update in updates))
+        self.assertEqual(updates[-1], {'message': '3/3 files', 'value': 60, 'total_val': 60})
+        progress_callback.hook.end.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -83,20 +83,36 @@ def glob_files_locally(folder_path, pattern):
                 yield (full_path, full_path[len_folder_path:])
 
 
-def glob_files_remotely(cmd, client, share_name, pattern):
-    """glob the files in remote file share based on the given pattern"""
+def glob_files_remotely(cmd, client, share_name, pattern, max_workers=8):
+    """
+    glob the files in remote file share based on the given pattern. The share is walked breadth first with up to
+    max_workers directories listed concurrently, and the matching files are yielded while the walk continues.
+    """
     from collections import deque
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
     t_dir, t_file = cmd.get_models('file.models#Directory', 'file.models#File')
-
-    queue = deque([""])
-    while queue:
-        current_dir = queue.pop()
-        for f in client.list_directories_and_files(share_name, current_dir):
-            if isinstance(f, t_file):
-                if not pattern or _match_path(os.path.join(current_dir, f.name), pattern):
-                    yield current_dir, f.name
-            elif isinstance(f, t_dir):
-                queue.appendleft(os.path.join(current_dir, f.name))
+    match = _compile_path_pattern(pattern)
+
+    def _list_directory(directory):
+        return list(client.list_directories_and_files(share_name, directory))
+
+    directories = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_list_directory, ""): ""}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                current_dir = pending.pop(future)
+                prefix = current_dir + '/' if current_dir else ''
+                for f in future.result():
+                    if isinstance(f, t_file):
+                        if not match or match(prefix + f.name):
+                            yield current_dir, f.name
+                    elif isinstance(f, t_dir):
+                        directories.append(prefix + f.name)
+            while directories and len(pending) < max_workers:
+                directory = directories.popleft()
+                pending[executor.submit(_list_directory, directory)] = directory
 
 
 def create_short_lived_blob_sas(cmd, account_name, account_key, container, blob):
@@ -178,6 +194,16 @@ def _match_path(path, pattern):
     return fnmatch(path, pattern)
 
 
+def _compile_path_pattern(pattern):
+    """Compile the pattern once and return a function matching paths like _match_path, or None for no pattern."""
+    if not pattern:
+        return None
+    import re
+    from fnmatch import translate
+    regex = re.compile(translate(os.path.normcase(pattern)))
+    return lambda path: regex.match(os.path.normcase(path)) is not None
+
+
 def guess_content_type(file_path, original, settings_class):
     if original.content_encoding or original.content_type:
         return original
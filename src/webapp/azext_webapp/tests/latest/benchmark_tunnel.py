@@ -0,0 +1,118 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""
+Sends data through the TunnelServer of tunnel.py to a local websocket echo server, which stands in for the tunnel
+of a webapp, over several concurrent connections, and reports the throughput of every number of connections.
+
+    python -m azext_webapp.tests.latest.benchmark_tunnel [--size 64] [--connections 1 4 16] [--chunk 64]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+
+from azext_webapp.tunnel import TunnelServer, TunnelWebSocket, get_websocket_accept
+
+
+class EchoWebSocketServer(object):
+    """ accepts websockets on a local port and sends back the payload of every frame received """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._echo, '127.0.0.1', 0))
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return 'ws://127.0.0.1:{}/AppServiceTunnel/Tunnel.ashx'.format(self.server.sockets[0].getsockname()[1])
+
+    async def _echo(self, reader, writer):
+        request = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        headers = dict((name.strip().lower(), value.strip()) for name, _, value in
+                       (line.partition(':') for line in request[1:] if line))
+        writer.write('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     'Sec-WebSocket-Accept: {}\r\n\r\n'.format(
+                         get_websocket_accept(headers['sec-websocket-key'])).encode())
+        ws_socket = TunnelWebSocket(reader, writer, is_client=False)
+        while True:
+            data = await ws_socket.recv()
+            if data is None:
+                return
+            await ws_socket.send(data)
+
+
+def start_tunnel(url, timeout=10):
+    """ starts the tunnel in a thread and returns once it listens, the connections being refused before """
+    tunnel = TunnelServer('127.0.0.1', 0, 'benchmark', 'user', 'password')
+    tunnel.websocket_url = url
+    threading.Thread(target=tunnel.start_server, daemon=True).start()
+    deadline = time.time() + timeout
+    while not tunnel.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ACCEPTCONN):
+        if time.time() > deadline:
+            raise RuntimeError('The tunnel is not listening on port {}'.format(tunnel.local_port))
+        time.sleep(0.01)
+    return tunnel
+
+
+async def _send_and_receive(port, size, chunk):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = os.urandom(chunk)
+
+    async def _send():
+        for _ in range(size // chunk):
+            writer.write(payload)
+            await writer.drain()
+
+    async def _receive():
+        received = 0
+        while received < size:
+            data = await reader.read(1024 * 1024)
+            if not data:
+                raise AssertionError('{} bytes echoed out of {}'.format(received, size))
+            received += len(data)
+
+    await asyncio.gather(_send(), _receive())
+    writer.close()
+
+
+async def _run_connections(port, connections, size, chunk):
+    await asyncio.gather(*[_send_and_receive(port, size, chunk) for _ in range(connections)])
+
+
+def benchmark(port, connections, size, chunk):
+    loop = asyncio.new_event_loop()
+    try:
+        start = time.time()
+        loop.run_until_complete(_run_connections(port, connections, size, chunk))
+        return time.time() - start
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=64, help='MB sent through every connection')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--chunk', type=int, default=64, help='size of the writes of a connection in KiB')
+    args = parser.parse_args()
+    logging.getLogger('cli').setLevel(logging.ERROR)
+
+    echo_server = EchoWebSocketServer()
+    tunnel = start_tunnel(echo_server.url)
+    size = args.size * 1024 * 1024
+    chunk = args.chunk * 1024
+    print('{:>12} {:>10} {:>10}'.format('connections', 'seconds', 'MB/s'))
+    for connections in args.connections:
+        elapsed = benchmark(tunnel.local_port, connections, size - size % chunk, chunk)
+        print('{:>12} {:>10.2f} {:>10.2f}'.format(connections, elapsed, connections * args.size / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,38 +4,216 @@
 # --------------------------------------------------------------------------------------------
 
 # pylint: disable=import-error,unused-import,import-outside-toplevel,super-with-arguments
-import sys
+import asyncio
+import base64
+import hashlib
+import os
 import ssl
 import socket
-import time
-import traceback
+import struct
 import logging as logs
 from contextlib import closing
-from datetime import datetime
-from threading import Thread
 
-import websocket
-from websocket import create_connection, WebSocket
+from urllib.parse import unquote, urlparse
 
 from knack.util import CLIError
 from knack.log import get_logger
 logger = get_logger(__name__)
 
+# the size of the reads from a local connection, and so of the websocket frames sent
+TUNNEL_BUFFER_SIZE = 64 * 1024
+# the bytes waiting to be sent to a websocket before the local connection isn't read anymore
+WEBSOCKET_WRITE_HIGH_WATER_MARK = 4 * TUNNEL_BUFFER_SIZE
+# the seconds a local connection can stay idle
+CLIENT_TIMEOUT = 1800
 
-class TunnelWebSocket(WebSocket):
-    def recv_frame(self):
-        frame = super(TunnelWebSocket, self).recv_frame()
-        logger.info('Received frame: %s', frame)
-        return frame
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xa
 
-    def recv(self):
-        data = super(TunnelWebSocket, self).recv()
-        logger.info('Received websocket data: %s', data)
-        return data
+
+def mask_payload(mask_key, data):
+    """ xors data with the repeated mask key, as big integers which is much faster than byte by byte """
+    length = len(data)
+    if not length:
+        return b''
+    key = (mask_key * (length // 4 + 1))[:length]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+
+def get_websocket_accept(key):
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+def get_proxy(url):
+    """
+    the proxy of a ws:// or wss:// url from the http_proxy and https_proxy environment variables, like
+    websocket-client, or None when no_proxy excludes the host of the url
+    """
+    from urllib.request import getproxies, proxy_bypass
+    parsed = urlparse(url)
+    proxies = getproxies()
+    if not proxies or proxy_bypass(parsed.hostname):
+        return None
+    if parsed.scheme == 'wss':
+        return proxies.get('https') or proxies.get('http')
+    return proxies.get('http')
+
+
+def open_proxy_tunnel(proxy_url, host, port):
+    """ a socket connected to host:port through the HTTP CONNECT method of a proxy """
+    proxy = urlparse(proxy_url if '://' in proxy_url else 'http://' + proxy_url)
+    sock = socket.create_connection((proxy.hostname, proxy.port or 80))
+    try:
+        request = ['CONNECT {0}:{1} HTTP/1.1'.format(host, port), 'Host: {0}:{1}'.format(host, port)]
+        if proxy.username:
+            credentials = '{}:{}'.format(unquote(proxy.username), unquote(proxy.password or ''))
+            request.append('Proxy-Authorization: Basic {}'.format(base64.b64encode(credentials.encode()).decode()))
+        sock.sendall(('\r\n'.join(request) + '\r\n\r\n').encode())
+        response = b''
+        while b'\r\n\r\n' not in response:
+            data = sock.recv(4096)
+            if not data:
+                break
+            response += data
+        status_line = response.split(b'\r\n', 1)[0].decode('latin-1')
+        status = status_line.split(' ', 2)
+        if len(status) < 2 or status[1] != '200':
+            raise CLIError("Failed to connect to '{}:{}' through the proxy '{}': {}".format(
+                host, port, proxy.hostname, status_line or 'no response'))
+    except (OSError, CLIError):
+        sock.close()
+        raise
+    return sock
+
+
+class TunnelWebSocket(object):
+    """
+    a websocket over asyncio streams, which sends binary frames and receives the payloads of the data frames.
+    a client masks the frames it sends, the frames received are unmasked when they are masked
+    """
+
+    def __init__(self, reader, writer, is_client=True):
+        self.reader = reader
+        self.writer = writer
+        self.is_client = is_client
+        self.closed = False
+        writer.transport.set_write_buffer_limits(high=WEBSOCKET_WRITE_HIGH_WATER_MARK)
+
+    @classmethod
+    async def connect(cls, url, headers=None, ssl_context=None):
+        """ opens a websocket to a ws:// or wss:// url """
+        parsed = urlparse(url)
+        secure = parsed.scheme == 'wss'
+        port = parsed.port or (443 if secure else 80)
+        proxy = get_proxy(url)
+        if proxy:
+            sock = await asyncio.get_event_loop().run_in_executor(None, open_proxy_tunnel, proxy,
+                                                                  parsed.hostname, port)
+            reader, writer = await asyncio.open_connection(sock=sock, ssl=(ssl_context or True) if secure else None,
+                                                           server_hostname=parsed.hostname if secure else None)
+        else:
+            reader, writer = await asyncio.open_connection(parsed.hostname, port,
+                                                           ssl=(ssl_context or True) if secure else None)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = ['GET {} HTTP/1.1'.format((parsed.path or '/') + ('?' + parsed.query if parsed.query else '')),
+                   'Host: {}'.format(parsed.netloc),
+                   'Upgrade: websocket',
+                   'Connection: Upgrade',
+                   'Sec-WebSocket-Key: {}'.format(key),
+                   'Sec-WebSocket-Version: 13'] + list(headers or [])
+        writer.write(('\r\n'.join(request) + '\r\n\r\n').encode())
+        response = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = response[0].split(' ', 2)
+        if len(status) < 2 or status[1] != '101':
+            writer.close()
+            raise CLIError("Failed to open a websocket to '{}': {}".format(url, response[0]))
+        response_headers = dict((name.strip().lower(), value.strip()) for name, _, value in
+                                (line.partition(':') for line in response[1:] if line))
+        if response_headers.get('sec-websocket-accept') != get_websocket_accept(key):
+            writer.close()
+            raise CLIError("Failed to open a websocket to '{}': invalid Sec-WebSocket-Accept header".format(url))
+        return cls(reader, writer)
+
+    def _write_frame(self, opcode, payload):
+        length = len(payload)
+        header = bytearray([0x80 | opcode])
+        mask_bit = 0x80 if self.is_client else 0
+        if length < 126:
+            header.append(mask_bit | length)
+        elif length < 1 << 16:
+            header.append(mask_bit | 126)
+            header += struct.pack('!H', length)
+        else:
+            header.append(mask_bit | 127)
+            header += struct.pack('!Q', length)
+        if self.is_client:
+            mask_key = os.urandom(4)
+            header += mask_key
+            payload = mask_payload(mask_key, payload)
+        self.writer.write(bytes(header))
+        self.writer.write(payload)
+
+    async def send(self, data):
+        """ sends data in a binary frame, waiting while too many bytes are waiting to be sent """
+        self._write_frame(OPCODE_BINARY, data)
+        await self.writer.drain()
+
+    async def recv(self):
+        """ the payload of the next data frame, or None once the websocket is closed """
+        try:
+            while True:
+                first, second = await self.reader.readexactly(2)
+                opcode = first & 0x0f
+                length = second & 0x7f
+                if length == 126:
+                    length, = struct.unpack('!H', await self.reader.readexactly(2))
+                elif length == 127:
+                    length, = struct.unpack('!Q', await self.reader.readexactly(8))
+                mask_key = await self.reader.readexactly(4) if second & 0x80 else None
+                payload = await self.reader.readexactly(length)
+                if mask_key:
+                    payload = mask_payload(mask_key, payload)
+
+                if opcode in (OPCODE_BINARY, OPCODE_TEXT, OPCODE_CONTINUATION):
+                    # the tunnel carries a stream of bytes, fragments are forwarded as they come
+                    return payload
+                if opcode == OPCODE_CLOSE:
+                    await self.close()
+                    return None
+                if opcode == OPCODE_PING:
+                    self._write_frame(OPCODE_PONG, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.closed = True
+            return None
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._write_frame(OPCODE_CLOSE, struct.pack('!H', 1000))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.writer.close()
 
 
 # pylint: disable=no-member,too-many-instance-attributes,bare-except,no-self-use
 class TunnelServer(object):
+    """
+    forwards the local connections to the remote tunnel of the webapp, each over a websocket of its own, from one
+    event loop so that many connections, like several SSH or debugger sessions, are served at the same time
+    """
     def __init__(self, local_addr, local_port, remote_addr, remote_user_name, remote_password):
         self.local_addr = local_addr
         self.local_port = local_port
@@ -44,8 +222,10 @@ class TunnelServer(object):
         self.remote_addr = remote_addr
         self.remote_user_name = remote_user_name
         self.remote_password = remote_password
-        self.client = None
-        self.ws = None
+        self.websocket_url = 'wss://{}{}'.format(self.remote_addr,
+                                                 '.scm.azurewebsites.net/AppServiceTunnel/Tunnel.ashx')
+        self.is_verbose = False
+        self._index = 0
         logger.info('Creating a socket on port: %s', self.local_port)
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         logger.info('Setting socket options')
@@ -102,89 +282,96 @@ class TunnelServer(object):
             return True
         return False
 
-    def _listen(self):
-        self.sock.listen(100)
-        index = 0
-        basic_auth_string = self.create_basic_auth()
-        while True:
-            self.client, _address = self.sock.accept()
-            self.client.settimeout(1800)
-            host = 'wss://{}{}'.format(self.remote_addr, '.scm.azurewebsites.net/AppServiceTunnel/Tunnel.ashx')
-            basic_auth_header = 'Authorization: Basic {}'.format(basic_auth_string)
-            cli_logger = get_logger()  # get CLI logger which has the level set through command lines
-            is_verbose = any(handler.level <= logs.INFO for handler in cli_logger.handlers)
-            if is_verbose:
-                logger.info('Websocket tracing enabled')
-                websocket.enableTrace(True)
-            else:
-                logger.warning('Websocket tracing disabled, use --verbose flag to enable')
-                websocket.enableTrace(False)
-            self.ws = create_connection(host,
-                                        sockopt=((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),),
-                                        class_=TunnelWebSocket,
-                                        header=[basic_auth_header],
-                                        sslopt={'cert_reqs': ssl.CERT_NONE},
-                                        enable_multithread=True)
-            logger.info('Websocket, connected status: %s', self.ws.connected)
-            index = index + 1
-            logger.info('Got debugger connection... index: %s', index)
-            debugger_thread = Thread(target=self._listen_to_client, args=(self.client, self.ws, index))
-            web_socket_thread = Thread(target=self._listen_to_web_socket, args=(self.client, self.ws, index))
-            debugger_thread.start()
-            web_socket_thread.start()
-            logger.info('Both debugger and websocket threads started...')
-            logger.warning('Successfully connected to local server..')
-            debugger_thread.join()
-            web_socket_thread.join()
-            logger.info('Both debugger and websocket threads stopped...')
-            logger.warning('Stopped local server..')
-
-    def _listen_to_web_socket(self, client, ws_socket, index):
+    def _create_ssl_context(self):
+        # like the websocket-client connection this replaces, the certificate of the tunnel isn't verified
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return context
+
+    async def _listen(self):
+        cli_logger = get_logger()  # get CLI logger which has the level set through command lines
+        self.is_verbose = any(handler.level <= logs.INFO for handler in cli_logger.handlers)
+        if self.is_verbose:
+            logger.info('Tunnel data tracing enabled')
+        else:
+            logger.warning('Tunnel data tracing disabled, use --verbose flag to enable')
+        headers = ['Authorization: Basic {}'.format(self.create_basic_auth())]
+        ssl_context = self._create_ssl_context()
+
+        async def _accept(client_reader, client_writer):
+            self._index += 1
+            await self._tunnel(client_reader, client_writer, headers, ssl_context, self._index)
+
+        server = await asyncio.start_server(_accept, sock=self.sock, backlog=100, limit=TUNNEL_BUFFER_SIZE)
+        await server.wait_closed()
+
+    async def _tunnel(self, client_reader, client_writer, headers, ssl_context, index):
+        sock = client_writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            ws_socket = await TunnelWebSocket.connect(self.websocket_url, headers, ssl_context)
+        except (OSError, CLIError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as ex:
+            logger.warning('Failed to open the websocket of connection %s: %s', index, ex)
+            client_writer.close()
+            return
+        logger.warning('Successfully connected to local server.. index: %s', index)
+        directions = [asyncio.ensure_future(self._listen_to_client(client_reader, ws_socket, index)),
+                      asyncio.ensure_future(self._listen_to_web_socket(client_writer, ws_socket, index))]
+        try:
+            # either side closing ends the connection
+            _, pending = await asyncio.wait(directions, return_when=asyncio.FIRST_COMPLETED)
+            for direction in pending:
+                direction.cancel()
+            await asyncio.wait(directions)
+        finally:
+            client_writer.close()
+            await ws_socket.close()
+            logger.warning('Stopped local server.. index: %s', index)
+
+    async def _listen_to_web_socket(self, client_writer, ws_socket, index):
+        client_writer.transport.set_write_buffer_limits(high=WEBSOCKET_WRITE_HIGH_WATER_MARK)
         while True:
+            data = await ws_socket.recv()
+            if data is None:
+                logger.info('Websocket closed, index: %s', index)
+                return
+            if self.is_verbose:
+                logger.info('Sending to client, index: %s, response: %s', index, data)
+            client_writer.write(data)
             try:
-                logger.info('Waiting for websocket data, connection status: %s, index: %s', ws_socket.connected, index)
-                data = ws_socket.recv()
-                logger.info('Received websocket data: %s, index: %s', data, index)
-                if data:
-                    # Set the response to echo back the recieved data
-                    response = data
-                    logger.info('Sending to debugger, response: %s, index: %s', response, index)
-                    client.sendall(response)
-                    logger.info('Done sending to debugger, index: %s', index)
-                else:
-                    logger.info('Client disconnected!, index: %s', index)
-                    client.close()
-                    ws_socket.close()
-                    break
-            except:
-                traceback.print_exc(file=sys.stdout)
-                client.close()
-                ws_socket.close()
-                return False
-
-    def _listen_to_client(self, client, ws_socket, index):
+                # the next frame isn't read while the client is behind
+                await client_writer.drain()
+            except ConnectionError as ex:
+                logger.info('Client disconnected, index: %s, %s', index, ex)
+                return
+
+    async def _listen_to_client(self, client_reader, ws_socket, index):
         while True:
             try:
-                logger.info('Waiting for debugger data, index: %s', index)
-                buf = bytearray(4096)
-                nbytes = client.recv_into(buf, 4096)
-                logger.info('Received debugger data, nbytes: %s, index: %s', nbytes, index)
-                if nbytes > 0:
-                    responseData = buf[0:nbytes]
-                    logger.info('Sending to websocket, response data: %s, index: %s', responseData, index)
-                    ws_socket.send_binary(responseData)
-                    logger.info('Done sending to websocket, index: %s', index)
-                else:
-                    logger.warning('Client disconnected %s', index)
-                    client.close()
-                    ws_socket.close()
-                    break
-            except:
-                traceback.print_exc(file=sys.stdout)
-                client.close()
-                ws_socket.close()
-                return False
+                # the reads come out of the buffer of the stream, filled up to TUNNEL_BUFFER_SIZE
+                data = await asyncio.wait_for(client_reader.read(TUNNEL_BUFFER_SIZE), CLIENT_TIMEOUT)
+            except (ConnectionError, asyncio.TimeoutError) as ex:
+                logger.warning('Client disconnected %s: %s', index, ex)
+                return
+            if not data:
+                logger.warning('Client disconnected %s', index)
+                return
+            if self.is_verbose:
+                logger.info('Sending to websocket, index: %s, response data: %s', index, data)
+            try:
+                # the client isn't read while the websocket is behind
+                await ws_socket.send(data)
+            except ConnectionError as ex:
+                logger.info('Websocket closed, index: %s, %s', index, ex)
+                return
 
     def start_server(self):
         logger.warning('Start your favorite client and connect to port %s', self.local_port)
-        self._listen()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._listen())
+        finally:
+            loop.close()